@@ -0,0 +1,75 @@
+# File: benchmarks/bench_ocr.py
+# Purpose: Per-image OCR latency of the pytesseract executable versus the
+#          persistent in-process engine, over the data/raw samples.
+#
+# Usage: python benchmarks/bench_ocr.py [--repeat 5] [--images data/raw]
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from PIL import Image
+from ocr import PytesseractBackend, TesserocrBackend
+
+def load_images(image_dir):
+    """Decodes every sample up front so only OCR time is measured."""
+    images = []
+    for name in sorted(os.listdir(image_dir)):
+        if name.lower().endswith((".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")):
+            img = Image.open(os.path.join(image_dir, name))
+            img.load()
+            images.append((name, img))
+    return images
+
+def bench_backend(backend, images, repeat):
+    """Returns (first call seconds, per-image latencies of the warm calls)."""
+    start = time.perf_counter()
+    backend.image_to_string(images[0][1])
+    first_call = time.perf_counter() - start
+
+    latencies = {name: [] for name, _ in images}
+    for _ in range(repeat):
+        for name, img in images:
+            start = time.perf_counter()
+            backend.image_to_string(img)
+            latencies[name].append(time.perf_counter() - start)
+    return first_call, latencies
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OCR backends on sample images.")
+    parser.add_argument("--images", default=os.path.join("data", "raw"))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    images = load_images(args.images)
+    if not images:
+        print(f"No images found in {args.images}")
+        return
+
+    backends = [PytesseractBackend()]
+    try:
+        backends.append(TesserocrBackend())
+    except ImportError:
+        print("[INFO] tesserocr not installed; only the pytesseract backend will be measured.")
+
+    results = {}
+    for backend in backends:
+        first_call, latencies = bench_backend(backend, images, args.repeat)
+        results[backend.name] = latencies
+        print(f"\n--- {backend.name} (first call {first_call * 1000:.1f} ms) ---")
+        for name, values in latencies.items():
+            print(f"  {name:<40} median {statistics.median(values) * 1000:8.1f} ms"
+                  f"   min {min(values) * 1000:8.1f} ms")
+
+    if len(results) == 2:
+        print("\n--- Speed-up (pytesseract median / tesserocr median) ---")
+        for name, _ in images:
+            before = statistics.median(results["pytesseract"][name])
+            after = statistics.median(results["tesserocr"][name])
+            print(f"  {name:<40} {before / after:6.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# File: benchmarks/bench_rules.py
+# Purpose: Micro-benchmark of the Regex rule engine (src/rules.py) on
+#          synthetic OCR lines. Exits non-zero below --min-rate lines/s.
+#
+# Usage: python benchmarks/bench_rules.py [--lines 50000] [--min-rate 20000]
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from rules import extract_medications, extract_people
+
+DRUGS = ["Betaloc", "Metformin", "Amoxicillin", "Cimetidine", "Oxprelol", "Losartan", "Paracetamol"]
+STRENGTHS = ["100mg", "10 mg", "500mg", "5 ml", "250mg"]
+FREQUENCIES = ["BID", "TID", "QD", "QID", "bid", "PRN"]
+NOISE = [
+    "Central City Medical Group",
+    "Patient Name: John Appleseed      Date: 09/06/2025",
+    "Sig: Take one tablet by mouth once daily in the morning.",
+    "(Signature on File)",
+    "Rx:",
+    "",
+]
+
+def make_lines(count, seed):
+    """Roughly half medication lines and half letterhead/sig noise, like real OCR output."""
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(count):
+        if rng.random() < 0.5:
+            lines.append(f"{rng.choice(DRUGS)} {rng.choice(STRENGTHS)} - 1 tab {rng.choice(FREQUENCIES)}")
+        else:
+            lines.append(rng.choice(NOISE))
+    return lines
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Regex rule engine.")
+    parser.add_argument("--lines", type=int, default=50000)
+    parser.add_argument("--lines-per-page", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-rate", type=float, default=20000.0, help="Required lines per second")
+    args = parser.parse_args()
+
+    lines = make_lines(args.lines, seed=0)
+    pages = ["\n".join(lines[i:i + args.lines_per_page]) for i in range(0, len(lines), args.lines_per_page)]
+
+    best = None
+    found = 0
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        found = 0
+        for page in pages:
+            extract_people(page)
+            found += len(extract_medications(page))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    rate = len(lines) / best
+    print(f"{len(lines)} lines in {len(pages)} pages, {found} medications found")
+    print(f"Best of {args.repeat}: {best * 1000:.1f} ms -> {rate:,.0f} lines/s (required {args.min_rate:,.0f})")
+    if rate < args.min_rate:
+        print("FAIL: rule engine is below the required rate")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+# File: benchmarks/bench_stages.py
+# Purpose: Stage-level benchmark of the pipeline hot path (decode, preprocess,
+#          OCR, both NER modes and the legacy v1 regex parser) over a fixed
+#          corpus: the data/raw samples plus a reproducible set of synthetic
+#          prescriptions. Reports latency percentiles, throughput and
+#          resident memory growth per stage, and compares
+#          them with a stored JSON baseline. Exits non-zero when a stage
+#          regresses beyond the tolerance.
+#
+# Usage: python benchmarks/bench_stages.py [--synthetic 20] [--repeat 3]
+#            [--baseline benchmarks/baselines/stages.json] [--save-baseline]
+#            [--tolerance 0.2] [--memory-tolerance 0.2] [--output results.json]
+#
+# Baselines are only comparable on the machine that recorded them.
+#
+# Memory is the process RSS, not tracemalloc: the decode, OpenCV and
+# Tesseract buffers are allocated outside the Python allocator, where
+# tracemalloc can't see them. psutil is used if installed; otherwise RSS is
+# read from /proc, and on systems without it only the ru_maxrss high-water
+# mark is available.
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+from batch import iter_image_paths
+from decode import decode_image
+from ner import extract_structured_data, extract_structured_data_batch
+from ocr import extract_text_with_ocr
+from preprocess import PREPROCESS_CONFIG, load_image, preprocess_image
+from v1.ner import parse_structured_data as parse_structured_data_v1
+
+BASELINE_PATH = os.path.join(BENCH_DIR, "baselines", "stages.json")
+SYNTH_SEED = 0
+
+# Metrics where a larger value is a regression; throughput is the reverse
+LATENCY_METRICS = ("p50_ms", "p90_ms")
+# RSS growth within this many MB of the baseline is allocator noise (heap
+# fragmentation, pages kept by the allocator), whatever the tolerance
+RSS_SLACK_MB = 16
+
+def build_corpus(raw_dir, synthetic, synthetic_dir):
+    """
+    The fixed benchmark inputs: every image in raw_dir plus the first
+    `synthetic` synthetic prescriptions, rendered once with a fixed seed.
+    """
+    paths = list(iter_image_paths(raw_dir)) if os.path.isdir(raw_dir) else []
+    if synthetic:
+        images_dir = os.path.join(synthetic_dir, "images")
+        missing = [i for i in range(synthetic)
+                   if not os.path.exists(os.path.join(images_dir, f"synth_{i:06d}.png"))]
+        if missing:
+            from synth import render_prescription
+            os.makedirs(images_dir, exist_ok=True)
+            print(f"[INFO] Rendering {len(missing)} synthetic benchmark image(s) into {synthetic_dir}")
+            for i in missing:
+                render_prescription(i, SYNTH_SEED, synthetic_dir)
+        paths += [os.path.join(images_dir, f"synth_{i:06d}.png") for i in range(synthetic)]
+    return paths
+
+def percentile(values, q):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered), max(1, math.ceil(q / 100 * len(ordered)))) - 1]
+
+def _max_rss():
+    """The process's RSS high-water mark in bytes, or 0 where it isn't available."""
+    if resource is None:
+        return 0
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024 # kB on Linux
+
+def _rss():
+    """The process's current RSS in bytes, or None where it can't be read."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+def measure(fn, items, repeat):
+    """
+    Runs fn over every item `repeat` times and returns the stage metrics.
+    Memory is how far the process RSS grew above its level after the
+    warm-up call, sampled after every call; a transient peak inside a call shows up
+    through the ru_maxrss high-water mark when it raises it. Stage output is
+    discarded so printing doesn't flood the report.
+    """
+    latencies = []
+    outputs = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        fn(items[0]) # Warm-up: model loading and other one-off setup
+        rss_before = _rss()
+        maxrss_before = _max_rss()
+        rss_peak = rss_before or 0
+        start = time.perf_counter()
+        sampling = 0.0
+        for _ in range(repeat):
+            outputs = []
+            for item in items:
+                t0 = time.perf_counter()
+                outputs.append(fn(item))
+                t1 = time.perf_counter()
+                latencies.append(t1 - t0)
+                rss = _rss()
+                if rss is not None:
+                    rss_peak = max(rss_peak, rss)
+                sampling += time.perf_counter() - t1
+        total = time.perf_counter() - start - sampling
+
+    maxrss = _max_rss()
+    if rss_before is None:
+        # No current RSS: only growth of the high-water mark can be seen
+        growth = maxrss - maxrss_before
+    else:
+        growth = rss_peak - rss_before
+        if maxrss > maxrss_before:
+            growth = max(growth, maxrss - rss_before)
+
+    return outputs, {
+        "items": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3),
+        "throughput_per_s": round(len(latencies) / total, 3),
+        "rss_mb": round(max(0, growth) / (1024 * 1024), 3),
+    }
+
+def run_stages(paths, repeat, output_dir):
+    """Benchmarks each stage on the previous stage's output. Returns {stage: metrics}."""
+    results = {}
+    # Full-resolution decode next to the reduced one preprocess_image uses
+    _, results["decode_full"] = measure(lambda path: load_image(path).convert("L"), paths, repeat)
+    _, results["decode"] = measure(lambda path: decode_image(
+        path, max_side=PREPROCESS_CONFIG["max_side"], grayscale=True,
+        target_dpi=PREPROCESS_CONFIG["target_dpi"], min_trusted_dpi=PREPROCESS_CONFIG["min_trusted_dpi"]),
+        paths, repeat)
+    arrays, results["preprocess"] = measure(lambda path: preprocess_image(path, output_dir), paths, repeat)
+    try:
+        texts, results["ocr"] = measure(extract_text_with_ocr, arrays, repeat)
+    except Exception as e:
+        # The NER stages run on the OCR text, so they can't run either
+        print(f"[WARN] OCR unavailable, skipping the OCR and NER stages: {type(e).__name__}: {e}")
+        return results
+
+    _, results["ner_regex"] = measure(lambda text: extract_structured_data(text, output_dir, mode="regex"),
+                                      texts, repeat)
+    # The legacy v1 parser, which the v2 regex mode replaced, as a reference
+    # point. Only its Regex pass is timed, not the results file it appends to.
+    _, results["ner_v1"] = measure(parse_structured_data_v1, texts, repeat)
+    try:
+        _, results["ner_spacy"] = measure(lambda text: extract_structured_data(text, output_dir, mode="spacy"),
+                                          texts, repeat)
+        # One call for the whole corpus, reported per text
+        _, batch = measure(lambda _: extract_structured_data_batch(texts, output_dir, mode="spacy"), [None], repeat)
+        for name in ("p50_ms", "p90_ms", "p99_ms", "mean_ms"):
+            batch[name] = round(batch[name] / len(texts), 3)
+        batch["throughput_per_s"] = round(batch["throughput_per_s"] * len(texts), 3)
+        batch["items"] = len(texts) * repeat
+        results["ner_spacy_batch"] = batch
+    except (ImportError, OSError, ValueError) as e:
+        print(f"[INFO] spaCy model unavailable, skipping the spaCy NER stages: {e}")
+    return results
+
+def compare(results, baseline, tolerance, memory_tolerance):
+    """
+    Returns a list of regression messages for stages that are slower or
+    bigger than the baseline allows. A stage the baseline has no numbers for
+    is reported too, so a new stage can't slip past the gate unmeasured.
+    """
+    regressions = []
+    for stage, metrics in results.items():
+        base = baseline.get("stages", {}).get(stage)
+        if base is None:
+            regressions.append(f"{stage}: not in the baseline; record one with --save-baseline")
+            continue
+        for name in LATENCY_METRICS:
+            if metrics[name] > base[name] * (1 + tolerance):
+                regressions.append(f"{stage}: {name} {metrics[name]:.1f} > baseline {base[name]:.1f} (+{tolerance:.0%})")
+        if metrics["throughput_per_s"] < base["throughput_per_s"] / (1 + tolerance):
+            regressions.append(f"{stage}: throughput {metrics['throughput_per_s']:.1f}/s < baseline "
+                               f"{base['throughput_per_s']:.1f}/s (-{tolerance:.0%})")
+        if metrics["rss_mb"] > max(base["rss_mb"] * (1 + memory_tolerance), base["rss_mb"] + RSS_SLACK_MB):
+            regressions.append(f"{stage}: RSS +{metrics['rss_mb']:.1f} MB > baseline +{base['rss_mb']:.1f} MB "
+                               f"(+{memory_tolerance:.0%})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages and gate on a stored baseline.")
+    parser.add_argument("--images", default=os.path.join("data", "raw"))
+    parser.add_argument("--synthetic", type=int, default=20, help="Synthetic prescriptions to add to the corpus")
+    parser.add_argument("--synthetic-dir", default=os.path.join("output", "bench_synthetic"))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Record this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed latency/throughput regression")
+    parser.add_argument("--memory-tolerance", type=float, default=0.2, help="Allowed RSS growth regression")
+    parser.add_argument("--output", default=None, help="Also write this run's results to a JSON file")
+    args = parser.parse_args()
+
+    paths = build_corpus(args.images, args.synthetic, args.synthetic_dir)
+    if not paths:
+        print(f"No images found in {args.images} and no synthetic images requested")
+        sys.exit(1)
+
+    print(f"--- Benchmarking {len(paths)} images x {args.repeat} ---")
+    results = {
+        "meta": {
+            "images": len(paths),
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "machine": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+    }
+    # Stage output (debug images, results files) goes to a scratch directory,
+    # so benchmark runs leave nothing in output/
+    with tempfile.TemporaryDirectory(prefix="bench_stages_") as output_dir:
+        results["stages"] = run_stages(paths, args.repeat, output_dir)
+    for stage, m in results["stages"].items():
+        print(f"  {stage:<16} p50 {m['p50_ms']:9.2f} ms   p90 {m['p90_ms']:9.2f} ms   p99 {m['p99_ms']:9.2f} ms"
+              f"   {m['throughput_per_s']:9.1f}/s   RSS +{m['rss_mb']:7.1f} MB")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"[INFO] Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"FAIL: no baseline at {args.baseline}; record one on this machine with --save-baseline")
+        sys.exit(1)
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results["stages"], baseline, args.tolerance, args.memory_tolerance)
+    if regressions:
+        print("FAIL: stages regressed against the baseline")
+        for message in regressions:
+            print(f"  {message}")
+        sys.exit(1)
+    print("All stages within tolerance of the baseline")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+# File: src/batch.py
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from documents import DOCUMENT_EXTENSIONS, describe_page, iter_pages
+from pipeline import process_prescription
+from sink import open_sink
+from tracing import export_record, span, write_metrics
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+# Everything batch mode accepts: images plus multi-page documents
+INPUT_EXTENSIONS = tuple(dict.fromkeys(IMAGE_EXTENSIONS + DOCUMENT_EXTENSIONS))
+
+def iter_image_paths(source, extensions=IMAGE_EXTENSIONS):
+    """
+    Yields the image files in a directory, or the files matching a glob pattern.
+    """
+    if os.path.isdir(source):
+        for entry in sorted(os.scandir(source), key=lambda e: e.name):
+            if entry.is_file() and entry.name.lower().endswith(extensions):
+                yield entry.path
+    else:
+        for path in sorted(glob.iglob(source, recursive=True)):
+            if os.path.isfile(path) and path.lower().endswith(extensions):
+                yield path
+
+def run_batch(source, output_dir, workers=None, max_pending=None, save_debug=False, use_cache=True):
+    """
+    Runs the pipeline over every image in `source` on a pool of worker processes.
+
+    Records are yielded in completion order as soon as each image finishes.
+    Only `max_pending` images are in flight at once, so a directory with
+    thousands of scans never queues them all up front. PDFs and multi-page
+    TIFFs are split into pages that are queued like images; each worker
+    rasterizes only the page it was given.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 2
+
+    # Tesseract starts its own OpenMP threads for every page. With one worker
+    # per core that oversubscribes the CPU, so each worker gets one thread.
+    # The variable is inherited by the worker processes and their tesseract
+    # subprocesses.
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+    # Likewise, one page per worker process already uses every core, so the
+    # line crops of a page are read one after another
+    os.environ.setdefault("MEDICARE_OCR_LINE_WORKERS", "1")
+    os.makedirs(output_dir, exist_ok=True)
+
+    items = iter_pages(iter_image_paths(source, INPUT_EXTENSIONS))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        for path, page in items:
+            future = pool.submit(process_prescription, path, output_dir, save_debug, use_cache, page=page)
+            pending[future] = (path, page)
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield _collect(future, pending.pop(future))
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield _collect(future, pending.pop(future))
+
+def _collect(future, item):
+    """Returns the worker's record, or an error record if the worker itself died."""
+    try:
+        return future.result()
+    except Exception as e:
+        path, page = item
+        record = {"image": path, "status": "error", "error": f"{type(e).__name__}: {e}", "timings": {}}
+        if page is not None:
+            record["page"] = page
+        return record
+
+def run_batch_pipeline(source, output_dir="output", workers=None, save_debug=False, use_cache=True,
+                       results_path=None):
+    """
+    Command-line driver for batch mode: prints a line per image and a summary.
+
+    Every record is appended to `results_path` (output/results.jsonl by
+    default) as soon as it arrives. A .parquet path writes a new Parquet
+    file instead.
+    """
+    results_path = results_path or os.path.join(output_dir, "results.jsonl")
+    print(f"--- Starting Batch Pipeline for {source} ({workers or os.cpu_count()} workers) ---")
+    start = time.perf_counter()
+    succeeded = 0
+    failed = []
+
+    with open_sink(results_path) as sink:
+        for record in run_batch(source, output_dir, workers=workers, save_debug=save_debug, use_cache=use_cache):
+            export_record(record)
+            with span("output.write", image=str(record["image"])):
+                sink.write(record)
+            label = describe_page(record["image"], record.get("page"))
+            if record["status"] == "ok":
+                succeeded += 1
+                total = record["timings"].get("total", 0.0)
+                took = "cache" if record.get("cached") else f"{total:.2f}s"
+                print(f"[DONE] {label} ({took})")
+            else:
+                failed.append(record)
+                print(f"[FAIL] {label}: {record['error']}")
+
+    elapsed = time.perf_counter() - start
+    processed = succeeded + len(failed)
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print("\n--- BATCH COMPLETE ---")
+    print(f"Processed {processed} pages in {elapsed:.2f}s ({rate:.2f} pages/s)")
+    print(f"Succeeded: {succeeded}, Failed: {len(failed)}")
+    print(f"Results appended to '{results_path}'")
+    write_metrics()
+    return failed
@@ -0,0 +1,198 @@
+# File: src/cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.join(SRC_DIR, "..", "models", "prescription_ner_model")
+DRUG_SOURCE = os.path.join(SRC_DIR, "..", "data", "drug_info.json")
+TEMPLATES_SOURCE = os.path.join(SRC_DIR, "..", "data", "templates.json")
+
+CACHE_PATH = os.path.join("output", "cache", "results.sqlite3")
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# The modules a result passes through, from decoding to NER. Editing
+# anything else in src/ (GUI, server, training, benchmarks) leaves the
+# cache alone.
+PIPELINE_MODULES = (
+    "pipeline.py", "documents.py", "decode.py", "preprocess.py", "segment.py", "ocr.py",
+    "templates.py", "ner.py", "rules.py", "drug_scanner.py", "drug_correction.py",
+    "drug_store.py", "ner_data.py",
+)
+
+_code_version = None
+
+def pipeline_version(config=None):
+    """
+    Fingerprint of everything that decides a result: the pipeline modules
+    (PIPELINE_MODULES), the drug formulary, the clinic pad templates, the
+    trained NER model and `config`, the effective runtime settings (see
+    pipeline.pipeline_config). Editing preprocess, OCR or NER code, the
+    formulary or a template, retraining the model, or running with another
+    OCR layout, backend or NER mode, gives a different fingerprint and so
+    never hits results produced the other way.
+    The file part is computed once per process.
+    """
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.sha256()
+        for name in PIPELINE_MODULES:
+            with open(os.path.join(SRC_DIR, name), "rb") as f:
+                digest.update(name.encode("utf-8") + b"\0" + f.read())
+        for path in (DRUG_SOURCE, TEMPLATES_SOURCE):
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    digest.update(os.path.basename(path).encode("utf-8") + b"\0" + f.read())
+        if os.path.isdir(MODEL_DIR):
+            for root, dirs, files in os.walk(MODEL_DIR):
+                dirs.sort()
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    with open(path, "rb") as f:
+                        digest.update(os.path.relpath(path, MODEL_DIR).encode("utf-8") + b"\0" + f.read())
+        _code_version = digest.hexdigest()
+    digest = hashlib.sha256(_code_version.encode("ascii"))
+    digest.update(json.dumps(config or {}, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+def content_hash(image):
+    """
+    SHA-256 of an image's encoded bytes (file path or bytes), or of the pixel
+    buffer for an already decoded array or PIL image.
+    """
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(image).hexdigest()
+    if isinstance(image, (str, os.PathLike)):
+        digest = hashlib.sha256()
+        with open(image, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    shape = image.shape if hasattr(image, "shape") else (image.mode, image.size)
+    digest = hashlib.sha256(str(shape).encode("ascii"))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+class ResultCache:
+    """
+    On-disk cache of structured pipeline results in SQLite, keyed by image
+    content hash and pipeline version.
+
+    When the stored results grow past max_bytes, the least recently used
+    entries are evicted, whatever their version; that is also how results of
+    an older pipeline go away. The running total size is kept in the
+    database by triggers, so it stays right across processes. SQLite's file
+    locking makes the cache safe to share between the batch worker
+    processes, including ones running with different settings.
+    """
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES, version=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.version = version or pipeline_version()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " image_hash TEXT NOT NULL,"
+                " version TEXT NOT NULL,"
+                " data TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " last_access REAL NOT NULL,"
+                " PRIMARY KEY (image_hash, version))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_size ("
+                " id INTEGER PRIMARY KEY CHECK (id = 0),"
+                " total INTEGER NOT NULL)"
+            )
+            # A cache file from before the running total is summed up once
+            self._conn.execute(
+                "INSERT OR IGNORE INTO cache_size (id, total)"
+                " SELECT 0, COALESCE(SUM(size), 0) FROM results"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS results_size_insert AFTER INSERT ON results"
+                " BEGIN UPDATE cache_size SET total = total + NEW.size; END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS results_size_update AFTER UPDATE OF size ON results"
+                " BEGIN UPDATE cache_size SET total = total + NEW.size - OLD.size; END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS results_size_delete AFTER DELETE ON results"
+                " BEGIN UPDATE cache_size SET total = total - OLD.size; END"
+            )
+
+    def get(self, image_hash):
+        """Returns the cached structured data for an image, or None on a miss."""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT data FROM results WHERE image_hash = ? AND version = ?",
+                (image_hash, self.version),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE results SET last_access = ? WHERE image_hash = ? AND version = ?",
+                (time.time(), image_hash, self.version),
+            )
+        return json.loads(row[0])
+
+    def put(self, image_hash, data):
+        """Stores the structured data for an image and evicts old entries if over budget."""
+        payload = json.dumps(data, ensure_ascii=False)
+        size = len(payload.encode("utf-8"))
+        with self._lock, self._conn:
+            # An upsert rather than INSERT OR REPLACE, whose implicit delete
+            # would not fire the size trigger
+            self._conn.execute(
+                "INSERT INTO results (image_hash, version, data, size, last_access)"
+                " VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (image_hash, version) DO UPDATE SET"
+                " data = excluded.data, size = excluded.size, last_access = excluded.last_access",
+                (image_hash, self.version, payload, size, time.time()),
+            )
+            self._evict()
+
+    def total_bytes(self):
+        """Size of all stored results, every version included."""
+        with self._lock:
+            return self._conn.execute("SELECT total FROM cache_size").fetchone()[0]
+
+    def _evict(self):
+        total = self._conn.execute("SELECT total FROM cache_size").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        stale = []
+        rows = self._conn.execute("SELECT image_hash, version, size FROM results ORDER BY last_access")
+        for image_hash, version, size in rows:
+            if total <= self.max_bytes:
+                break
+            stale.append((image_hash, version))
+            total -= size
+        self._conn.executemany("DELETE FROM results WHERE image_hash = ? AND version = ?", stale)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_result_cache(path=CACHE_PATH, config=None):
+    """
+    Returns the process-wide cache for `path` and the pipeline version that
+    `config` (the effective runtime settings) gives, opening it on first use.
+    """
+    version = pipeline_version(config)
+    with _caches_lock:
+        if (path, version) not in _caches:
+            _caches[path, version] = ResultCache(path, version=version)
+        return _caches[path, version]
@@ -0,0 +1,160 @@
+# File: src/corpus.py
+# Purpose: Binary NER training corpus. Annotated lines are converted once
+#          into spaCy DocBin shards (data/corpus/train, data/corpus/dev),
+#          with entity offsets checked during conversion, and read back one
+#          shard at a time so a large corpus never has to fit in memory.
+#
+# Usage: python src/corpus.py [--output-dir data/corpus]   (converts TRAIN_DATA)
+import argparse
+import glob
+import hashlib
+import os
+import random
+
+import spacy
+from spacy.tokens import DocBin
+from spacy.training.example import Example
+
+CORPUS_DIR = os.path.join("data", "corpus")
+SHARD_SIZE = 10000 # Docs per .spacy shard
+DEV_FRACTION = 0.2
+
+def is_dev(text, dev_fraction=DEV_FRACTION):
+    """
+    Stable train/dev assignment from the text itself, so rebuilding or
+    appending to the corpus never moves a line between the splits.
+    """
+    bucket = int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16) % 1000
+    return bucket < dev_fraction * 1000
+
+def make_doc(nlp, text, annotations):
+    """
+    Returns the annotated Doc for a (text, {"entities": [...]}) pair, or
+    None with a warning when a span does not line up with token boundaries
+    or spans overlap.
+    """
+    doc = nlp.make_doc(text)
+    spans = []
+    for start, end, label in annotations.get("entities", []):
+        span = doc.char_span(start, end, label=label, alignment_mode="strict")
+        if span is None:
+            print(f"[WARN] Skipping {text!r}: {text[start:end]!r} ({start}, {end}, {label}) "
+                  "does not match token boundaries")
+            return None
+        spans.append(span)
+    try:
+        doc.ents = spans
+    except ValueError as e:
+        print(f"[WARN] Skipping {text!r}: {e}")
+        return None
+    return doc
+
+class ShardWriter:
+    """
+    Writes Docs to numbered DocBin shards of `shard_size` docs in `directory`.
+
+    With staged=True, shards are written as <name>.spacy.tmp, which
+    read_corpus ignores, and listed in `staged` until publish() renames
+    them, so a caller can make them visible only once it has recorded them
+    elsewhere (see doccano_import.py).
+    """
+    def __init__(self, directory, shard_size=SHARD_SIZE, prefix="shard", staged=False):
+        self.directory = directory
+        self.shard_size = shard_size
+        self.prefix = prefix
+        os.makedirs(directory, exist_ok=True)
+        # Continue numbering after any existing shards instead of overwriting them
+        self.index = len(glob.glob(os.path.join(directory, f"{prefix}-*.spacy")))
+        self.count = 0
+        self.staged = [] if staged else None
+        self._bin = DocBin(store_user_data=False)
+
+    def add(self, doc):
+        self._bin.add(doc)
+        self.count += 1
+        if len(self._bin) >= self.shard_size:
+            self.flush()
+
+    def flush(self):
+        if len(self._bin):
+            path = os.path.join(self.directory, f"{self.prefix}-{self.index:05d}.spacy")
+            if self.staged is None:
+                self._bin.to_disk(path)
+            else:
+                self._bin.to_disk(path + ".tmp")
+                self.staged.append(path)
+            self.index += 1
+            self._bin = DocBin(store_user_data=False)
+
+    def publish(self):
+        """Gives the staged shards their final names."""
+        for path in self.staged:
+            os.replace(path + ".tmp", path)
+        self.staged = []
+
+def build_corpus(data, output_dir=CORPUS_DIR, shard_size=SHARD_SIZE, dev_fraction=DEV_FRACTION,
+                 lang="en", append=False, prefix="shard"):
+    """
+    Converts an iterable of (text, annotations) pairs into train/ and dev/
+    DocBin shards named <prefix>-NNNNN.spacy under output_dir. Earlier
+    shards with the same prefix are replaced unless append=True; shards
+    from other sources (e.g. a Doccano import) are left alone. Returns
+    (train, dev, skipped) counts.
+    """
+    nlp = spacy.blank(lang)
+    if not append:
+        for split in ("train", "dev"):
+            for shard in glob.glob(os.path.join(output_dir, split, f"{prefix}-*.spacy")):
+                os.remove(shard)
+    writers = {
+        "train": ShardWriter(os.path.join(output_dir, "train"), shard_size, prefix),
+        "dev": ShardWriter(os.path.join(output_dir, "dev"), shard_size, prefix),
+    }
+    skipped = 0
+    for text, annotations in data:
+        doc = make_doc(nlp, text, annotations)
+        if doc is None:
+            skipped += 1
+            continue
+        writers["dev" if is_dev(text, dev_fraction) else "train"].add(doc)
+    for writer in writers.values():
+        writer.flush()
+    print(f"[INFO] Wrote {writers['train'].count} training and {writers['dev'].count} dev docs "
+          f"to {output_dir} ({skipped} skipped)")
+    return writers["train"].count, writers["dev"].count, skipped
+
+def shard_paths(path):
+    """The .spacy shards in a directory (or the single shard at `path`), in order."""
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, "*.spacy")))
+    return [path] if os.path.exists(path) else []
+
+def read_corpus(path, nlp, shuffle=False, seed=None):
+    """
+    Streams training Examples from the shards at `path`, holding one shard
+    in memory at a time. With shuffle=True the shard order and the docs
+    within each shard are shuffled.
+    """
+    rng = random.Random(seed)
+    paths = shard_paths(path)
+    if shuffle:
+        rng.shuffle(paths)
+    for shard in paths:
+        docs = list(DocBin().from_disk(shard).get_docs(nlp.vocab))
+        if shuffle:
+            rng.shuffle(docs)
+        for doc in docs:
+            yield Example(nlp.make_doc(doc.text), doc)
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert TRAIN_DATA into DocBin training shards.")
+    parser.add_argument("--output-dir", default=CORPUS_DIR)
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE)
+    parser.add_argument("--dev-fraction", type=float, default=DEV_FRACTION)
+    args = parser.parse_args()
+
+    from TRAIN_DATA import TRAIN_DATA
+    build_corpus(TRAIN_DATA, args.output_dir, args.shard_size, args.dev_fraction)
+
+if __name__ == '__main__':
+    main()
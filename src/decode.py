@@ -0,0 +1,62 @@
+# File: src/decode.py
+# Purpose: Decodes image files no larger than the caller needs. Phone-camera
+#          scans are 12-48 MP JPEGs while the pipeline works at no more than
+#          PREPROCESS_CONFIG["max_side"] pixels, so JPEGs are decoded with
+#          libjpeg's DCT-domain scaling (1/2, 1/4 or 1/8 of the size, via
+#          Image.draft) and straight to grayscale when colour isn't needed.
+#          The EXIF orientation is read from the header before decoding and
+#          applied to the already reduced image.
+import math
+import os
+
+from PIL import Image, ImageOps
+
+EXIF_ORIENTATION = 0x0112
+
+def target_long_side(size, dpi=None, max_side=None, target_dpi=None, min_trusted_dpi=None):
+    """
+    The long edge, in pixels, the pipeline will scale a page of `size` down
+    to: what target_dpi calls for when the scan's resolution is trusted,
+    capped at max_side. Never more than the page has.
+    """
+    wanted = float(max(size))
+    if target_dpi and dpi and (not min_trusted_dpi or dpi >= min_trusted_dpi):
+        wanted = min(wanted, wanted * target_dpi / float(dpi))
+    if max_side:
+        wanted = min(wanted, max_side)
+    return wanted
+
+def decode_image(path, max_side=None, grayscale=False, target_dpi=None, min_trusted_dpi=None):
+    """
+    Decodes an image file at the cheapest resolution that still gives a long
+    edge of at least target_long_side(...) pixels, upright per its EXIF
+    orientation.
+
+    Only JPEGs can skip work during decoding; other formats are decoded in
+    full and left for the caller to resize. The "dpi" in the returned
+    image's info is scaled with the image, so DPI normalization downstream
+    still lands on target_dpi.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Image not found at {path}")
+    img = Image.open(path)
+    # Both come from the file header; no pixel data has been decoded yet
+    orientation = img.getexif().get(EXIF_ORIENTATION, 1)
+    dpi = img.info.get("dpi", (None, None))[0]
+    full_width = img.size[0]
+
+    if img.format == "JPEG":
+        ratio = target_long_side(img.size, dpi, max_side, target_dpi, min_trusted_dpi) / max(img.size)
+        requested = (math.ceil(img.size[0] * ratio), math.ceil(img.size[1] * ratio))
+        # draft picks the largest DCT reduction that stays at least this big
+        img.draft("L" if grayscale else "RGB", requested)
+    img.load()
+
+    if grayscale and img.mode not in ("L", "1"):
+        img = img.convert("L")
+    if dpi and img.size[0] != full_width:
+        scaled = float(dpi) * img.size[0] / full_width
+        img.info["dpi"] = (scaled, scaled)
+    if orientation != 1:
+        img = ImageOps.exif_transpose(img)
+    return img
@@ -0,0 +1,256 @@
+# File: src/doccano_import.py
+# Purpose: Imports Doccano JSONL exports into the DocBin training corpus
+#          (see corpus.py). Exports are streamed line by line, parsed and
+#          aligned to tokens on a pool of worker processes, deduplicated
+#          against everything imported before, and appended as new shards.
+#
+# The dedupe keys and the names of the shards holding those examples are
+# committed together in corpus_dir/imported.sqlite3. Shards are written
+# under temporary names and only renamed once committed, so an import that
+# fails halfway can simply be run again.
+#
+# Usage: python src/doccano_import.py export1.jsonl [export2.jsonl ...]
+#            [--corpus data/corpus] [--workers N] [--label-map labels.json]
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import spacy
+from spacy.tokens import Doc
+
+from corpus import CORPUS_DIR, SHARD_SIZE, ShardWriter, is_dev, make_doc
+
+CHUNK_LINES = 2000 # Export lines per worker task
+
+# Doccano label names (compared case-insensitively) to the NER model's labels.
+# Labels not listed here are dropped and counted in the summary.
+LABEL_MAP = {
+    "med": "MED",
+    "medication": "MED",
+    "medicine": "MED",
+    "drug": "MED",
+    "strength": "STRENGTH",
+    "dose": "STRENGTH",
+    "dosage": "STRENGTH",
+    "qty": "QTY",
+    "quantity": "QTY",
+    "freq": "FREQ",
+    "frequency": "FREQ",
+    "duration": "DURATION",
+    "instruction": "INSTRUCTION",
+    "instructions": "INSTRUCTION",
+    "sig": "INSTRUCTION",
+}
+
+def dedupe_key(text):
+    """Examples are the same if their text is, ignoring case and spacing."""
+    return hashlib.sha1(" ".join(text.lower().split()).encode("utf-8")).hexdigest()
+
+def parse_record(record, label_map, stats):
+    """
+    Returns (text, {"entities": [...]}) for one Doccano record, or None.
+
+    Handles both export shapes: "label": [[start, end, "Label"], ...] and
+    "entities": [{"start_offset": .., "end_offset": .., "label": ..}, ...].
+    Records with a malformed span are skipped and counted as "bad_record",
+    rather than kept with part of their annotation missing.
+    """
+    if not isinstance(record, dict):
+        stats["bad_record"] += 1
+        return None
+    text = record.get("text") or record.get("data")
+    if not text:
+        stats["no_text"] += 1
+        return None
+    spans = record.get("entities") or record.get("label") or record.get("labels") or []
+    if not isinstance(text, str) or not isinstance(spans, list):
+        stats["bad_record"] += 1
+        return None
+    entities = []
+    for span in spans:
+        if isinstance(span, dict):
+            start, end, label = span.get("start_offset"), span.get("end_offset"), span.get("label")
+        elif isinstance(span, (list, tuple)) and len(span) == 3:
+            start, end, label = span
+        else:
+            stats["bad_record"] += 1
+            return None
+        if (not isinstance(start, int) or not isinstance(end, int) or isinstance(start, bool)
+                or isinstance(end, bool) or not 0 <= start <= end <= len(text) or not isinstance(label, str)):
+            stats["bad_record"] += 1
+            return None
+        mapped = label_map.get(str(label).lower())
+        if mapped is None:
+            stats[f"dropped_label:{label}"] += 1
+            continue
+        # Annotators often drag a span over the surrounding spaces
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            entities.append((start, end, mapped))
+    return text, {"entities": sorted(entities)}
+
+_nlp = None
+
+def _convert_chunk(lines, label_map):
+    """
+    Worker task: parses and aligns a chunk of export lines. Returns the valid
+    examples as (key, words, spaces, IOB tags), which pickle far
+    more cheaply than Docs, plus the chunk's counters.
+    """
+    global _nlp
+    if _nlp is None:
+        _nlp = spacy.blank("en")
+    stats = Counter()
+    examples = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            stats["bad_json"] += 1
+            continue
+        parsed = parse_record(record, label_map, stats)
+        if parsed is None:
+            continue
+        text, annotations = parsed
+        doc = make_doc(_nlp, text, annotations)
+        if doc is None:
+            stats["misaligned"] += 1
+            continue
+        tags = [f"{token.ent_iob_}-{token.ent_type_}" if token.ent_type_ else "O" for token in doc]
+        examples.append((dedupe_key(text), [t.text for t in doc], [bool(t.whitespace_) for t in doc], tags))
+    return examples, stats
+
+def _iter_chunks(paths, chunk_lines):
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            chunk = []
+            for line in f:
+                chunk.append(line)
+                if len(chunk) >= chunk_lines:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+
+def _shard_name(path, corpus_dir):
+    return os.path.relpath(path, corpus_dir).replace(os.sep, "/")
+
+def _recover_shards(conn, corpus_dir):
+    """
+    Finishes what a failed import left behind: staged shards that were
+    committed get their final names, and the rest (whose keys were rolled
+    back) are deleted.
+    """
+    for tmp_path in glob.glob(os.path.join(corpus_dir, "*", "doccano-*.spacy.tmp")):
+        path = tmp_path[:-len(".tmp")]
+        if conn.execute("SELECT 1 FROM shards WHERE name = ?", (_shard_name(path, corpus_dir),)).fetchone():
+            os.replace(tmp_path, path)
+        else:
+            os.remove(tmp_path)
+
+def import_doccano(paths, corpus_dir=CORPUS_DIR, workers=None, label_map=None,
+                   chunk_lines=CHUNK_LINES, shard_size=SHARD_SIZE):
+    """
+    Imports Doccano JSONL exports into `corpus_dir` as doccano-NNNNN.spacy
+    shards in its train/ and dev/ splits.
+
+    Every imported text is remembered in corpus_dir/imported.sqlite3, so
+    re-importing an export, or a later export that repeats earlier lines,
+    only adds the new examples; the first annotation of a text wins.
+    Chunks are processed in parallel but collected in input order, with at
+    most workers * 2 chunks in flight.
+    """
+    workers = workers or os.cpu_count() or 1
+    label_map = {k.lower(): v for k, v in (label_map or LABEL_MAP).items()}
+    vocab = spacy.blank("en").vocab
+    stats = Counter()
+
+    os.makedirs(corpus_dir, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(corpus_dir, "imported.sqlite3"))
+    with conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS imported (key TEXT PRIMARY KEY)")
+        conn.execute("CREATE TABLE IF NOT EXISTS shards (name TEXT PRIMARY KEY)")
+    _recover_shards(conn, corpus_dir)
+    writers = {
+        split: ShardWriter(os.path.join(corpus_dir, split), shard_size, prefix="doccano", staged=True)
+        for split in ("train", "dev")
+    }
+
+    def checkpoint():
+        # Every key inserted so far belongs to a doc in one of the writers, so
+        # both are flushed: the commit then covers exactly the staged shards.
+        for writer in writers.values():
+            writer.flush()
+        for writer in writers.values():
+            conn.executemany("INSERT OR IGNORE INTO shards (name) VALUES (?)",
+                             [(_shard_name(path, corpus_dir),) for path in writer.staged])
+        conn.commit()
+        for writer in writers.values():
+            writer.publish()
+
+    def collect(future):
+        examples, chunk_stats = future.result()
+        stats.update(chunk_stats)
+        for key, words, spaces, tags in examples:
+            if conn.execute("SELECT 1 FROM imported WHERE key = ?", (key,)).fetchone():
+                stats["duplicates"] += 1
+                continue
+            conn.execute("INSERT INTO imported (key) VALUES (?)", (key,))
+            doc = Doc(vocab, words=words, spaces=spaces, ents=tags)
+            writers["dev" if is_dev(doc.text) else "train"].add(doc)
+            stats["imported"] += 1
+        # A full shard was written: commit it with its keys
+        if any(writer.staged for writer in writers.values()):
+            checkpoint()
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for chunk in _iter_chunks(paths, chunk_lines):
+                pending.append(pool.submit(_convert_chunk, chunk, label_map))
+                if len(pending) >= workers * 2:
+                    collect(pending.popleft())
+            while pending:
+                collect(pending.popleft())
+        checkpoint()
+    finally:
+        # Keys not yet committed are rolled back; their staged shards are
+        # removed by _recover_shards on the next run
+        conn.close()
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Import Doccano JSONL exports into the NER training corpus.")
+    parser.add_argument("exports", nargs="+", help="Doccano JSONL export files")
+    parser.add_argument("--corpus", default=CORPUS_DIR)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--label-map", default=None,
+                        help="JSON file mapping Doccano label names to model labels (default: LABEL_MAP)")
+    args = parser.parse_args()
+
+    label_map = None
+    if args.label_map:
+        with open(args.label_map, encoding="utf-8") as f:
+            label_map = json.load(f)
+
+    start = time.perf_counter()
+    stats = import_doccano(args.exports, args.corpus, args.workers, label_map)
+    print(f"--- Imported {stats['imported']} examples in {time.perf_counter() - start:.1f}s ---")
+    for name, count in sorted(stats.items()):
+        if name != "imported":
+            print(f"[INFO] {name}: {count}")
+
+if __name__ == '__main__':
+    main()
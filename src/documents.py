@@ -0,0 +1,91 @@
+# File: src/documents.py
+# Purpose: Ingestion of multi-page documents (fax PDFs and TIFFs). Pages are
+#          counted without decoding them and rasterized one at a time at
+#          RENDER_DPI, so a 50-page fax never sits in memory as a whole.
+#          Each page is processed, cached and reported as its own record,
+#          keyed by document path and page number (1-based).
+#
+# PDF support needs pypdfium2 (pip install pypdfium2); TIFFs only need Pillow.
+import os
+
+from PIL import Image
+
+DOCUMENT_EXTENSIONS = (".pdf", ".tif", ".tiff")
+
+# PDF pages are rasterized at this resolution; TIFF pages keep the scan's own
+# and are rescaled by preprocess_image's DPI normalization.
+RENDER_DPI = int(os.environ.get("MEDICARE_RENDER_DPI", "300"))
+
+def is_document(path):
+    """True for files that may hold several pages."""
+    return isinstance(path, (str, os.PathLike)) and str(path).lower().endswith(DOCUMENT_EXTENSIONS)
+
+def _pdfium():
+    try:
+        import pypdfium2
+    except ImportError:
+        raise ImportError("PDF input requires pypdfium2 (pip install pypdfium2).")
+    return pypdfium2
+
+def count_pages(path):
+    """Number of pages in a PDF or TIFF. Only the document structure is read, no page is decoded."""
+    if str(path).lower().endswith(".pdf"):
+        pdf = _pdfium().PdfDocument(path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+    with Image.open(path) as img:
+        return getattr(img, "n_frames", 1)
+
+def render_page(path, page, dpi=RENDER_DPI):
+    """
+    Decodes one page (1-based) of a PDF or TIFF into a PIL image. PDF pages
+    are rasterized in grayscale at `dpi`, which is recorded in the image's
+    info so preprocess_image doesn't rescale them again.
+    """
+    if str(path).lower().endswith(".pdf"):
+        pdf = _pdfium().PdfDocument(path)
+        try:
+            pdf_page = pdf[page - 1]
+            image = pdf_page.render(scale=dpi / 72.0, grayscale=True).to_pil()
+            pdf_page.close()
+        finally:
+            pdf.close()
+        image.info["dpi"] = (dpi, dpi)
+        return image
+    with Image.open(path) as img:
+        img.seek(page - 1)
+        img.load()
+        # Copy the frame out so the file can be closed
+        image = img.copy()
+        image.info = dict(img.info)
+        return image
+
+def iter_pages(paths):
+    """
+    Expands input files into (path, page) work items. Single images, and
+    TIFFs with one frame, yield (path, None) so they are keyed exactly as
+    before; PDFs and multi-page TIFFs yield one item per page, counted
+    lazily as each document is reached.
+    """
+    for path in paths:
+        if not is_document(path):
+            yield path, None
+            continue
+        try:
+            pages = count_pages(path)
+        except Exception as e:
+            # Handed on as a single item so the failure shows up as an error record
+            print(f"[WARN] Could not open document {path}: {e}")
+            yield path, None
+            continue
+        if pages == 1 and not str(path).lower().endswith(".pdf"):
+            yield path, None
+        else:
+            for page in range(1, pages + 1):
+                yield path, page
+
+def describe_page(path, page):
+    """Label for log lines: the path, plus the page number for document pages."""
+    return f"{path} [page {page}]" if page is not None else str(path)
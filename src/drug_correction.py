@@ -0,0 +1,158 @@
+# File: src/drug_correction.py
+# Purpose: Corrects OCR-mangled drug names ("Metforrnin", "Amoxici11in",
+#          "asprin") to formulary names with a symmetric-delete (SymSpell)
+#          index. Every formulary name's deletions are precomputed once,
+#          so a lookup only generates the deletions of the query token and
+#          checks a handful of candidates, whatever the formulary size.
+import threading
+
+from ner_data import DRUG_INFO, DRUG_ALIASES
+
+MAX_EDIT_DISTANCE = 2
+
+# Digits and letter pairs Tesseract commonly reads in place of letters.
+# Applied before the lookup so they don't use up the edit budget.
+OCR_CONFUSIONS = (
+    ("rn", "m"),
+    ("vv", "w"),
+    ("0", "o"),
+    ("1", "l"),
+    ("5", "s"),
+    ("8", "b"),
+)
+
+def allowed_distance(length, max_distance=MAX_EDIT_DISTANCE):
+    """
+    Edit budget for a name of the given length: short names like "pcm" would
+    otherwise match half the tokens on a page.
+    """
+    if length <= 3:
+        return 0
+    if length <= 5:
+        return min(1, max_distance)
+    return max_distance
+
+def _deletes(word, max_distance):
+    """All strings reachable from `word` by deleting up to max_distance characters."""
+    results = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        next_frontier = set()
+        for item in frontier:
+            if len(item) <= 1:
+                continue
+            for i in range(len(item)):
+                next_frontier.add(item[:i] + item[i + 1:])
+        next_frontier -= results
+        results |= next_frontier
+        frontier = next_frontier
+    return results
+
+def damerau_levenshtein(a, b, max_distance):
+    """
+    Optimal string alignment distance between a and b, or max_distance + 1
+    as soon as it is known to be larger.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous_previous is not None and i > 1 and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+def normalize_ocr_token(token):
+    """Lower-cases a token and undoes the common OCR character confusions."""
+    token = token.lower().strip()
+    for wrong, right in OCR_CONFUSIONS:
+        token = token.replace(wrong, right)
+    return token
+
+class DrugNameCorrector:
+    """
+    Symmetric-delete index from misspelt tokens to formulary names.
+
+    `names` maps each surface form (formulary key or alias) to the DRUG_INFO
+    key it stands for.
+    """
+    def __init__(self, names, max_distance=MAX_EDIT_DISTANCE):
+        self.max_distance = max_distance
+        self.names = {}
+        self.index = {}
+        for name, key in names.items():
+            name = name.lower()
+            self.names[name] = key
+            for variant in _deletes(name, max_distance):
+                self.index.setdefault(variant, []).append(name)
+
+    def _lookup(self, token):
+        best = None
+        seen = set()
+        for variant in _deletes(token, self.max_distance):
+            for name in self.index.get(variant, ()):
+                # Many deletions of the token lead to the same name
+                if name in seen:
+                    continue
+                seen.add(name)
+                budget = allowed_distance(len(name), self.max_distance)
+                distance = damerau_levenshtein(token, name, budget)
+                if distance > budget:
+                    continue
+                # Closest first; on a tie prefer the longer, more specific name
+                if best is None or (distance, -len(name)) < (best[1], -len(best[0])):
+                    best = (name, distance)
+        return best
+
+    def correct(self, token):
+        """
+        Returns (DRUG_INFO key, confidence) for the closest formulary name
+        within the edit budget, or (None, 0.0). Confidence is 1.0 for an
+        exact match and falls with the edit distance between the token as
+        read and the name, relative to the name's length.
+        """
+        token = token.lower().strip()
+        if not token:
+            return None, 0.0
+        if token in self.names:
+            return self.names[token], 1.0
+
+        best = self._lookup(token)
+        normalized = normalize_ocr_token(token)
+        if normalized != token and (best is None or best[1] > 0):
+            candidate = self._lookup(normalized)
+            if candidate is not None and (best is None or candidate[1] < best[1]):
+                best = candidate
+        if best is None:
+            return None, 0.0
+
+        name = best[0]
+        distance = damerau_levenshtein(token, name, len(token) + len(name))
+        confidence = max(0.0, 1.0 - distance / max(len(name), 1))
+        return self.names[name], round(confidence, 3)
+
+_corrector = None
+_corrector_lock = threading.Lock()
+
+def get_drug_corrector():
+    """Returns the corrector for the formulary, building the index once per process."""
+    global _corrector
+    if _corrector is None:
+        with _corrector_lock:
+            if _corrector is None:
+                names = {key: key for key in DRUG_INFO}
+                names.update(DRUG_ALIASES)
+                _corrector = DrugNameCorrector(names)
+    return _corrector
+
+def correct_drug_name(token):
+    """Returns (DRUG_INFO key, confidence) for an OCR token, or (None, 0.0)."""
+    return get_drug_corrector().correct(token)
@@ -0,0 +1,120 @@
+# File: src/drug_scanner.py
+# Purpose: Finds every known drug name in OCR text in one linear pass with
+#          an Aho-Corasick automaton built from DRUG_INFO and DRUG_ALIASES.
+#          Scanning cost depends on the length of the text, not on how many
+#          names the formulary holds.
+import threading
+from collections import deque
+
+from ner_data import DRUG_INFO, DRUG_ALIASES
+
+# Whitespace OCR commonly produces, all mapped to a plain space
+_WHITESPACE = {ord(ch): " " for ch in "\t\n\r\x0b\x0c\xa0"}
+
+def _normalize(text):
+    """
+    Lower-cases the text and turns whitespace into plain spaces, keeping one
+    output character per input character so match offsets line up with the
+    original text.
+    """
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        lowered = "".join(ch.lower() if len(ch.lower()) == 1 else ch for ch in text)
+    return lowered.translate(_WHITESPACE)
+
+class DrugScanner:
+    """
+    Aho-Corasick automaton over a set of drug names.
+
+    `names` maps each surface form (a formulary key or an alias) to the
+    DRUG_INFO key it stands for. Matching is case-insensitive and
+    only whole words count, so "pcm" is not found inside "pcmx".
+    """
+    def __init__(self, names):
+        # State 0 is the root. goto[s] maps a character to the next state,
+        # fail[s] is the longest proper suffix state and out[s] lists the
+        # (name length, key) pairs that end in state s.
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+
+        for name, key in names.items():
+            name = _normalize(name.strip())
+            if not name:
+                continue
+            state = 0
+            for ch in name:
+                next_state = self.goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][ch] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                state = next_state
+            self.out[state].append((len(name), key))
+
+        # Breadth-first pass to fill in the failure links
+        pending = deque(self.goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for ch, next_state in self.goto[state].items():
+                pending.append(next_state)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(ch, 0)
+                self.out[next_state] = self.out[next_state] + self.out[self.fail[next_state]]
+
+    def find_all(self, text):
+        """
+        Returns every whole-word occurrence as (start, end, key), overlapping
+        ones included, in order of where they end.
+        """
+        normalized = _normalize(text)
+        goto, fail, out = self.goto, self.fail, self.out
+        matches = []
+        state = 0
+        for end, ch in enumerate(normalized, 1):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length, key in out[state]:
+                start = end - length
+                if (start == 0 or not normalized[start - 1].isalnum()) and \
+                        (end == len(normalized) or not normalized[end].isalnum()):
+                    matches.append((start, end, key))
+        return matches
+
+    def find(self, text):
+        """
+        Returns the drugs in the text as (start, end, key), leftmost-longest
+        and without overlaps, so "codeine sulfate" wins over a shorter name
+        inside it.
+        """
+        matches = sorted(self.find_all(text), key=lambda m: (m[0], m[0] - m[1]))
+        result = []
+        last_end = 0
+        for start, end, key in matches:
+            if start >= last_end:
+                result.append((start, end, key))
+                last_end = end
+        return result
+
+_scanner = None
+_scanner_lock = threading.Lock()
+
+def get_drug_scanner():
+    """Returns the scanner for the formulary, building it once per process."""
+    global _scanner
+    if _scanner is None:
+        with _scanner_lock:
+            if _scanner is None:
+                names = {key: key for key in DRUG_INFO}
+                names.update(DRUG_ALIASES)
+                _scanner = DrugScanner(names)
+    return _scanner
+
+def find_drugs(text):
+    """Returns the DRUG_INFO keys of every known drug mentioned in the text, in order."""
+    return [key for _, _, key in get_drug_scanner().find(text)]
@@ -0,0 +1,137 @@
+# File: src/drug_store.py
+# Purpose: Compiled drug knowledge store. The monographs are edited in
+#          data/drug_info.json and compiled into an indexed SQLite file, so
+#          importing the formulary costs a stat() rather than parsing every
+#          monograph, and a drug's text is only read when it is looked up.
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import Mapping
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.normpath(os.path.join(SRC_DIR, "..", "data"))
+
+DRUG_SOURCE = os.path.join(DATA_DIR, "drug_info.json")
+DRUG_STORE_PATH = os.path.join(DATA_DIR, "drug_info.sqlite3")
+
+def _source_stamp(source):
+    stat = os.stat(source)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+def build_drug_store(source=DRUG_SOURCE, path=DRUG_STORE_PATH):
+    """
+    Compiles the JSON source into the SQLite store at `path`.
+
+    The store is written to a temporary file and moved into place, so
+    processes reading the old store (or building it at the same time) never
+    see a half-written file.
+    """
+    with open(source, encoding="utf-8") as f:
+        payload = json.load(f)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        with conn:
+            conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            conn.execute("CREATE TABLE drugs (name TEXT PRIMARY KEY) WITHOUT ROWID")
+            # One row per drug and field (sinhala_details, ...), so adding a
+            # language adds rows rather than widening every lookup
+            conn.execute(
+                "CREATE TABLE details ("
+                " name TEXT NOT NULL,"
+                " field TEXT NOT NULL,"
+                " text TEXT NOT NULL,"
+                " PRIMARY KEY (name, field)) WITHOUT ROWID"
+            )
+            conn.execute("CREATE TABLE aliases (alias TEXT PRIMARY KEY, name TEXT NOT NULL) WITHOUT ROWID")
+
+            drugs = payload.get("drugs", {})
+            conn.executemany("INSERT INTO drugs (name) VALUES (?)", ((name,) for name in drugs))
+            conn.executemany(
+                "INSERT INTO details (name, field, text) VALUES (?, ?, ?)",
+                ((name, field, text) for name, fields in drugs.items() for field, text in fields.items()),
+            )
+            conn.executemany("INSERT INTO aliases (alias, name) VALUES (?, ?)", payload.get("aliases", {}).items())
+            conn.execute("INSERT INTO meta (key, value) VALUES ('source', ?)", (_source_stamp(source),))
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    print(f"[INFO] Built drug store with {len(drugs)} drugs at {path}")
+
+def _is_stale(source, path):
+    if not os.path.exists(path):
+        return True
+    try:
+        conn = sqlite3.connect(path)
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError:
+        return True
+    return row is None or row[0] != _source_stamp(source)
+
+class DrugStore(Mapping):
+    """
+    Read-only mapping from drug name to its details ({"sinhala_details": ...}),
+    backed by the compiled store.
+
+    Lookups are single primary-key queries and nothing is cached in memory.
+    The connection is opened on first use and again after a fork, because
+    batch workers inherit the formulary from the parent process and a SQLite
+    connection must not cross a fork.
+    """
+    def __init__(self, path=DRUG_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            if self._conn is None or self._pid != os.getpid():
+                self._conn = sqlite3.connect(self.path, check_same_thread=False)
+                self._conn.execute("PRAGMA query_only = ON")
+                self._pid = os.getpid()
+            return self._conn.execute(sql, params).fetchall()
+
+    def __getitem__(self, name):
+        rows = self._query("SELECT field, text FROM details WHERE name = ?", (name,))
+        if not rows and name not in self:
+            raise KeyError(name)
+        return dict(rows)
+
+    def __contains__(self, name):
+        return bool(self._query("SELECT 1 FROM drugs WHERE name = ?", (name,)))
+
+    def __iter__(self):
+        return iter([name for name, in self._query("SELECT name FROM drugs")])
+
+    def __len__(self):
+        return self._query("SELECT COUNT(*) FROM drugs")[0][0]
+
+    def aliases(self):
+        """Returns {alias: drug name} for every alternative name in the store."""
+        return dict(self._query("SELECT alias, name FROM aliases"))
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def open_drug_store(source=DRUG_SOURCE, path=DRUG_STORE_PATH):
+    """
+    Returns the process-wide store for `path`, compiling it first if it is
+    missing or older than its JSON source.
+    """
+    with _stores_lock:
+        if path not in _stores:
+            if os.path.exists(source) and _is_stale(source, path):
+                build_drug_store(source, path)
+            _stores[path] = DrugStore(path)
+        return _stores[path]
+
+if __name__ == '__main__':
+    build_drug_store()
@@ -1,14 +1,27 @@
 # File: src/gui.py
 import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext
-from PIL import Image, ImageTk
+from PIL import ImageTk
 import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Import the functions from your existing pipeline files
 
-from preprocess import preprocess_image
-from ocr import extract_text_with_ocr
-from ner import extract_structured_data
+from decode import decode_image
+from documents import describe_page, is_document, iter_pages, render_page
+from pipeline import process_prescription, PipelineCancelled
+from tracing import export_record
+
+STAGE_MESSAGES = {
+    "preprocess": "Pre-processing image...",
+    "ocr": "Extracting text with OCR...",
+    "ner": "Structuring data with NER...",
+}
+
+# How often the Tk loop drains progress events from the worker (ms)
+POLL_INTERVAL_MS = 100
 
 class PrescriptionApp:
     def __init__(self, root):
@@ -16,20 +29,38 @@ class PrescriptionApp:
         self.root.title("Prescription Reader AI")
         self.root.geometry("800x600")
 
-        self.image_path = None
+        self.image_paths = []
+
+        # The pipeline runs on a background worker so the window stays
+        # responsive during OCR. One worker processes queued images back to
+        # back and reports progress through self.events, which the Tk loop
+        # polls with root.after.
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pipeline")
+        self.events = queue.Queue()
+        # (future, cancel token) per queued page. Each job has its own
+        # token, so cancelling never reaches pages queued afterwards.
+        self.jobs = []
+        self.running = False
+        self.cancelled = False
 
         # --- GUI Layout ---
-        
+
         # Top Frame for buttons
         top_frame = tk.Frame(self.root, pady=10)
         top_frame.pack(fill=tk.X)
 
-        self.load_button = tk.Button(top_frame, text="Load Prescription Image", command=self.load_image)
+        self.load_button = tk.Button(top_frame, text="Load Prescription Image(s)", command=self.load_image)
         self.load_button.pack(side=tk.LEFT, padx=10)
 
         self.process_button = tk.Button(top_frame, text="Extract Information", command=self.process_image, state=tk.DISABLED)
         self.process_button.pack(side=tk.LEFT, padx=10)
 
+        self.cancel_button = tk.Button(top_frame, text="Cancel", command=self.cancel_processing, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=10)
+
+        self.status_label = tk.Label(top_frame, text="", anchor="w")
+        self.status_label.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=10)
+
         # Main Frame for image and results
         main_frame = tk.Frame(self.root)
         main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -44,77 +75,136 @@ class PrescriptionApp:
         self.results_text.insert(tk.END, "Extracted data will appear here...")
         self.results_text.config(state=tk.DISABLED)
 
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after(POLL_INTERVAL_MS, self.poll_events)
+
     def load_image(self):
-        """Opens a file dialog to select an image."""
-        path = filedialog.askopenfilename(filetypes=[("Image Files", "*.png;*.jpg;*.jpeg;*.bmp")])
-        if not path:
+        """Opens a file dialog to select one or more images or multi-page PDF/TIFF documents."""
+        paths = filedialog.askopenfilenames(filetypes=[
+            ("Prescriptions", "*.png;*.jpg;*.jpeg;*.bmp;*.tif;*.tiff;*.pdf"),
+            ("Image Files", "*.png;*.jpg;*.jpeg;*.bmp"),
+            ("Documents", "*.pdf;*.tif;*.tiff"),
+        ])
+        if not paths:
             return
-        
-        self.image_path = path
-        
-        # Display the selected image
-        img = Image.open(self.image_path)
+
+        self.image_paths = list(paths)
+
+        # Display the first selected image, or the first page of a document
+        first = self.image_paths[0]
+        # Only decode as much of a large scan as the thumbnail needs
+        img = render_page(first, 1, dpi=72) if is_document(first) else decode_image(first, max_side=500)
         img.thumbnail((400, 500)) # Create a thumbnail for display
         photo = ImageTk.PhotoImage(img)
-        
+
         self.image_label.config(image=photo, text="")
         self.image_label.image = photo
-        
+
         self.process_button.config(state=tk.NORMAL) # Enable the process button
-        
-        # Clear previous results
-        self.results_text.config(state=tk.NORMAL)
-        self.results_text.delete(1.0, tk.END)
-        self.results_text.insert(tk.END, "Image loaded. Ready to extract information.")
-        self.results_text.config(state=tk.DISABLED)
+
+        # Clear previous results unless a run is still going
+        if not self.running:
+            self.results_text.config(state=tk.NORMAL)
+            self.results_text.delete(1.0, tk.END)
+            self.results_text.insert(tk.END, f"{len(self.image_paths)} image(s) loaded. Ready to extract information.")
+            self.results_text.config(state=tk.DISABLED)
 
     def process_image(self):
-        """Runs the full backend pipeline on the selected image."""
-        if not self.image_path:
+        """Queues the loaded images to run through the backend pipeline on the worker."""
+        if not self.image_paths:
             messagebox.showerror("Error", "Please load an image first.")
             return
 
-        try:
+        output_dir = "output"
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+
+        if not self.running:
+            self.running = True
             self.results_text.config(state=tk.NORMAL)
             self.results_text.delete(1.0, tk.END)
-            self.results_text.insert(tk.END, "Processing...\n\n1. Pre-processing image...")
-            self.root.update_idletasks() # Refresh the GUI to show the message
-
-            # --- Call your backend functions ---
-            output_dir = "output"
-            if not os.path.exists(output_dir):
-                os.makedirs(output_dir)
-
-            preprocessed_img = preprocess_image(self.image_path, output_dir)
-            self.results_text.insert(tk.END, "\n2. Extracting text with OCR...")
-            self.root.update_idletasks()
-
-            raw_text = extract_text_with_ocr(preprocessed_img)
-            self.results_text.insert(tk.END, "\n3. Structuring data with NER...")
-            self.root.update_idletasks()
-
-            final_data = extract_structured_data(raw_text, output_dir)
-            
-            # --- Display the final results ---
-            self.display_results(final_data)
-
-        except Exception as e:
-            messagebox.showerror("Pipeline Error", f"An error occurred: {e}")
-            self.results_text.insert(tk.END, f"\n\nAn error occurred:\n{e}")
-        finally:
             self.results_text.config(state=tk.DISABLED)
 
-    def display_results(self, data):
-        """Formats and displays the structured data in the GUI."""
+        # Images queued while a run is going simply wait their turn. Documents
+        # are queued page by page; pages are only rendered when their turn comes.
+        self.cancelled = False
+        queued = 0
+        for path, page in iter_pages(self.image_paths):
+            cancel = threading.Event()
+            self.jobs.append((self.executor.submit(self._run_pipeline, path, output_dir, page, cancel), cancel))
+            queued += 1
+        self.status_label.config(text=f"Queued {queued} page(s)")
+        self.cancel_button.config(state=tk.NORMAL)
+
+    def _run_pipeline(self, image_path, output_dir, page, cancel):
+        """
+        Runs on the worker thread, so it only talks to the UI through
+        self.events. Stops before its next stage once `cancel` is set.
+        """
+        name = describe_page(os.path.basename(image_path), page)
+
+        def progress(stage):
+            if cancel.is_set():
+                raise PipelineCancelled()
+            self.events.put(("progress", name, stage))
+
+        try:
+            record = process_prescription(image_path, output_dir, progress=progress, page=page)
+        except PipelineCancelled:
+            self.events.put(("cancelled", name, None))
+            return
+        export_record(record)
+        self.events.put(("done", name, record))
+
+    def cancel_processing(self):
+        """Drops the queued images and stops the running one before its next stage."""
+        self.cancelled = True
+        for job, cancel in self.jobs:
+            cancel.set()
+            job.cancel()
+        self.status_label.config(text="Cancelling...")
+
+    def poll_events(self):
+        """Applies the worker's progress events to the UI from the Tk loop."""
+        try:
+            while True:
+                kind, name, payload = self.events.get_nowait()
+                if kind == "progress":
+                    self.status_label.config(text=f"{name}: {STAGE_MESSAGES.get(payload, payload)}")
+                elif kind == "done" and payload["status"] == "ok":
+                    self.display_results(payload["data"], name)
+                elif kind == "done":
+                    self.display_error(payload["error"], name)
+                elif kind == "cancelled":
+                    self.status_label.config(text=f"{name}: cancelled")
+        except queue.Empty:
+            pass
+
+        self.jobs = [(job, cancel) for job, cancel in self.jobs if not job.done()]
+        if self.running and not self.jobs:
+            self.running = False
+            self.cancel_button.config(state=tk.DISABLED)
+            self.status_label.config(text="Cancelled" if self.cancelled else "Done")
+
+        self.root.after(POLL_INTERVAL_MS, self.poll_events)
+
+    def display_error(self, error, name):
+        """Shows a failed image in the results pane; the rest of the queue carries on."""
         self.results_text.config(state=tk.NORMAL)
-        self.results_text.delete(1.0, tk.END)
+        self.results_text.insert(tk.END, f"=== {name} ===\n\nAn error occurred:\n{error}\n\n")
+        self.results_text.config(state=tk.DISABLED)
+
+    def display_results(self, data, name):
+        """Formats and appends the structured data for one image in the GUI."""
+        self.results_text.config(state=tk.NORMAL)
+        self.results_text.insert(tk.END, f"=== {name} ===\n")
         self.results_text.insert(tk.END, "--- EXTRACTION COMPLETE ---\n\n")
-        
+
         if data.get("patient_name"):
             self.results_text.insert(tk.END, f"👤 Patient: {data['patient_name']}\n")
         if data.get("prescriber"):
             self.results_text.insert(tk.END, f"✍️ Prescriber: {data['prescriber']}\n\n")
-        
+
         self.results_text.insert(tk.END, "--- Medications ---\n")
         if data.get("medications"):
             for med in data["medications"]:
@@ -125,11 +215,18 @@ class PrescriptionApp:
                 self.results_text.insert(tk.END, f"• {drug} {strength} {form}\n")
                 self.results_text.insert(tk.END, f"  Instructions: {instructions}\n\n")
         else:
-            self.results_text.insert(tk.END, "No medication details extracted.\n(Note: This requires a custom-trained NER model for accuracy.)")
-        
+            self.results_text.insert(tk.END, "No medication details extracted.\n(Note: This requires a custom-trained NER model for accuracy.)\n\n")
+
+        self.results_text.see(tk.END)
         self.results_text.config(state=tk.DISABLED)
 
+    def on_close(self):
+        """Stops the worker before the window is destroyed."""
+        self.cancel_processing()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
+
 if __name__ == '__main__':
     root = tk.Tk()
     app = PrescriptionApp(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
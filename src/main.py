@@ -5,12 +5,15 @@
 # ===================================================================
 import os
 import json
-from PIL import Image, ImageDraw, ImageFont
+import argparse
+from PIL import Image, ImageDraw
 
 # Import our custom modules
-from preprocess import preprocess_image
-from ocr import extract_text_with_ocr
-from ner import extract_structured_data
+from pipeline import process_prescription
+from batch import run_batch_pipeline
+from sink import open_sink
+from synth import get_font
+from tracing import configure as configure_tracing, export_record, span, write_metrics
 
 def create_advanced_dummy_image(path):
     """
@@ -21,15 +24,10 @@ def create_advanced_dummy_image(path):
     img = Image.new('RGB', (800, 600), color='white')
     draw = ImageDraw.Draw(img)
     
-    try:
-        # Use a common font, fall back to default if not found
-        font_title = ImageFont.truetype("arial.ttf", 24)
-        font_body = ImageFont.truetype("arial.ttf", 20)
-        font_small = ImageFont.truetype("arial.ttf", 18)
-    except IOError:
-        font_title = ImageFont.load_default()
-        font_body = ImageFont.load_default()
-        font_small = ImageFont.load_default()
+    # Fonts are loaded once per process; falls back to the default if not found
+    font_title = get_font("arial.ttf", 24)
+    font_body = get_font("arial.ttf", 20)
+    font_small = get_font("arial.ttf", 18)
     
     # --- Draw the new prescription ---
     draw.text((30, 20), "Central City Medical Group", fill='black', font=font_title)
@@ -59,12 +57,15 @@ def create_advanced_dummy_image(path):
     img.save(path)
     print(f"New dummy image saved to '{path}'")
 
-def run_pipeline():
-    """Main function to orchestrate the prescription reading process."""
+def run_pipeline(output_dir="output", save_debug=False, use_cache=True, results_path=None):
+    """
+    Main function to orchestrate the prescription reading process. Debug
+    images and the results file (unless `results_path` is given) go to
+    output_dir.
+    """
     raw_image_dir = os.path.join("data", "raw")
     image_name = "sample_prescription.png"
     image_path = os.path.join(raw_image_dir, image_name)
-    output_dir = "output"
 
     os.makedirs(raw_image_dir, exist_ok=True)
     os.makedirs(output_dir, exist_ok=True)
@@ -75,22 +76,46 @@ def run_pipeline():
 
     print(f"--- Starting Advanced Pipeline for {image_path} ---")
 
-    preprocessed_image = preprocess_image(image_path, output_dir)
-    raw_text = extract_text_with_ocr(preprocessed_image)
-    final_data = extract_structured_data(raw_text, output_dir)
+    record = process_prescription(image_path, output_dir, save_debug=save_debug, use_cache=use_cache)
+    export_record(record)
+    with open_sink(results_path or os.path.join(output_dir, "results.jsonl")) as sink:
+        with span("output.write", image=image_path):
+            sink.write(record)
+    write_metrics()
+    if record["status"] != "ok":
+        print(f"Pipeline failed: {record['error']}")
+        return
 
     print("\n--- FINAL EXTRACTED STRUCTURED DATA ---")
-    print(json.dumps(final_data, indent=2))
+    print(json.dumps(record["data"], indent=2))
     print("--- PIPELINE COMPLETE ---")
 
 if __name__ == '__main__':
-    # If the old sample image exists, let's remove it to generate the new one.
-    old_sample_path = os.path.join("data", "raw", "sample_prescription.png")
-    if os.path.exists(old_sample_path):
-        # This is a simple way to force the new image to be created.
-        # We check the file size. A small file size is likely our old simple image.
-        if os.path.getsize(old_sample_path) < 10000: # 10KB threshold
-             print("Old sample image detected. Deleting it to create the new advanced one.")
-             os.remove(old_sample_path)
+    parser = argparse.ArgumentParser(description="Read prescription images into structured data.")
+    parser.add_argument("source", nargs="?", help="Image directory or glob pattern to process in batch mode; PDFs and multi-page TIFFs are processed page by page")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for batch mode (default: one per core)")
+    parser.add_argument("--output-dir", default="output", help="Directory for pipeline output")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore the result cache and always run every stage")
+    parser.add_argument("--results", default=None, help="JSON Lines file to append results to (default: <output-dir>/results.jsonl); a .parquet path writes a new Parquet file")
+    parser.add_argument("--save-debug", action="store_true", help="Also write preprocessed images to the output directory")
+    parser.add_argument("--trace", action="store_true", help="Record per-stage spans to output/traces.jsonl and metrics to output/metrics.prom (also MEDICARE_TRACE=1)")
+    args = parser.parse_args()
+
+    if args.trace:
+        configure_tracing(enabled=True)
+
+    if args.source:
+        run_batch_pipeline(args.source, args.output_dir, workers=args.workers,
+                           save_debug=args.save_debug, use_cache=not args.no_cache, results_path=args.results)
+    else:
+        # If the old sample image exists, let's remove it to generate the new one.
+        old_sample_path = os.path.join("data", "raw", "sample_prescription.png")
+        if os.path.exists(old_sample_path):
+            # This is a simple way to force the new image to be created.
+            # We check the file size. A small file size is likely our old simple image.
+            if os.path.getsize(old_sample_path) < 10000: # 10KB threshold
+                 print("Old sample image detected. Deleting it to create the new advanced one.")
+                 os.remove(old_sample_path)
 
-    run_pipeline()
+        run_pipeline(args.output_dir, save_debug=args.save_debug, use_cache=not args.no_cache,
+                     results_path=args.results)
@@ -1,63 +1,188 @@
 # File: src/ner.py
-import re
-
-def extract_structured_data(raw_text, output_dir):
-    """
-    Uses Regular Expressions (Regex) to parse OCR text from a specific format
-    and translates medical abbreviations.
-    """
-    print("[INFO] Structuring data with Regex and abbreviation mapping...")
-
-    # Dictionary to map medical shorthand to full text
-    abbreviations = {
-        "BID": "twice a day",
-        "TID": "three times a day",
-        "QD": "once a day",
-        "QID": "four times a day",
-        "PRN": "as needed"
-    }
-
-    # --- Extract Patient and Doctor ---
-    patient_name = "Not Found"
-    # Search for a pattern like "name Vola Smith ace 24"
-    match = re.search(r"name (.*?) ace", raw_text, re.IGNORECASE)
-    if match:
-        patient_name = match.group(1).strip()
-
-    prescriber = "Not Found"
-    # Search for a pattern like "De Steve: dalinson"
-    match = re.search(r"De Steve: (.*)", raw_text, re.IGNORECASE)
-    if match:
-        prescriber = match.group(1).strip()
-
-    # --- Extract Medications ---
+import os
+import threading
+
+from rules import ABBREVIATIONS, extract_people, extract_medications
+from drug_scanner import get_drug_scanner
+from drug_correction import get_drug_corrector
+from tracing import span
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "models", "prescription_ner_model")
+
+# "spacy" uses the trained model, "regex" the hand-written patterns and
+# "auto" the model when spaCy and the model are available, else the regexes.
+NER_MODE = os.environ.get("MEDICARE_NER_MODE", "auto")
+NER_BATCH_SIZE = 256
+# Pipeline components to leave out when loading the model. The trained
+# pipeline only has "ner" today; anything else added later is skipped here.
+NER_DISABLED_PIPES = ()
+
+_nlps = {}
+_nlp_lock = threading.Lock()
+
+def get_nlp(model_dir=MODEL_DIR):
+    """
+    Returns the trained spaCy NER pipeline in model_dir, loading it on first use.
+
+    Each model directory is loaded once per process; the lock makes sure
+    concurrent threads (GUI worker, server) don't load it twice.
+    """
+    key = os.path.abspath(model_dir)
+    with _nlp_lock:
+        if key not in _nlps:
+            import spacy
+            print(f"[INFO] Loading NER model from '{model_dir}'...")
+            _nlps[key] = spacy.load(model_dir, disable=list(NER_DISABLED_PIPES))
+        return _nlps[key]
+
+_auto_mode = None
+
+def _resolve_mode(mode):
+    """Turns "auto" into "spacy" or "regex" depending on what is installed."""
+    global _auto_mode
+    mode = mode or NER_MODE
+    if mode != "auto":
+        return mode
+    if _auto_mode is None:
+        try:
+            get_nlp()
+            _auto_mode = "spacy"
+        except (ImportError, OSError, ValueError) as e:
+            print(f"[INFO] spaCy model unavailable ({e}), using Regex extraction.")
+            _auto_mode = "regex"
+    return _auto_mode
+
+def ner_settings():
+    """
+    The NER settings that change results, for the result cache key. "auto"
+    is resolved first, by trying to load the model, so results extracted by
+    the Regex fallback are never keyed as spaCy results.
+    """
+    return {"mode": NER_MODE, "resolved": _resolve_mode(None), "disabled_pipes": list(NER_DISABLED_PIPES)}
+
+# Entity labels of the trained model and the medication fields they fill
+ENTITY_FIELDS = {
+    "STRENGTH": "strength",
+    "QTY": "quantity",
+    "FREQ": "frequency",
+    "DURATION": "duration",
+    "INSTRUCTION": "note",
+}
+
+def _medications_from_doc(doc):
+    """
+    Groups the entities on one OCR line into medications. Every MED entity
+    starts a new medication; the entities after it fill in its details.
+    """
     medications = []
-    # Regex to find lines with drug names, dosage, and frequency shorthand
-    # Example line: "Betsloe 100mg - 1 tab BID"
-    med_pattern = re.compile(r"(\w+\s?\w*)\s+(\d+\s?m[g|l]).*?(\bBID\b|\bTID\b|\bQD\b|\bQID\b)", re.IGNORECASE)
-    
-    found_meds = med_pattern.findall(raw_text)
-    
-    for med in found_meds:
-        drug_name = med[0].strip()
-        strength = med[1].strip()
-        freq_abbr = med[2].upper() # Ensure abbreviation is uppercase for dictionary lookup
-        
-        # Translate the abbreviation to full text, default to the abbreviation if not found
-        full_instructions = abbreviations.get(freq_abbr, freq_abbr)
-        
-        medications.append({
-            "drug_name": drug_name,
-            "strength": strength,
-            "form": "Tablet",  # Assuming 'Tablet' as a default form
-            "instructions": f"Take 1 tablet {full_instructions}"
+    fields = None
+    for ent in doc.ents:
+        if ent.label_ == "MED":
+            fields = {"drug_name": ent.text}
+            medications.append(fields)
+        elif fields is not None and ent.label_ in ENTITY_FIELDS:
+            fields.setdefault(ENTITY_FIELDS[ent.label_], ent.text)
+
+    results = []
+    for fields in medications:
+        frequency = fields.get("frequency", "")
+        instructions = " ".join(part for part in (
+            "Take",
+            fields.get("quantity", ""),
+            ABBREVIATIONS.get(frequency.upper(), frequency),
+            f"for {fields['duration']}" if fields.get("duration") else "",
+            fields.get("note", ""),
+        ) if part)
+        results.append({
+            "drug_name": fields["drug_name"],
+            "strength": fields.get("strength", ""),
+            "form": "Tablet",
+            "instructions": instructions
         })
+    return results
+
+def _extract_medications_spacy(raw_texts, batch_size, n_process):
+    """
+    Runs every non-empty line of every text through the model in a single
+    nlp.pipe stream and returns one medication list per text.
+    """
+    nlp = get_nlp()
+    lines = ((line.strip(), index)
+             for index, raw_text in enumerate(raw_texts)
+             for line in raw_text.splitlines() if line.strip())
+    medications = [[] for _ in raw_texts]
+    with nlp.select_pipes(enable=["ner"]):
+        for doc, index in nlp.pipe(lines, as_tuples=True, batch_size=batch_size, n_process=n_process):
+            medications[index].extend(_medications_from_doc(doc))
+    return medications
+
+def _match_formulary(drug_name, scanner):
+    """
+    Returns (DRUG_INFO key, confidence) for a medication name: an exact
+    formulary name in it first, else the best OCR-error correction of one
+    of its words.
+    """
+    found = scanner.find(drug_name)
+    if found:
+        return found[0][2], 1.0
+    corrector = get_drug_corrector()
+    best = (None, 0.0)
+    for token in drug_name.split():
+        key, confidence = corrector.correct(token)
+        if confidence > best[1]:
+            best = (key, confidence)
+    return best
+
+def extract_structured_data_batch(raw_texts, output_dir, mode=None, batch_size=NER_BATCH_SIZE, n_process=1):
+    """
+    Structures many OCR texts at once. In spaCy mode all their lines are
+    batched through the model together, which is much faster than calling
+    extract_structured_data once per text.
+    """
+    raw_texts = list(raw_texts)
+    requested_mode = mode or NER_MODE
+    mode = _resolve_mode(mode)
+    print(f"[INFO] Structuring {len(raw_texts)} text(s) with {'spaCy NER' if mode == 'spacy' else 'Regex'} and abbreviation mapping...")
+
+    with span("ner.extract", mode=mode, texts=len(raw_texts)):
+        if mode == "spacy":
+            medications = _extract_medications_spacy(raw_texts, batch_size, n_process)
+            if requested_mode == "auto":
+                # Fall back to the Regex patterns for texts the model found nothing in
+                medications = [meds or extract_medications(raw_text)
+                               for raw_text, meds in zip(raw_texts, medications)]
+        elif mode == "regex":
+            medications = [extract_medications(raw_text) for raw_text in raw_texts]
+        else:
+            raise ValueError(f"Unknown NER mode: {mode}")
+
+    scanner = get_drug_scanner()
+    results = []
+    with span("ner.lookup", texts=len(raw_texts)):
+        for raw_text, meds in zip(raw_texts, medications):
+            patient_name, prescriber = extract_people(raw_text)
 
-    # --- Final structured data ---
-    final_data = {
-        "patient_name": patient_name,
-        "prescriber": prescriber,
-        "medications": medications
-    }
+            # Link each medication to its formulary entry, and list every known
+            # drug in the text, including ones the patterns above missed
+            for med in meds:
+                med["formulary_name"], med["formulary_confidence"] = _match_formulary(med["drug_name"], scanner)
+            detected_drugs = list(dict.fromkeys(key for _, _, key in scanner.find(raw_text)))
 
-    return final_data
\ No newline at end of file
+            # --- Final structured data ---
+            results.append({
+                "patient_name": patient_name,
+                "prescriber": prescriber,
+                "medications": meds,
+                "detected_drugs": detected_drugs
+            })
+    return results
+
+def extract_structured_data(raw_text, output_dir, mode=None, batch_size=NER_BATCH_SIZE, n_process=1):
+    """
+    Parses OCR text into patient, prescriber and medications, translating
+    medical abbreviations.
+
+    `mode` picks the trained spaCy model ("spacy"), the Regular Expressions
+    ("regex") or the model when it is available ("auto", the default).
+    """
+    return extract_structured_data_batch([raw_text], output_dir, mode, batch_size, n_process)[0]
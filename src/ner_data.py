@@ -1,130 +1,12 @@
+# File: src/ner_data.py
+# Drug information for the formulary. The monographs are maintained in
+# data/drug_info.json and compiled into an indexed store (see drug_store.py);
+# DRUG_INFO is a read-only mapping over it, so a drug's details are only
+# read from disk when they are looked up.
+from drug_store import open_drug_store
 
-DRUG_INFO = {
-    "empa": {
-        "sinhala_details": "එම්පා (Empa) යනු දියවැඩියාව පාලනය කිරීමට භාවිතා කරන ඖෂධයකි. එය දිනකට වරක් ආහාර ගැනීමෙන් පසු ගන්න. වැඩිදුර විස්තර සඳහා වෛද්‍යවරයාගෙන් විමසන්න."
-    },
-    "glix": {
-        "sinhala_details": "ග්ලික්ස් (glix) යනු දියවැඩියාව සඳහා භාවිතා කරන තවත් ඖෂධයකි. එය දිනකට දෙවරක් ගත යුතුය."
-    },
-    "metformin": {
-        "sinhala_details": "මෙට්ෆෝමින් (Metformin) යනු දියවැඩියාව සඳහා බහුලව භාවිතා වන ඖෂධයකි. මෙය ශරීරයේ සීනි මට්ටම පාලනය කිරීමට උපකාරී වේ. සාමාන්‍යයෙන් ආහාර සමඟ දිනකට වරක් හෝ දෙවරක් ගත යුතුය."
-    },
-    "clopet": {
-        "sinhala_details": "ක්ලෝපෙට් (Clopet) යනු හෘද රෝග සහ ආඝාත වැළැක්වීම සඳහා භාවිතා කරන ඖෂධයකි. එය රුධිර කැටි ගැසීම වැළැක්වීමට උපකාරී වේ. සාමාන්‍යයෙන් රාත්‍රී කාලයේදී ගත යුතුය."
-    },
-    "asprin": {
-        "sinhala_details": "ඇස්ප්‍රින් (Aspirin) යනු වේදනාව, උණ සහ දැවිල්ල අඩු කිරීමට භාවිතා කරන ඖෂධයකි. එය හෘද රෝග වැළැක්වීමටද යොදා ගත හැකිය. සාමාන්‍යයෙන් ආහාර ගැනීමෙන් පසු ගත යුතුය."
-    },
-    "amoxicillin": {
-        "sinhala_details": "ඇමොක්සිලින් (Amoxicillin) යනු බැක්ටීරියා ආසාදනවලට ප්‍රතිකාර කිරීමට භාවිතා කරන ප්‍රතිජීවකයකි. උගුර, කන්, පෙනහලු ආසාදන සඳහා මෙය නියම කෙරේ. වෛද්‍යවරයාගේ උපදෙස් පරිදි නිශ්චිත කාලයක් තුළ නිසි මාත්‍රාව ගන්න."
-    },
-    "paracetamol": {
-        "sinhala_details": "පැරසිටමෝල් (Paracetamol) යනු වේදනාව සහ උණ අඩු කිරීමට භාවිතා කරන පොදු ඖෂධයකි. එය හිසරදය, සෙම්ප්‍රතිශ්‍යාව වැනි රෝග සඳහා සුදුසුය. අවශ්‍ය වූ විට පමණක් ගන්න."
-    },
-    "ranitidine": {
-        "sinhala_details": "රනිටිඩීන් (Ranitidine) යනු අම්ල පිත්ත රෝග සහ අජීර්ණය සඳහා භාවිතා කරන ඖෂධයකි. මෙය ආමාශයේ ඇති අම්ල ප්‍රමාණය අඩු කිරීමට උපකාරී වේ. සාමාන්‍යයෙන් දිනකට දෙවරක් ගත යුතුය."
-    },
-    "omeprazole": {
-        "sinhala_details": "ඔමෙප්‍රසෝල් (Omeprazole) යනු අම්ල පිත්ත රෝග, ගැස්ට්‍රයිටිස් සහ ආමාශයේ වණ සඳහා භාවිතා කරන ඖෂධයකි. මෙය හිස් බඩ උදෑසන ගත යුතුය."
-    },
-    "losartan": {
-        "sinhala_details": "ලොසාටන් (Losartan) යනු අධි රුධිර පීඩනය පාලනය කිරීමට භාවිතා කරන ඖෂධයකි. එය දිනකට වරක් නිශ්චිත වේලාවක ගත යුතුය."
-    },
-    "atorvastatin": {
-        "sinhala_details": "ඇටෝවාස්ටැටින් (Atorvastatin) යනු කොලෙස්ටරෝල් මට්ටම අඩු කිරීමට භාවිතා කරන ඖෂධයකි. එය සාමාන්‍යයෙන් රාත්‍රී කාලයේදී ගත යුතුය."
-    },
-    "simvastatin": {
-        "sinhala_details": "සිම්වාස්ටැටින් (Simvastatin) යනු රුධිරයේ ඇති කොලෙස්ටරෝල් මට්ටම අඩු කිරීමට භාවිතා කරන ඖෂධයකි. එය දිනකට වරක් රාත්‍රී ආහාරයෙන් පසු ගන්න."
-    },
-    "levothyroxine": {
-        "sinhala_details": "ලෙවෝතයිරොක්සින් (Levothyroxine) යනු තයිරොයිඩ් ග්‍රන්ථියේ අඩුවක් සඳහා භාවිතා කරන ඖෂධයකි. මෙය හිස් බඩ උදෑසන ගත යුතුය."
-    },
-    "sertraline": {
-        "sinhala_details": "සර්ට්‍රැලීන් (Sertraline) යනු මානසික අවපීඩනය සහ කාංසාව සඳහා භාවිතා කරන ඖෂධයකි. වෛද්‍ය උපදෙස් අනුව නිසි මාත්‍රාව නිශ්චිත කාලයකට ගන්න."
-    },
-    "ibuprofen": {
-        "sinhala_details": "ඉබුප්‍රොෆෙන් (Ibuprofen) යනු වේදනාව, උණ සහ දැවිල්ල අඩු කිරීමට භාවිතා කරන ඖෂධයකි. එය හිසරදය, සන්ධි වේදනාව වැනි රෝග සඳහා සුදුසුය. ආහාර ගැනීමෙන් පසු ගන්න."
-    },
-    "diclofenac": {
-        "sinhala_details": "ඩයික්ලෝෆෙනැක් (Diclofenac) යනු වේදනාව සහ දැවිල්ල අඩු කිරීමට භාවිතා කරන ඖෂධයකි. එය මාංශ පේශි වේදනාව, ආතරයිටිස් සඳහා සුදුසුය. ආහාර සමඟ ගැනීම වඩාත් සුදුසුය."
-    },
-    "cephalexin": {
-        "sinhala_details": "සෙෆලෙක්සින් (Cephalexin) යනු බැක්ටීරියා ආසාදනවලට ප්‍රතිකාර කිරීමට භාවිතා කරන ප්‍රතිජීවකයකි. වෛද්‍යවරයාගේ උපදෙස් අනුව නිශ්චිත කාලයක් තුළ නිසි මාත්‍රාව ගන්න."
-    },
-    "azithromycin": {
-        "sinhala_details": "ඇසිට්‍රොමයිසින් (Azithromycin) යනු බැක්ටීරියා ආසාදන සඳහා භාවිතා කරන ප්‍රතිජීවකයකි. එය පෙනහලු, උගුර සහ සමේ ආසාදන සඳහා නියම කෙරේ. වෛද්‍ය උපදෙස් අනුව ගත යුතුය."
-    },
-    "doxycycline": {
-        "sinhala_details": "ඩොක්සිසයික්ලින් (Doxycycline) යනු බැක්ටීරියා ආසාදන, කුරුලෑ සහ මැලේරියාව වැළැක්වීම සඳහා භාවිතා කරන ප්‍රතිජීවකයකි. එය සාමාන්‍යයෙන් ආහාර සමඟ හෝ වෛද්‍යවරයාගේ උපදෙස් අනුව ගත යුතුය."
-    },
-    "prednisolone": {
-        "sinhala_details": "ප්‍රෙඩ්නිසොලෝන් (Prednisolone) යනු දැවිල්ල අඩු කිරීමට සහ ප්‍රතිශක්තිකරණ පද්ධතියේ රෝග සඳහා භාවිතා කරන ඖෂධයකි. වෛද්‍යවරයාගේ උපදෙස් අනුව පමණක් ගත යුතුය."
-    },
-    
-        "phenacetin": {
-        "sinhala_details": "පෙනසෙටින් (Phenacetin) යනු වේදනා නාශක ඖෂධයකි. මෙය වෛද්‍ය උපදෙස් අනුව පමණක් භාවිතා කරන්න."
-    },
-    "codeine sulfate": {
-        "sinhala_details": "කෝඩීන් සල්ෆේට් (Codeine sulfate) යනු වේදනාව සහ කැස්ස සඳහා භාවිතා කරන ඖෂධයකි. මෙය වෛද්‍යවරයාගේ උපදෙස් අනුව නිශ්චිත මාත්‍රාවකින් ගත යුතුය."
-    },
-    "acetylsalicylic acid": {
-        "sinhala_details": "ඇසිටිල්සැලිසිලික් අම්ලය (Acetylsalicylic acid) යනු වේදනාව, උණ සහ දැවිල්ල අඩු කිරීමට භාවිතා කරන ඖෂධයකි. එය ඇස්ප්‍රින් ලෙසද හැඳින්වේ. සාමාන්‍යයෙන් ආහාර ගැනීමෙන් පසු ගත යුතුය."
-    },
-    "betaloc": {
-        "sinhala_details": "බීටාලොක් (Betaloc) යනු අධි රුධිර පීඩනය සහ හෘද රෝග සඳහා භාවිතා කරන ඖෂධයකි. මෙය වෛද්‍ය උපදෙස් අනුව නිශ්චිත වේලාවක ගත යුතුය."
-    },
-    "dorzolamidum": {
-        "sinhala_details": "ඩොර්සොලමයිඩම් (Dorzolamidum) යනු ග්ලුකෝමා රෝගය සඳහා භාවිතා කරන අක්ෂි බිංදු වර්ගයකි. මෙය වෛද්‍ය උපදෙස් අනුව නිවැරදිව භාවිතා කරන්න."
-    },
-    "oxprelol": {
-        "sinhala_details": "ඔක්ස්ප්‍රෙලෝල් (Oxprelol) යනු අධි රුධිර පීඩනය සහ හෘද ස්පන්දනය පාලනය කිරීමට භාවිතා කරන ඖෂධයකි. මෙය වෛද්‍ය උපදෙස් අනුව නිශ්චිත මාත්‍රාවකින් ගත යුතුය."
-    },
-    "salbutomol": {
-        "sinhala_details": "සැල්බුටමෝල් (Salbutomol) යනු ඇදුම රෝගය සහ ශ්වසන අපහසුතා සඳහා භාවිතා කරන ඖෂධයකි. මෙය අවශ්‍ය විටකදී පමණක් භාවිතා කරන්න."
-    },
-    "pcm": {
-        "sinhala_details": "PCM (Paracetamol) යනු පැරසිටමෝල් සඳහා භාවිතා කරන කෙටි යෙදුමකි. එය වේදනාව සහ උණ අඩු කිරීමට භාවිතා කරයි. අවශ්‍ය වූ විට පමණක් ගන්න."
-    },
-    "cetrizin": {
-        "sinhala_details": "සෙට්‍රිසීන් (Cetrizin) යනු අසාත්මිකතා (allergies) සඳහා භාවිතා කරන ඖෂධයකි. මෙය කැසීම, සෙම්ප්‍රතිශ්‍යාව වැනි රෝග ලක්ෂණ සමනය කිරීමට උපකාරී වේ."
-    },
-    "herbes sar": {
-        "sinhala_details": "Herbes sar යනු වෛද්‍ය උපදෙස් අනුව ගත යුතු ඖෂධයකි. එය නිශ්චිත රෝග තත්ත්වයක් සඳහා නියම කර ඇත."
-    },
-    "repace": {
-        "sinhala_details": "Repace යනු වෛද්‍ය උපදෙස් අනුව ගත යුතු ඖෂධයකි. එහි භාවිතය සහ මාත්‍රාව වෛද්‍යවරයා විසින් තීරණය කරනු ලැබේ."
-    },
-    "vaprer": {
-        "sinhala_details": "Vaprer යනු වෛද්‍ය උපදෙස් අනුව ගත යුතු ඖෂධයකි."
-    },
-    "ecorin": {
-        "sinhala_details": "Ecorin යනු වෛද්‍ය උපදෙස් අනුව ගත යුතු ඖෂධයකි. එහි භාවිතය සහ මාත්‍රාව වෛද්‍යවරයා විසින් තීරණය කරනු ලැබේ."
-    },
-    "lactalose": {
-        "sinhala_details": "ලැක්ටුලෝස් (Lactalose) යනු මලබද්ධය සඳහා භාවිතා කරන ඖෂධයකි. එය දිනකට වරක් හෝ දෙවරක් ගත හැකිය."
-    },
-    "diazepam": {
-        "sinhala_details": "ඩයසෙපෑම් (Diazepam) යනු කාංසාව, මාංශ පේශි කැක්කුම සහ කැළඹීම් සඳහා භාවිතා කරන ඖෂධයකි. මෙය වෛද්‍ය උපදෙස් අනුව පමණක් ගත යුතුය."
-    },
-    "paregoric": {
-        "sinhala_details": "පරෙගොරික් (Paregoric) යනු පාචනය සහ කැස්ස සඳහා භාවිතා කරන ඖෂධයකි. මෙය වෛද්‍ය උපදෙස් අනුව නිශ්චිත මාත්‍රාවකින් ගත යුතුය."
-    },
-    "kaoprectate": {
-        "sinhala_details": "Kaoprectate යනු පාචනය සඳහා භාවිතා කරන ඖෂධයකි. වෛද්‍ය උපදෙස් අනුව ගත යුතුය."
-    },
-    "dextromethorphan": {
-        "sinhala_details": "ඩෙක්ස්ට්‍රොමෙතෝෆාන් (Dextromethorphan) යනු කැස්ස සඳහා භාවිතා කරන ඖෂධයකි. අවශ්‍ය වූ විට පමණක් ගත යුතුය."
-    },
-    "guaifenesin": {
-        "sinhala_details": "ගුවයිෆෙනසීන් (Guaifenesin) යනු ශ්වසන මාර්ගයේ සෙම ඉවත් කිරීම සඳහා භාවිතා කරන ඖෂධයකි. මෙය කැස්ස සහ සෙම්ප්‍රතිශ්‍යාව සඳහා සුදුසුය."
-    },
-    "alcohol": {
-        "sinhala_details": "මත්පැන් (Alcohol) යනු විෂබීජ නාශකයක් ලෙස හෝ වෙනත් ඖෂධ සමඟ මිශ්‍ර කිරීමට භාවිතා වේ."
-    },
-    "thorazine": {
-        "sinhala_details": "තොරසීන් (Thorazine) යනු මානසික රෝග සඳහා භාවිතා කරන ඖෂධයකි. මෙය වෛද්‍ය උපදෙස් අනුව පමණක් ගත යුතුය."
-    },
-    "ciprofloxacin": {
-        "sinhala_details": "සිප්‍රොෆ්ලොක්සැසින් (Ciprofloxacin) යනු බැක්ටීරියා ආසාදන සඳහා භාවිතා කරන ප්‍රතිජීවකයකි. මෙය වෛද්‍යවරයාගේ උපදෙස් අනුව නිශ්චිත කාලයක් තුළ ගත යුතුය."
-    }
-}
\ No newline at end of file
+DRUG_INFO = open_drug_store()
+
+# Other names a drug is written under on prescriptions (generic names,
+# brands, common spellings), mapped to its key in DRUG_INFO.
+DRUG_ALIASES = DRUG_INFO.aliases()
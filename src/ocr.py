@@ -1,6 +1,14 @@
 # File: src/ocr.py
+import importlib.util
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pytesseract
 from PIL import Image
+from preprocess import load_image, describe_image
+from segment import find_text_lines
+from tracing import span
 
 # ----------------- ADD THIS LINE -----------------
 # Tell pytesseract where to find the Tesseract-OCR executable.
@@ -8,19 +16,329 @@ from PIL import Image
 pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 # -------------------------------------------------
 
-def extract_text_with_ocr(preprocessed_image_path):
+OCR_LANG = "eng"
+
+# "auto" uses the in-process engine when tesserocr is installed and falls back
+# to the pytesseract executable otherwise.
+OCR_BACKEND = os.environ.get("MEDICARE_OCR_BACKEND", "auto")
+
+# "lines" splits the page into text lines (segment.py) and reads each line
+# crop in single-line mode; "page" hands Tesseract the whole page;
+# "adaptive" reads the page once at reduced resolution and re-reads only the
+# lines Tesseract was unsure about. "auto" uses "lines" with the in-process
+# tesserocr engine and "page" with pytesseract, where every line crop would
+# cost a tesseract process of its own.
+OCR_LAYOUT = os.environ.get("MEDICARE_OCR_LAYOUT", "auto")
+
+# Tesseract page segmentation mode for a single text line
+PSM_SINGLE_LINE = 7
+
+# Default settings of the "adaptive" layout. Pass a dict with any of these
+# keys as `config` to extract_text_with_ocr to override them for a call.
+ADAPTIVE_CONFIG = {
+    "first_pass_scale": 0.5, # The whole page is read once at this scale
+    "min_confidence": 70, # Lines whose mean word confidence (0-100) is lower are re-read
+    # Tried in turn on the full-resolution crop of a low-confidence line until
+    # one clears min_confidence; otherwise the most confident read is kept.
+    # Upscaling and raw-line mode (psm 13) help with handwriting.
+    "retries": (
+        {"scale": 1.0, "psm": PSM_SINGLE_LINE},
+        {"scale": 2.0, "psm": PSM_SINGLE_LINE},
+        {"scale": 2.0, "psm": 13},
+    ),
+    "padding": 4, # Pixels added around a line crop
+}
+
+class PytesseractBackend:
+    """Runs the tesseract executable for every image (one process per call)."""
+    name = "pytesseract"
+
+    def image_to_string(self, image, psm=None):
+        config = f"--psm {psm}" if psm is not None else ""
+        return pytesseract.image_to_string(image, lang=OCR_LANG, config=config)
+
+    def image_to_data(self, image, psm=None):
+        config = f"--psm {psm}" if psm is not None else ""
+        data = pytesseract.image_to_data(image, lang=OCR_LANG, config=config, output_type=pytesseract.Output.DICT)
+        words = []
+        for i, text in enumerate(data["text"]):
+            conf = float(data["conf"][i])
+            if conf < 0 or not text.strip():
+                continue
+            left, top = data["left"][i], data["top"][i]
+            words.append({
+                "text": text.strip(),
+                "conf": conf,
+                "bbox": (left, top, left + data["width"][i], top + data["height"][i]),
+                "line": (data["block_num"][i], data["par_num"][i], data["line_num"][i]),
+            })
+        return words
+
+class TesserocrBackend:
+    """
+    Keeps a Tesseract engine loaded in-process through the tesserocr binding.
+
+    The traineddata is loaded once per thread and reused for every image,
+    so there is no process start-up, temp file or model load per call.
+    """
+    name = "tesserocr"
+
+    def __init__(self):
+        import tesserocr
+        self._tesserocr = tesserocr
+        self._local = threading.local()
+
+    def _tessdata_path(self):
+        """Finds tessdata next to the configured executable unless TESSDATA_PREFIX is set."""
+        if os.environ.get("TESSDATA_PREFIX"):
+            return os.environ["TESSDATA_PREFIX"]
+        tessdata = os.path.join(os.path.dirname(pytesseract.pytesseract.tesseract_cmd), "tessdata")
+        return tessdata if os.path.isdir(tessdata) else None
+
+    def _api(self):
+        # PyTessBaseAPI is not thread-safe, so every thread gets its own engine.
+        api = getattr(self._local, "api", None)
+        if api is None:
+            path = self._tessdata_path()
+            if path:
+                api = self._tesserocr.PyTessBaseAPI(path=path, lang=OCR_LANG)
+            else:
+                api = self._tesserocr.PyTessBaseAPI(lang=OCR_LANG)
+            self._local.api = api
+        return api
+
+    def image_to_string(self, image, psm=None):
+        api = self._api()
+        api.SetPageSegMode(psm if psm is not None else self._tesserocr.PSM.AUTO)
+        api.SetImage(image)
+        return api.GetUTF8Text()
+
+    def image_to_data(self, image, psm=None):
+        api = self._api()
+        api.SetPageSegMode(psm if psm is not None else self._tesserocr.PSM.AUTO)
+        api.SetImage(image)
+        api.Recognize()
+        RIL = self._tesserocr.RIL
+        words = []
+        line = -1
+        iterator = api.GetIterator()
+        if iterator is None:
+            return words
+        for word in self._tesserocr.iterate_level(iterator, RIL.WORD):
+            if word.IsAtBeginningOf(RIL.TEXTLINE):
+                line += 1
+            text = word.GetUTF8Text(RIL.WORD)
+            conf = word.Confidence(RIL.WORD)
+            if conf < 0 or not text or not text.strip():
+                continue
+            words.append({"text": text.strip(), "conf": conf, "bbox": word.BoundingBox(RIL.WORD), "line": line})
+        return words
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+def get_ocr_backend(name=None):
+    """
+    Returns the OCR backend for this process, creating it on first use.
+    """
+    name = name or OCR_BACKEND
+    with _backends_lock:
+        if name not in _backends:
+            if name == "pytesseract":
+                backend = PytesseractBackend()
+            elif name in ("tesserocr", "auto"):
+                try:
+                    backend = TesserocrBackend()
+                except ImportError:
+                    if name == "tesserocr":
+                        raise
+                    print("[INFO] tesserocr not installed (pip install tesserocr), falling back to the "
+                          "pytesseract executable, which starts a tesseract process per image.")
+                    backend = PytesseractBackend()
+            else:
+                raise ValueError(f"Unknown OCR backend: {name}")
+            print(f"[INFO] OCR backend: {backend.name} (MEDICARE_OCR_BACKEND={name})")
+            _backends[name] = backend
+        return _backends[name]
+
+def ocr_settings():
+    """
+    The OCR settings that change the text read, for the result cache key.
+    "auto" is resolved the same way get_ocr_backend resolves it, without
+    creating the engine.
+    """
+    backend = OCR_BACKEND
+    if backend in _backends:
+        backend = _backends[backend].name
+    elif backend == "auto":
+        backend = "tesserocr" if importlib.util.find_spec("tesserocr") else "pytesseract"
+    layout = _resolve_layout(OCR_LAYOUT, backend)
+    settings = {"backend": backend, "lang": OCR_LANG, "layout": layout}
+    if layout == "adaptive":
+        settings["adaptive"] = ADAPTIVE_CONFIG
+    return settings
+
+def _resolve_layout(layout, backend_name):
+    if layout == "auto":
+        return "lines" if backend_name == "tesserocr" else "page"
+    return layout
+
+_line_pool = None
+_line_pool_lock = threading.Lock()
+
+def _get_line_pool():
+    """
+    Returns the thread pool that OCRs the line crops of a page, or None to
+    read them one after another. MEDICARE_OCR_LINE_WORKERS sets its size
+    (default: one per core); it is read on first use, so batch and server
+    workers, which already run a page per core, can set it to 1 after forking.
+    """
+    global _line_pool
+    with _line_pool_lock:
+        if _line_pool is None:
+            workers = int(os.environ.get("MEDICARE_OCR_LINE_WORKERS", "0")) or os.cpu_count() or 1
+            _line_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr-line") if workers > 1 else False
+        return _line_pool or None
+
+def _ocr_lines(image, engine, lines):
+    """
+    OCRs each text line of the page separately and returns the page text, or
+    None when no lines were found. Segments of a row are joined with two
+    spaces and rows with newlines; every non-empty segment is also appended
+    to `lines` as {"text", "bbox", "row"}.
+    """
+    rows = find_text_lines(np.asarray(image))
+    boxes = [(row_index, box) for row_index, row in enumerate(rows) for box in row]
+    if not boxes:
+        return None
+
+    read = lambda item: engine.image_to_string(image.crop(item[1]), psm=PSM_SINGLE_LINE).strip()
+    pool = _get_line_pool()
+    texts = list(pool.map(read, boxes)) if pool else [read(item) for item in boxes]
+
+    row_texts = [[] for _ in rows]
+    for (row_index, box), text in zip(boxes, texts):
+        if text:
+            row_texts[row_index].append(text)
+            if lines is not None:
+                lines.append({"text": text, "bbox": [int(v) for v in box], "row": row_index})
+    return "\n".join("  ".join(parts) for parts in row_texts if parts)
+
+def _scaled(image, scale):
+    if scale == 1.0:
+        return image
+    if image.mode == "1":
+        image = image.convert("L")
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    return image.resize(size, Image.BILINEAR)
+
+def _read_words(engine, image, scale, psm=None):
+    """Word-level OCR of the image at `scale`, with boxes in the coordinates of the unscaled image."""
+    words = engine.image_to_data(_scaled(image, scale), psm=psm)
+    for word in words:
+        word["bbox"] = tuple(int(round(v / scale)) for v in word["bbox"])
+    return words
+
+def _summarize_line(words):
+    """Joins the words of one line into {"text", "conf", "bbox"}; conf is the mean word confidence."""
+    return {
+        "text": " ".join(word["text"] for word in words),
+        "conf": sum(word["conf"] for word in words) / len(words),
+        "bbox": (
+            min(word["bbox"][0] for word in words), min(word["bbox"][1] for word in words),
+            max(word["bbox"][2] for word in words), max(word["bbox"][3] for word in words),
+        ),
+    }
+
+def _reread_line(image, engine, line, settings):
+    """
+    Re-reads a low-confidence line from its full-resolution crop with each
+    of the retry settings in turn, and returns the line with the most
+    confident text found.
+    """
+    pad = settings["padding"]
+    x0, y0, x1, y1 = line["bbox"]
+    crop = image.crop((max(0, x0 - pad), max(0, y0 - pad), min(image.width, x1 + pad), min(image.height, y1 + pad)))
+    best = dict(line, passes=1)
+    for attempt in settings["retries"]:
+        best["passes"] += 1
+        words = _read_words(engine, crop, attempt["scale"], attempt["psm"])
+        if words:
+            candidate = _summarize_line(words)
+            if candidate["conf"] > best["conf"]:
+                best.update(text=candidate["text"], conf=candidate["conf"])
+        if best["conf"] >= settings["min_confidence"]:
+            break
+    return best
+
+def _ocr_adaptive(image, engine, lines, settings):
+    """
+    Reads the page once at reduced resolution with word confidences, then
+    spends more passes only on the lines below min_confidence (in parallel,
+    like the "lines" layout). Returns the page text, or None when the first
+    pass found no words. Every line is appended to `lines` with its
+    confidence and the number of passes it took.
+    """
+    with span("ocr.first_pass", scale=settings["first_pass_scale"]):
+        words = _read_words(engine, image, settings["first_pass_scale"])
+    if not words:
+        return None
+
+    grouped = {}
+    for word in words:
+        grouped.setdefault(word["line"], []).append(word)
+    page_lines = [dict(_summarize_line(line_words), passes=1) for line_words in grouped.values()]
+    weak = [i for i, line in enumerate(page_lines) if line["conf"] < settings["min_confidence"]]
+    print(f"[INFO] Adaptive OCR: re-reading {len(weak)} of {len(page_lines)} line(s) below "
+          f"confidence {settings['min_confidence']}")
+
+    if weak:
+        with span("ocr.retry", lines=len(weak)):
+            reread = lambda i: _reread_line(image, engine, page_lines[i], settings)
+            pool = _get_line_pool()
+            for i, line in zip(weak, pool.map(reread, weak) if pool else map(reread, weak)):
+                page_lines[i] = line
+
+    if lines is not None:
+        for row, line in enumerate(page_lines):
+            lines.append({
+                "text": line["text"],
+                "bbox": [int(v) for v in line["bbox"]],
+                "row": row,
+                "conf": round(line["conf"], 1),
+                "passes": line["passes"],
+            })
+    return "\n".join(line["text"] for line in page_lines)
+
+def extract_text_with_ocr(preprocessed_image, backend=None, layout=None, lines=None, config=None):
     """
     Uses Tesseract OCR to extract text from the preprocessed image.
+
+    Accepts the decoded image handed over by preprocess_image (PIL image or
+    NumPy array) as well as a file path. With the "lines" layout (the
+    default with tesserocr, see OCR_LAYOUT) only the detected text lines
+    are read, in parallel; with "adaptive" the page is read cheaply first and only
+    low-confidence lines get further passes (see ADAPTIVE_CONFIG, which
+    `config` overrides). Either way the page is read whole if no text is
+    found. If a `lines` list is given, the text and bounding box of every
+    line read are appended to it.
+
+    OCR errors, such as a missing or crashing Tesseract, are raised rather
+    than read as an empty page, so the pipeline records the image as failed.
     """
-    print(f"[INFO] Extracting text from: {preprocessed_image_path}")
-    try:
-        # Open the image and use pytesseract to extract the text
-        text = pytesseract.image_to_string(Image.open(preprocessed_image_path))
-        print("--- OCR Text Found ---")
-        print(text)
-        print("----------------------")
-        return text
-    except Exception as e:
-        # This will now give a more specific error if something else is wrong
-        print(f"Error during OCR: {e}")
-        return ""
\ No newline at end of file
+    print(f"[INFO] Extracting text from: {describe_image(preprocessed_image)}")
+    # Run the image through the process-wide OCR engine
+    engine = get_ocr_backend(backend)
+    image = load_image(preprocessed_image)
+    text = None
+    layout = _resolve_layout(layout or OCR_LAYOUT, engine.name)
+    if layout == "lines":
+        text = _ocr_lines(image, engine, lines)
+    elif layout == "adaptive":
+        text = _ocr_adaptive(image, engine, lines, dict(ADAPTIVE_CONFIG, **(config or {})))
+    if text is None:
+        text = engine.image_to_string(image)
+    print("--- OCR Text Found ---")
+    print(text)
+    print("----------------------")
+    return text
@@ -0,0 +1,151 @@
+# File: src/pipeline.py
+import os
+import time
+
+from preprocess import PREPROCESS_CONFIG, preprocess_image
+from ocr import extract_text_with_ocr, ocr_settings
+from ner import extract_structured_data, ner_settings
+from templates import TEMPLATES_ENABLED, match_template, read_template_fields, fields_to_data
+from cache import content_hash, get_result_cache
+from documents import RENDER_DPI, render_page
+from tracing import span, trace
+
+class PipelineCancelled(Exception):
+    """Raised from a progress callback to stop a run between stages."""
+
+def pipeline_config():
+    """The runtime settings that change a result, which are part of the result cache key."""
+    return {
+        "render_dpi": RENDER_DPI,
+        "preprocess": PREPROCESS_CONFIG,
+        "ocr": ocr_settings(),
+        "templates": TEMPLATES_ENABLED,
+        "ner": ner_settings(),
+    }
+
+def _debug_name(image_path, page):
+    """Name for the debug image: pages of one document each get their own file."""
+    if page is None or not isinstance(image_path, (str, os.PathLike)):
+        return None
+    stem, ext = os.path.splitext(os.path.basename(image_path))
+    return f"{stem}_p{page}{ext}"
+
+def process_prescription(image_path, output_dir, save_debug=False, use_cache=True, progress=None, page=None):
+    """
+    Runs preprocess -> OCR -> NER on a single image. Pages printed on a
+    registered clinic pad (see templates.py) only have their field regions
+    OCR'd.
+
+    Returns a result record with the structured data and the time spent in
+    each stage. Errors are recorded on the record instead of being raised,
+    so a batch run can carry on past a bad scan. The decoded image is passed
+    between stages in memory; `save_debug` also writes it to output_dir.
+
+    With `use_cache`, a re-uploaded image (same bytes, same pipeline code,
+    settings and model version) is answered from the result cache without
+    running any stage.
+
+    With `page`, image_path is a PDF or TIFF document and only that page
+    (1-based) is rasterized and processed; the record is keyed by both (see
+    documents.py). Its content hash is that of the rendered page.
+
+    `progress`, if given, is called with the name of each stage ("preprocess",
+    "ocr", "ner") before it starts. It may raise PipelineCancelled to stop
+    the run; that exception is passed on to the caller.
+
+    With tracing enabled (see tracing.py), the run's spans are attached to
+    the record as "spans" for the caller to export with
+    tracing.export_record, since a batch worker cannot export them itself.
+    """
+    report = progress or (lambda stage: None)
+    record = {"image": image_path, "status": "ok", "timings": {}}
+    if page is not None:
+        record["page"] = page
+    timings = record["timings"]
+    start = time.perf_counter()
+
+    with trace("pipeline", image=str(image_path)) as root:
+        if root:
+            # Filled in as the spans finish, the root's own included
+            record["spans"] = root.spans
+        try:
+            source = image_path
+            if page is not None:
+                stage_start = time.perf_counter()
+                with span("render", page=page) as s:
+                    source = render_page(image_path, page)
+                    if s:
+                        s.set(bytes_out=len(source.tobytes()))
+                timings["render"] = time.perf_counter() - stage_start
+
+            stage_start = time.perf_counter()
+            with span("hash") as s:
+                record["content_hash"] = content_hash(source)
+                if s and isinstance(image_path, str):
+                    s.set(bytes_in=os.path.getsize(image_path))
+            timings["hash"] = time.perf_counter() - stage_start
+
+            cache = None
+            if use_cache:
+                stage_start = time.perf_counter()
+                with span("cache_lookup") as s:
+                    cache = get_result_cache(config=pipeline_config())
+                    cached = cache.get(record["content_hash"])
+                    s.set(hit=cached is not None)
+                timings["cache_lookup"] = time.perf_counter() - stage_start
+                if cached is not None:
+                    print(f"[INFO] Cache hit for {image_path}")
+                    record["data"] = cached
+                    record["cached"] = True
+                    timings["total"] = time.perf_counter() - start
+                    return record
+
+            report("preprocess")
+            stage_start = time.perf_counter()
+            timings["preprocess_steps"] = {}
+            with span("preprocess") as s:
+                preprocessed_image = preprocess_image(source, output_dir, save_debug=save_debug,
+                                                      debug_name=_debug_name(image_path, page),
+                                                      timings=timings["preprocess_steps"])
+                s.set(bytes_out=preprocessed_image.nbytes)
+            timings["preprocess"] = time.perf_counter() - stage_start
+
+            report("ocr")
+            stage_start = time.perf_counter()
+            with span("ocr", bytes_in=preprocessed_image.nbytes) as s:
+                template = match_template(preprocessed_image)
+                if template is not None:
+                    record["template"] = template["name"]
+                    fields = read_template_fields(preprocessed_image, template)
+                    raw_text = "\n".join(text for text in fields.values() if text)
+                else:
+                    record["ocr_lines"] = []
+                    raw_text = extract_text_with_ocr(preprocessed_image, lines=record["ocr_lines"])
+                if s:
+                    s.set(bytes_out=len(raw_text.encode("utf-8")))
+            timings["ocr"] = time.perf_counter() - stage_start
+
+            report("ner")
+            stage_start = time.perf_counter()
+            with span("ner") as s:
+                if template is not None:
+                    record["data"] = fields_to_data(fields, template, output_dir)
+                else:
+                    record["data"] = extract_structured_data(raw_text, output_dir)
+                if s:
+                    s.set(bytes_in=len(raw_text.encode("utf-8")))
+            timings["ner"] = time.perf_counter() - stage_start
+
+            # A page with no text read is not cached, so it gets another try
+            if cache is not None and raw_text.strip():
+                cache.put(record["content_hash"], record["data"])
+        except PipelineCancelled:
+            raise
+        except Exception as e:
+            record["status"] = "error"
+            record["error"] = f"{type(e).__name__}: {e}"
+            if root:
+                root.set(error=record["error"])
+
+        timings["total"] = time.perf_counter() - start
+    return record
@@ -0,0 +1,59 @@
+# File: src/rules.py
+# Purpose: Regex rule engine for the NER stage. All patterns and lookup
+#          tables are built once at import time, so extracting from a
+#          text is a single finditer pass with no per-call setup.
+import re
+
+# Dictionary to map medical shorthand to full text
+ABBREVIATIONS = {
+    "BID": "twice a day",
+    "BD": "twice a day",
+    "TID": "three times a day",
+    "TDS": "three times a day",
+    "QD": "once a day",
+    "QID": "four times a day",
+    "PRN": "as needed",
+    "NOCTE": "at night",
+}
+
+# Frequency shorthand that closes a medication match, compiled into the
+# medication pattern as one alternation
+MED_FREQUENCIES = ("BID", "TID", "QD", "QID")
+
+# Lines with drug names, dosage, and frequency shorthand
+# Example line: "Betsloe 100mg - 1 tab BID"
+MED_PATTERN = re.compile(
+    r"(?P<drug>\w+\s?\w*)\s+(?P<strength>\d+\s?m[g|l]).*?\b(?P<freq>" + "|".join(MED_FREQUENCIES) + r")\b",
+    re.IGNORECASE,
+)
+
+# A pattern like "name Vola Smith ace 24"
+PATIENT_PATTERN = re.compile(r"name (.*?) ace", re.IGNORECASE)
+
+# A pattern like "De Steve: dalinson"
+PRESCRIBER_PATTERN = re.compile(r"De Steve: (.*)", re.IGNORECASE)
+
+def extract_people(raw_text):
+    """Returns (patient_name, prescriber), with "Not Found" for anything missing."""
+    match = PATIENT_PATTERN.search(raw_text)
+    patient_name = match.group(1).strip() if match else "Not Found"
+    match = PRESCRIBER_PATTERN.search(raw_text)
+    prescriber = match.group(1).strip() if match else "Not Found"
+    return patient_name, prescriber
+
+def extract_medications(raw_text):
+    """
+    Finds every medication in the text in one pass over it.
+    """
+    medications = []
+    for match in MED_PATTERN.finditer(raw_text):
+        # Translate the abbreviation to full text, default to the abbreviation if not found
+        freq_abbr = match.group("freq").upper()
+        full_instructions = ABBREVIATIONS.get(freq_abbr, freq_abbr)
+        medications.append({
+            "drug_name": match.group("drug").strip(),
+            "strength": match.group("strength").strip(),
+            "form": "Tablet",  # Assuming 'Tablet' as a default form
+            "instructions": f"Take 1 tablet {full_instructions}"
+        })
+    return medications
@@ -0,0 +1,72 @@
+# File: src/segment.py
+# Purpose: Finds the text lines on a preprocessed (binarized) page with
+#          OpenCV morphology and connected components, so OCR only runs on
+#          line crops instead of margins, letterhead rules and signature
+#          scribbles.
+import cv2
+import numpy as np
+
+# Default segmentation settings. Pass a dict with any of these keys as
+# `config` to find_text_lines to override them for a call.
+SEGMENT_CONFIG = {
+    # Horizontal closing joins the letters and words of a line into one blob.
+    # The kernel width is a fraction of the page width, at least min_kernel.
+    "kernel_width_fraction": 0.02,
+    "min_kernel": 9,
+    "min_height": 8, # Pixels; smaller blobs are specks
+    "max_height_fraction": 0.15, # Of the page height; taller blobs are graphics/scribbles
+    "min_width": 10,
+    "min_ink": 0.03, # Share of dark pixels in the box below which it is noise
+    "max_ink": 0.65, # Above which it is a filled graphic, logo, stamp or thick rule
+    "padding": 4, # Pixels added around each crop so ascenders aren't clipped
+}
+
+def find_text_lines(array, config=None):
+    """
+    Returns the text line boxes (x0, y0, x1, y1) on a page as rows in
+    reading order: rows top to bottom, and the boxes of a row (e.g.
+    "Patient Name" and "Date" at its two ends) left to right.
+
+    `array` is a grayscale or binarized page with dark text on a light
+    background, as produced by preprocess_image.
+    """
+    settings = dict(SEGMENT_CONFIG, **(config or {}))
+    if array.ndim == 3:
+        array = cv2.cvtColor(array, cv2.COLOR_RGB2GRAY)
+    height, width = array.shape
+    _, ink = cv2.threshold(array, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+
+    kernel_width = max(settings["min_kernel"], int(width * settings["kernel_width_fraction"]))
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_width, 1))
+    blobs = cv2.morphologyEx(ink, cv2.MORPH_CLOSE, kernel)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(blobs, connectivity=8)
+
+    max_height = height * settings["max_height_fraction"]
+    pad = settings["padding"]
+    boxes = []
+    for x, y, w, h, _ in stats[1:count]: # Label 0 is the background
+        if h < settings["min_height"] or h > max_height or w < settings["min_width"]:
+            continue
+        density = np.count_nonzero(ink[y:y + h, x:x + w]) / float(w * h)
+        if density < settings["min_ink"] or density > settings["max_ink"]:
+            continue
+        boxes.append((max(0, x - pad), max(0, y - pad), min(width, x + w + pad), min(height, y + h + pad)))
+    return reading_order(boxes)
+
+def reading_order(boxes):
+    """
+    Sorts boxes into rows (boxes whose vertical centre falls inside the row
+    so far) from top to bottom, and each row from left to right. Returns a
+    list of rows, each a list of boxes.
+    """
+    rows = []
+    for box in sorted(boxes, key=lambda b: (b[1] + b[3]) / 2):
+        centre = (box[1] + box[3]) / 2
+        if rows and rows[-1]["top"] <= centre <= rows[-1]["bottom"]:
+            row = rows[-1]
+            row["boxes"].append(box)
+            row["top"] = min(row["top"], box[1])
+            row["bottom"] = max(row["bottom"], box[3])
+        else:
+            rows.append({"top": box[1], "bottom": box[3], "boxes": [box]})
+    return [sorted(row["boxes"], key=lambda b: b[0]) for row in rows]
@@ -0,0 +1,326 @@
+# File: src/server.py
+# Purpose: Local HTTP inference service for pharmacy front-ends. Built on
+#          asyncio streams from the standard library. Images are POSTed and
+#          answered with the structured JSON record, by a pool of worker
+#          processes that keep Tesseract, the spaCy model and the formulary
+#          indexes warm between requests.
+#
+# Usage: python src/server.py [--host 127.0.0.1] [--port 8080] [--workers N]
+#            [--queue-size N] [--timeout 60]
+#
+#   POST /v1/prescriptions   body: the image bytes (?name=scan.png optional)
+#                            200 record | 422 pipeline error | 429 queue full
+#                            | 503 pool down | 504 timed out
+#   GET  /health             200 {"status": "ok", ...} | 503 when the pool is down
+#   GET  /metrics            Prometheus text format
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import parse_qs, urlsplit
+
+from tracing import export_record, render_metrics
+
+HOST = os.environ.get("MEDICARE_HOST", "127.0.0.1")
+PORT = int(os.environ.get("MEDICARE_PORT", "8080"))
+REQUEST_TIMEOUT = 60.0 # Seconds a request may wait and run before 504
+HEADER_TIMEOUT = 10.0 # Seconds a client gets to send the request headers
+MAX_BODY_BYTES = 20 * 1024 * 1024
+MAX_HEADER_BYTES = 16 * 1024
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    411: "Length Required", 413: "Payload Too Large", 422: "Unprocessable Entity",
+    429: "Too Many Requests", 500: "Internal Server Error", 503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Paths counted under their own label; any other request is counted as
+# "other", so clients can't create a metrics series per URL
+ROUTES = ("/v1/prescriptions", "/health", "/metrics")
+
+def _label_value(value):
+    """Escapes a Prometheus label value."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _warm_worker():
+    """
+    Pool initializer: loads everything a request needs before the first one
+    arrives, so no request pays for model loading or index building.
+    """
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+    os.environ.setdefault("MEDICARE_OCR_LINE_WORKERS", "1")
+    from drug_correction import get_drug_corrector
+    from drug_scanner import get_drug_scanner
+    from ner import _resolve_mode
+    from ocr import get_ocr_backend
+
+    get_drug_scanner()
+    get_drug_corrector()
+    _resolve_mode(None)
+    try:
+        from PIL import Image
+        get_ocr_backend().image_to_string(Image.new("L", (32, 32), 255))
+    except Exception as e:
+        print(f"[WARN] OCR warm-up failed: {e}")
+
+def _process_upload(data, name, output_dir, use_cache):
+    """Worker task: runs the pipeline on uploaded image bytes."""
+    from pipeline import process_prescription
+
+    suffix = os.path.splitext(name)[1] or ".png"
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix="upload_")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        record = process_prescription(path, output_dir, use_cache=use_cache)
+    finally:
+        os.remove(path)
+    record["image"] = name
+    return record
+
+class ServiceMetrics:
+    """Request counters for the /metrics endpoint, next to the pipeline span metrics."""
+    def __init__(self):
+        self.requests = {}
+        self.latency_buckets = [0] * len(LATENCY_BUCKETS)
+        self.latency_sum = 0.0
+        self.latency_count = 0
+
+    def observe(self, path, status, seconds):
+        if path not in ROUTES:
+            path = "other"
+        key = (path, status)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        if path == "/v1/prescriptions":
+            self.latency_sum += seconds
+            self.latency_count += 1
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    self.latency_buckets[i] += 1
+
+    def render(self, queued, capacity, workers):
+        lines = [
+            "# HELP medicare_http_requests_total HTTP requests by path and status code.",
+            "# TYPE medicare_http_requests_total counter",
+        ]
+        for (path, status), count in sorted(self.requests.items()):
+            lines.append(f'medicare_http_requests_total{{path="{_label_value(path)}",code="{status}"}} {count}')
+        lines += [
+            "# HELP medicare_request_seconds Latency of prescription requests.",
+            "# TYPE medicare_request_seconds histogram",
+        ]
+        for bound, count in zip(LATENCY_BUCKETS, self.latency_buckets):
+            lines.append(f'medicare_request_seconds_bucket{{le="{bound}"}} {count}')
+        lines.append(f'medicare_request_seconds_bucket{{le="+Inf"}} {self.latency_count}')
+        lines.append(f"medicare_request_seconds_sum {self.latency_sum:.6f}")
+        lines.append(f"medicare_request_seconds_count {self.latency_count}")
+        lines += [
+            "# HELP medicare_queue_depth Requests running or waiting for a worker.",
+            "# TYPE medicare_queue_depth gauge",
+            f"medicare_queue_depth {queued}",
+            "# HELP medicare_queue_capacity Requests accepted before answering 429.",
+            "# TYPE medicare_queue_capacity gauge",
+            f"medicare_queue_capacity {capacity}",
+            "# HELP medicare_workers Worker processes in the pool.",
+            "# TYPE medicare_workers gauge",
+            f"medicare_workers {workers}",
+        ]
+        return "\n".join(lines) + "\n"
+
+class PrescriptionService:
+    """
+    HTTP front-end over a warm ProcessPoolExecutor.
+
+    At most `workers + queue_size` requests are accepted at once; the rest
+    get 429 with Retry-After straight away instead of piling up. A request
+    that hasn't finished within `timeout` seconds gets 504. A job that is
+    already running can't be interrupted in its worker, so it keeps its
+    slot until it actually finishes; the bound therefore always reflects
+    the work the pool really has.
+    """
+    def __init__(self, workers=None, queue_size=None, timeout=REQUEST_TIMEOUT, output_dir="output", use_cache=True):
+        self.workers = workers or os.cpu_count() or 1
+        self.capacity = self.workers + (queue_size if queue_size is not None else self.workers * 4)
+        self.timeout = timeout
+        self.output_dir = output_dir
+        self.use_cache = use_cache
+        self.pending = 0
+        self.metrics = ServiceMetrics()
+        self.pool = None
+        self.pool_ok = False
+
+    def start_pool(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+        # Start (and warm) every worker now rather than on the first requests
+        for future in [self.pool.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+        self.pool_ok = True
+        print(f"[INFO] {self.workers} warm worker(s) ready, queue capacity {self.capacity}")
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, future):
+        self.pending -= 1
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            self.pool_ok = False
+
+    async def predict(self, data, name):
+        """Returns (status, body) for one uploaded image."""
+        if self.pending >= self.capacity:
+            return 429, {"error": "Server busy, retry later"}
+        try:
+            future = self.pool.submit(_process_upload, data, name, self.output_dir, self.use_cache)
+        except BrokenProcessPool:
+            self.pool_ok = False
+            return 503, {"error": "Worker pool is down"}
+        self.pending += 1
+        # add_done_callback fires in the pool's thread; hop back to the loop
+        loop = asyncio.get_running_loop()
+        future.add_done_callback(lambda f: loop.call_soon_threadsafe(self._release, f))
+        try:
+            # On timeout wait_for cancels the job, which only succeeds if it
+            # is still waiting for a worker
+            record = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            return 504, {"error": f"Timed out after {self.timeout:.0f}s"}
+        except BrokenProcessPool:
+            return 503, {"error": "Worker pool is down"}
+        except Exception as e:
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+        export_record(record)
+        return (200 if record["status"] == "ok" else 422), record
+
+    async def handle(self, reader, writer):
+        """Serves requests on one connection, keeping it open while the client wants."""
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), HEADER_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._respond(writer, 400, {"error": "Headers too large"}, keep_alive=False)
+                    break
+
+                start = time.perf_counter()
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "Malformed request line"}, keep_alive=False)
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        key, value = line.split(":", 1)
+                        headers[key.strip().lower()] = value.strip()
+                keep_alive = (headers.get("connection", "").lower() != "close"
+                              and version.upper() == "HTTP/1.1")
+
+                url = urlsplit(target)
+                status, body, content_type = await self._dispatch(method, url, headers, reader)
+                if status in (400, 411, 413):
+                    keep_alive = False # The body may not have been read
+                await self._respond(writer, status, body, keep_alive, content_type)
+                self.metrics.observe(url.path, status, time.perf_counter() - start)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, url, headers, reader):
+        if url.path == "/health":
+            if method != "GET":
+                return 405, {"error": "Use GET"}, None
+            body = {"status": "ok" if self.pool_ok else "down", "workers": self.workers,
+                    "queued": self.pending, "capacity": self.capacity}
+            return (200 if self.pool_ok else 503), body, None
+
+        if url.path == "/metrics":
+            if method != "GET":
+                return 405, {"error": "Use GET"}, None
+            text = self.metrics.render(self.pending, self.capacity, self.workers) + render_metrics()
+            return 200, text, "text/plain; version=0.0.4"
+
+        if url.path == "/v1/prescriptions":
+            if method != "POST":
+                return 405, {"error": "Use POST"}, None
+            if "content-length" not in headers:
+                return 411, {"error": "Content-Length required"}, None
+            try:
+                length = int(headers["content-length"])
+            except ValueError:
+                return 400, {"error": "Bad Content-Length"}, None
+            if length > MAX_BODY_BYTES:
+                return 413, {"error": f"Image larger than {MAX_BODY_BYTES} bytes"}, None
+            try:
+                data = await asyncio.wait_for(reader.readexactly(length), self.timeout)
+            except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                return 400, {"error": "Incomplete body"}, None
+            if not data:
+                return 400, {"error": "Empty body"}, None
+            name = parse_qs(url.query).get("name", ["upload.png"])[0]
+            status, body = await self.predict(data, os.path.basename(name))
+            return status, body, None
+
+        return 404, {"error": f"No route for {url.path}"}, None
+
+    async def _respond(self, writer, status, body, keep_alive, content_type=None):
+        if isinstance(body, str):
+            payload = body.encode("utf-8")
+        else:
+            payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            content_type = "application/json"
+        head = [
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(payload)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        if status == 429:
+            head.append("Retry-After: 1")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + payload)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+async def serve(service, host=HOST, port=PORT):
+    service.start_pool()
+    server = await asyncio.start_server(service.handle, host, port, limit=MAX_HEADER_BYTES)
+    print(f"--- Serving on http://{host}:{port} ---")
+    async with server:
+        await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the prescription pipeline over HTTP.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument("--queue-size", type=int, default=None, help="Requests that may wait for a worker (default: 4 per worker)")
+    parser.add_argument("--timeout", type=float, default=REQUEST_TIMEOUT, help="Seconds before a request gets 504")
+    parser.add_argument("--output-dir", default="output")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore the result cache")
+    args = parser.parse_args()
+
+    service = PrescriptionService(args.workers, args.queue_size, args.timeout, args.output_dir, not args.no_cache)
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n[INFO] Shutting down")
+    finally:
+        service.shutdown()
+
+if __name__ == '__main__':
+    main()
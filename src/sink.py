@@ -0,0 +1,140 @@
+# File: src/sink.py
+# Purpose: Append-only results sinks. Each pipeline record (source image,
+#          content hash, timings, structured data) becomes one row, so
+#          batch runs accumulate instead of overwriting a single JSON file.
+import json
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+def _lock(fd):
+    """Takes an exclusive lock on the file that other processes respect."""
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    else:
+        # msvcrt locks a byte range from the current position. The first byte
+        # is used as the lock; O_APPEND still sends the data to the end.
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+
+def _unlock(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+class JsonlSink:
+    """
+    Appends records to a JSON Lines file, one line per record.
+
+    Each line goes to the file in a single write, under a file lock, on a
+    descriptor opened with O_APPEND. Threads, batch worker processes and
+    separate runs can all share one results file without clobbering or
+    interleaving each other's lines.
+    """
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0)
+        self._fd = os.open(path, flags, 0o644)
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            _lock(self._fd)
+            try:
+                view = memoryview(line)
+                while view:
+                    written = os.write(self._fd, view)
+                    view = view[written:]
+            finally:
+                _unlock(self._fd)
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ParquetSink:
+    """
+    Writes records to a new Parquet file in row groups of `row_group_size`.
+
+    Nested fields (timings, data) are stored as JSON strings so records with
+    different shapes share one schema. A Parquet file has a single writer:
+    use this from the process that collects results, not from workers.
+    Requires pyarrow.
+    """
+    COLUMNS = ("image", "page", "status", "content_hash", "cached", "error", "timings", "data")
+
+    def __init__(self, path, row_group_size=1000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet output requires pyarrow (pip install pyarrow).")
+        self._pa = pa
+        self.path = path
+        self.row_group_size = row_group_size
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._schema = pa.schema([
+            ("image", pa.string()),
+            ("page", pa.int32()),
+            ("status", pa.string()),
+            ("content_hash", pa.string()),
+            ("cached", pa.bool_()),
+            ("error", pa.string()),
+            ("timings", pa.string()),
+            ("data", pa.string()),
+        ])
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._rows = []
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        row = {name: record.get(name) for name in self.COLUMNS}
+        row["image"] = str(row["image"]) if row["image"] is not None else None
+        row["cached"] = bool(record.get("cached", False))
+        row["timings"] = json.dumps(record.get("timings", {}))
+        row["data"] = json.dumps(record["data"], ensure_ascii=False) if "data" in record else None
+        with self._lock:
+            self._rows.append(row)
+            if len(self._rows) >= self.row_group_size:
+                self._flush()
+
+    def _flush(self):
+        if self._rows:
+            self._writer.write_table(self._pa.Table.from_pylist(self._rows, schema=self._schema))
+            self._rows = []
+
+    def close(self):
+        with self._lock:
+            if self._writer is not None:
+                self._flush()
+                self._writer.close()
+                self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_sink(path):
+    """Opens a Parquet sink for *.parquet paths and a JSON Lines sink otherwise."""
+    if path.lower().endswith(".parquet"):
+        return ParquetSink(path)
+    return JsonlSink(path)
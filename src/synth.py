@@ -0,0 +1,285 @@
+# File: src/synth.py
+# Purpose: Synthetic prescription generator. Renders randomized
+#          prescriptions (drug names from the formulary, strengths, sig
+#          codes, layouts, handwriting-like fonts and distortions) on a pool
+#          of worker processes, and writes exact gold annotations for each
+#          image: line text, bounding boxes and NER entity offsets.
+#
+# Usage: python src/synth.py --count 5000 [--output-dir data/synthetic]
+#            [--workers N] [--seed 0] [--fonts-dir DIR] [--corpus data/corpus]
+import argparse
+import functools
+import glob
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from ner_data import DRUG_INFO, DRUG_ALIASES
+from rules import ABBREVIATIONS
+from sink import JsonlSink
+
+SYNTH_DIR = os.path.join("data", "synthetic")
+
+# Fonts tried in order when --fonts-dir has none. Handwriting-like faces
+# first; the rest only keep generation working on a bare system.
+FONT_CANDIDATES = (
+    "segoepr.ttf", "Inkfree.ttf", "comic.ttf", "BradleyHand-Bold.ttf",
+    "DejaVuSans.ttf", "arial.ttf",
+)
+
+PAGE_SIZES = ((800, 600), (850, 1100), (1000, 700))
+PATIENTS = ("John Appleseed", "Nimal Perera", "Kamala Silva", "Vola Smith", "Sunil Fernando", "Mary Jones")
+PRESCRIBERS = ("Dr. Samantha Miller", "Dr. R. Jayasinghe", "Dr. Steve Dalinson", "Dr. A. Wickramasinghe")
+CLINICS = ("Central City Medical Group", "Colombo General Hospital", "Lakeside Family Clinic")
+STRENGTHS = ("5mg", "10mg", "10 mg", "20mg", "25mg", "50mg", "100mg", "250mg", "500mg", "5 ml", "10ml")
+QUANTITIES = ("1 tab", "2 tabs", "1 cap", "1/2 tab", "5 ml")
+DURATIONS = ("x 5 days", "x 7 days", "for 2 weeks", "x 1 month")
+INSTRUCTIONS = ("after meals", "before meals", "with water", "at bedtime")
+INK_COLORS = ((0, 0, 0), (20, 30, 90), (10, 10, 60), (40, 40, 40))
+MIN_FONT_SIZE = 10 # Lines too long for the page are shrunk down to this size
+
+@functools.lru_cache(maxsize=None)
+def _font_paths(fonts_dir=None):
+    if fonts_dir:
+        paths = sorted(glob.glob(os.path.join(fonts_dir, "*.ttf")) + glob.glob(os.path.join(fonts_dir, "*.otf")))
+        if paths:
+            return tuple(paths)
+    return FONT_CANDIDATES
+
+@functools.lru_cache(maxsize=None)
+def get_font(name, size):
+    """
+    Returns the TrueType font at `size`, loading each (font, size) pair once
+    per process, or PIL's default font if it cannot be found.
+    """
+    try:
+        return ImageFont.truetype(name, size)
+    except IOError:
+        return ImageFont.load_default()
+
+@functools.lru_cache(maxsize=None)
+def available_fonts(fonts_dir=None):
+    """The candidate fonts that actually load on this system."""
+    fonts = []
+    for name in _font_paths(fonts_dir):
+        try:
+            ImageFont.truetype(name, 20)
+        except IOError:
+            continue
+        fonts.append(name)
+    return tuple(fonts)
+
+@functools.lru_cache(maxsize=None)
+def _drug_names():
+    return tuple(sorted(set(DRUG_INFO) | set(DRUG_ALIASES)))
+
+def _compose(parts):
+    """
+    Joins (text, label) parts with spaces and returns the line text and the
+    exact (start, end, label) offsets of every labelled part.
+    """
+    text = ""
+    entities = []
+    for part, label in parts:
+        if text:
+            text += " "
+        if label:
+            entities.append([len(text), len(text) + len(part), label])
+        text += part
+    return text, entities
+
+def random_medication(rng):
+    """One medication line, e.g. "Betaloc 100mg - 1 tab BID x 5 days", with its entities."""
+    name = rng.choice(_drug_names())
+    name = name.title() if rng.random() < 0.7 else name.upper()
+    freq = rng.choice(tuple(ABBREVIATIONS))
+    parts = [(name, "MED"), (rng.choice(STRENGTHS), "STRENGTH"), ("-", None),
+             (rng.choice(QUANTITIES), "QTY"), (freq if rng.random() < 0.8 else freq.lower(), "FREQ")]
+    if rng.random() < 0.4:
+        parts.append((rng.choice(DURATIONS), "DURATION"))
+    if rng.random() < 0.3:
+        parts.append((rng.choice(INSTRUCTIONS), "INSTRUCTION"))
+    return _compose(parts)
+
+def _render_tile(text, font, rng, jitter):
+    """
+    Renders a line as a mask, character by character with a wandering
+    baseline and uneven spacing, tilted by a small random angle.
+    """
+    size = font.size if hasattr(font, "size") else 12
+    width = int(font.getlength(text) * 1.15) + 2 * size
+    height = int(size * 2)
+    tile = Image.new("L", (width, height), 0)
+    draw = ImageDraw.Draw(tile)
+    x = size / 2
+    baseline = size / 2
+    for ch in text:
+        baseline += rng.uniform(-jitter, jitter) * 0.3
+        baseline = min(max(baseline, size * 0.2), size * 0.8)
+        draw.text((x, baseline), ch, fill=255, font=font)
+        x += font.getlength(ch) * rng.uniform(0.95, 1.12)
+
+    tile = tile.crop(tile.getbbox() or (0, 0, 1, 1))
+    tile = tile.rotate(rng.uniform(-2.0, 2.0), resample=Image.BICUBIC, expand=True)
+    if rng.random() < 0.3:
+        tile = tile.filter(ImageFilter.GaussianBlur(rng.uniform(0.3, 0.8)))
+    return tile
+
+def _draw_line(page, xy, text, font_name, size, rng, ink, jitter):
+    """
+    Draws a line at `xy` and returns its bounding box. A line that would not
+    fit on the page is redrawn at a smaller size, so the whole text the gold
+    annotation describes is on the page. Returns None, drawing nothing, if
+    it doesn't fit even at MIN_FONT_SIZE.
+    """
+    max_width, max_height = page.width - xy[0], page.height - xy[1]
+    while True:
+        tile = _render_tile(text, get_font(font_name, size), rng, jitter)
+        if tile.width <= max_width and tile.height <= max_height:
+            break
+        if size <= MIN_FONT_SIZE:
+            return None
+        shrink = min(max_width / float(tile.width), max_height / float(tile.height))
+        size = max(MIN_FONT_SIZE, min(size - 1, int(size * shrink)))
+
+    ink_layer = Image.new("RGB", tile.size, ink)
+    page.paste(ink_layer, xy, tile)
+    return [xy[0], xy[1], xy[0] + tile.width, xy[1] + tile.height]
+
+def _rotate_bbox(bbox, angle, size):
+    """The axis-aligned box around `bbox` after rotating the page by `angle` degrees about its centre."""
+    cx, cy = size[0] / 2, size[1] / 2
+    theta = math.radians(-angle)
+    xs, ys = [], []
+    for x, y in ((bbox[0], bbox[1]), (bbox[2], bbox[1]), (bbox[0], bbox[3]), (bbox[2], bbox[3])):
+        dx, dy = x - cx, y - cy
+        xs.append(cx + dx * math.cos(theta) - dy * math.sin(theta))
+        ys.append(cy + dx * math.sin(theta) + dy * math.cos(theta))
+    return [max(0, round(min(xs))), max(0, round(min(ys))),
+            min(size[0], round(max(xs))), min(size[1], round(max(ys)))]
+
+def render_prescription(index, seed, output_dir, fonts_dir=None):
+    """
+    Renders synthetic prescription number `index` to output_dir/images and
+    returns its gold annotation record. The same (index, seed) always gives
+    the same image.
+    """
+    rng = random.Random(f"{seed}:{index}")
+    fonts = available_fonts(fonts_dir) or ("arial.ttf",)
+    page_size = rng.choice(PAGE_SIZES)
+    page = Image.new("RGB", page_size, (rng.randint(235, 255),) * 3)
+    ink = rng.choice(INK_COLORS)
+    handwriting_size = rng.randint(20, 30)
+    handwriting = (rng.choice(fonts), handwriting_size)
+    printed = (fonts[-1], rng.randint(22, 28))
+    jitter = rng.uniform(0.5, 3.0)
+    margin = rng.randint(20, 60)
+
+    patient = rng.choice(PATIENTS)
+    prescriber = rng.choice(PRESCRIBERS)
+    lines = [
+        (rng.choice(CLINICS), [], printed),
+        (f"Patient Name: {patient}", [], printed),
+        ("Rx:", [], printed),
+    ]
+    medications = [random_medication(rng) for _ in range(rng.randint(1, 5))]
+    lines += [(text, entities, handwriting) for text, entities in medications]
+    lines.append((f"Prescriber: {prescriber}", [], printed))
+
+    # Loose or tight line spacing, but never so loose the last line falls off the page
+    step = min(max(handwriting_size, 28) * rng.uniform(1.6, 2.4), (page_size[1] - 2 * margin) / len(lines))
+    annotations = []
+    for i, (text, entities, font) in enumerate(lines):
+        xy = (margin + rng.randint(0, 30), int(margin + i * step))
+        bbox = _draw_line(page, xy, text, font[0], font[1], rng, ink, jitter if font is handwriting else 0.3)
+        if bbox is not None:
+            annotations.append({"text": text, "bbox": bbox, "entities": entities})
+
+    # Whole-page distortions: a slight skew for the deskew stage, then scan noise
+    angle = rng.uniform(-3.0, 3.0)
+    background = page.getpixel((0, 0))
+    page = page.rotate(angle, resample=Image.BICUBIC, fillcolor=background)
+    for line in annotations:
+        line["bbox"] = _rotate_bbox(line["bbox"], angle, page_size)
+    if rng.random() < 0.5:
+        noise = Image.effect_noise(page_size, rng.uniform(10, 40)).convert("RGB")
+        page = Image.blend(page, noise, rng.uniform(0.05, 0.15))
+
+    name = f"synth_{index:06d}.png"
+    path = os.path.join(output_dir, "images", name)
+    page.save(path)
+    return {
+        "image": path,
+        "size": list(page_size),
+        "angle": round(angle, 3),
+        "patient_name": patient,
+        "prescriber": prescriber,
+        "lines": annotations,
+    }
+
+def iter_training_examples(records):
+    """(text, {"entities": [...]}) pairs for the medication lines of gold records, for corpus.build_corpus."""
+    for record in records:
+        for line in record["lines"]:
+            if line["entities"]:
+                yield line["text"], {"entities": [tuple(entity) for entity in line["entities"]]}
+
+def generate(count, output_dir=SYNTH_DIR, workers=None, seed=0, fonts_dir=None, start=0):
+    """
+    Renders `count` prescriptions on a pool of worker processes and appends
+    their gold annotations to output_dir/annotations.jsonl (replacing it
+    unless `start` extends an existing set). Yields each
+    record as it completes, with at most workers * 2 pages in flight.
+    """
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(os.path.join(output_dir, "images"), exist_ok=True)
+    annotations_path = os.path.join(output_dir, "annotations.jsonl")
+    if start == 0 and os.path.exists(annotations_path):
+        # A fresh set replaces the old one; --start extends it
+        os.remove(annotations_path)
+    with JsonlSink(annotations_path) as sink, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for index in range(start, start + count):
+            pending.add(pool.submit(render_prescription, index, seed, output_dir, fonts_dir))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record = future.result()
+                    sink.write(record)
+                    yield record
+        for future in pending:
+            record = future.result()
+            sink.write(record)
+            yield record
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic prescriptions with gold annotations.")
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--output-dir", default=SYNTH_DIR)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start", type=int, default=0, help="Index of the first image, to extend an existing set")
+    parser.add_argument("--fonts-dir", default=None, help="Directory of .ttf/.otf (e.g. handwriting) fonts to draw from")
+    parser.add_argument("--corpus", default=None, help="Also write the medication lines as DocBin training shards here")
+    args = parser.parse_args()
+
+    print(f"--- Generating {args.count} synthetic prescriptions in {args.output_dir} ---")
+    started = time.perf_counter()
+    records = generate(args.count, args.output_dir, args.workers, args.seed, args.fonts_dir, args.start)
+    if args.corpus:
+        # Lines go into the shards as the records stream in, none are held back
+        from corpus import build_corpus
+        build_corpus(iter_training_examples(records), args.corpus, prefix="synth", append=args.start > 0)
+    else:
+        for _ in records:
+            pass
+    elapsed = time.perf_counter() - started
+    print(f"--- Generated {args.count} images in {elapsed:.1f}s ({args.count / max(elapsed, 1e-9):.1f} images/s) ---")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+# File: src/templates.py
+# Purpose: Registry of known clinic prescription pads (data/templates.json).
+#          A pad is recognized from a cheap layout fingerprint (page aspect
+#          ratio and the position of its printed rules), confirmed by reading
+#          its title, and then only its registered field regions are OCR'd
+#          instead of the whole page.
+#
+# Usage: python src/templates.py <image>   (shows the matching template and its fields)
+#
+# Template coordinates are fractions of the page width/height, so they hold
+# at any scan resolution. A template entry looks like:
+#   {"name": ..., "aspect": width / height,
+#    "rules": [{"y": ..., "x0": ..., "x1": ...}],   printed horizontal rules
+#    "title": {"roi": [x0, y0, x1, y1], "text": ...},
+#    "fields": {"patient_name": {"roi": [...], "label": "Patient Name", "psm": 7}, ...}}
+#
+# Rules are looked for on the preprocessed page, after the median denoise,
+# which erases 1-px hairlines such as signature lines. Only register rules
+# that are at least 2 px thick at the pad's printed size.
+import argparse
+import difflib
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+from ner import extract_structured_data
+from ocr import get_ocr_backend
+from preprocess import load_image
+from tracing import span
+
+TEMPLATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "templates.json")
+
+# "0" turns template matching off, so every page gets full-page OCR
+TEMPLATES_ENABLED = os.environ.get("MEDICARE_TEMPLATES", "1").lower() not in ("0", "false", "no", "off")
+
+# Default matching settings. Pass a dict with any of these keys as `config`
+# to match_template to override them for a call.
+MATCH_CONFIG = {
+    "aspect_tolerance": 0.05, # Relative difference in width / height
+    "rule_tolerance": 0.015, # How far (fraction of the page height) a rule may have moved
+    "rule_coverage": 0.85, # Share of a rule's span that must be ink on some row
+    "title_similarity": 0.8, # difflib ratio between the OCR'd and registered title
+}
+
+_templates = None
+_templates_lock = threading.Lock()
+
+def load_templates(path=TEMPLATES_PATH):
+    """Returns the registered templates, reading the registry on first use."""
+    global _templates
+    with _templates_lock:
+        if _templates is None:
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    _templates = json.load(f)["templates"]
+            else:
+                _templates = []
+        return _templates
+
+def _to_gray(array):
+    array = np.asarray(array)
+    return array.mean(axis=2).astype(np.uint8) if array.ndim == 3 else array
+
+def _pixels(roi, height, width):
+    x0, y0, x1, y1 = roi
+    return (int(x0 * width), int(y0 * height), max(int(x0 * width) + 1, int(x1 * width)),
+            max(int(y0 * height) + 1, int(y1 * height)))
+
+def _has_rule(gray, rule, settings):
+    """True if some row near rule["y"] is dark across the rule's horizontal span."""
+    height, width = gray.shape
+    x0, y0, x1, y1 = _pixels((rule["x0"], rule["y"] - settings["rule_tolerance"],
+                              rule["x1"], rule["y"] + settings["rule_tolerance"]), height, width)
+    band = gray[max(0, y0):min(height, y1), x0:x1] < 128
+    return band.size > 0 and band.mean(axis=1).max() >= settings["rule_coverage"]
+
+def _similar(a, b):
+    normalize = lambda s: " ".join(s.lower().split())
+    return difflib.SequenceMatcher(None, normalize(a), normalize(b)).ratio()
+
+def _read_roi(image, roi, psm, engine):
+    x0, y0, x1, y1 = _pixels(roi, image.height, image.width)
+    return engine.image_to_string(image.crop((x0, y0, x1, y1)), psm=psm).strip()
+
+def match_template(array, config=None, backend=None, templates=None):
+    """
+    Returns the registered template the page was printed on, or None.
+
+    `array` is the preprocessed page (dark text on a light background). The
+    aspect ratio and rule positions are checked first, on pixel slices only;
+    a page that passes has its title region OCR'd once to confirm the match.
+    """
+    if not TEMPLATES_ENABLED:
+        return None
+    settings = dict(MATCH_CONFIG, **(config or {}))
+    gray = _to_gray(array)
+    height, width = gray.shape
+    with span("template.match") as s:
+        for template in load_templates() if templates is None else templates:
+            if abs(width / float(height) - template["aspect"]) > template["aspect"] * settings["aspect_tolerance"]:
+                continue
+            if not all(_has_rule(gray, rule, settings) for rule in template.get("rules", ())):
+                continue
+            title = template.get("title")
+            if title:
+                text = _read_roi(load_image(gray), title["roi"], 7, get_ocr_backend(backend))
+                if _similar(text, title["text"]) < settings["title_similarity"]:
+                    continue
+            print(f"[INFO] Recognized template '{template['name']}'")
+            if s:
+                s.set(template=template["name"])
+            return template
+    return None
+
+def _strip_label(text, label):
+    """Removes a printed label such as "Patient Name:" from the start of a field's text."""
+    head, sep, rest = text.partition(":")
+    if sep and _similar(head, label) >= 0.6:
+        return rest.strip()
+    return re.sub(r"^\s*" + re.escape(label) + r"\s*", "", text, flags=re.IGNORECASE).strip()
+
+def read_template_fields(array, template, backend=None):
+    """OCRs each registered field region of the page and returns {field: text}, labels removed."""
+    image = load_image(_to_gray(array))
+    engine = get_ocr_backend(backend)
+    fields = {}
+    with span("template.fields", template=template["name"]):
+        for name, field in template["fields"].items():
+            text = _read_roi(image, field["roi"], field.get("psm", 7), engine)
+            fields[name] = _strip_label(text, field["label"]) if field.get("label") else text
+    return fields
+
+def fields_to_data(fields, template, output_dir):
+    """
+    Builds the structured result from the field texts. Patient and
+    prescriber come straight from their fields; the medications field goes
+    through NER like a full page would.
+    """
+    data = extract_structured_data(fields.get("medications", ""), output_dir)
+    for name in ("patient_name", "prescriber"):
+        if fields.get(name):
+            data[name] = fields[name]
+    if fields.get("date"):
+        data["date"] = fields["date"]
+    data["template"] = template["name"]
+    return data
+
+def main():
+    from preprocess import preprocess_image
+    parser = argparse.ArgumentParser(description="Check which registered template an image matches.")
+    parser.add_argument("image")
+    parser.add_argument("--output-dir", default="output")
+    args = parser.parse_args()
+
+    array = preprocess_image(args.image, args.output_dir)
+    template = match_template(array)
+    if template is None:
+        print("No registered template matches; the page would get full-page OCR.")
+        return
+    for name, text in read_template_fields(array, template).items():
+        print(f"  {name:<14} {text}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+# File: src/tracing.py
+# Purpose: Lightweight span instrumentation for the pipeline stages. A span
+#          records wall and CPU time plus input/output byte sizes for one
+#          stage on one image. Spans are exported as JSON Lines and
+#          aggregated into Prometheus text-format metrics.
+#
+# Tracing is off unless MEDICARE_TRACE=1 (or configure(enabled=True)). When
+# off, span() hands back one shared no-op object, so instrumented code pays
+# for a global lookup and an empty with-block and nothing else.
+import os
+import threading
+import time
+import uuid
+
+from sink import JsonlSink
+
+TRACE_ENABLED = os.environ.get("MEDICARE_TRACE", "0").lower() in ("1", "true", "yes", "on")
+TRACE_PATH = os.environ.get("MEDICARE_TRACE_FILE", os.path.join("output", "traces.jsonl"))
+METRICS_PATH = os.environ.get("MEDICARE_METRICS_FILE", os.path.join("output", "metrics.prom"))
+
+# Upper bounds (seconds) of the span duration histogram buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def configure(enabled=True, trace_path=None, metrics_path=None):
+    """
+    Turns tracing on or off for this process and for worker processes it
+    starts afterwards (through the environment, so it also holds for spawned
+    workers).
+    """
+    global TRACE_ENABLED, TRACE_PATH, METRICS_PATH
+    TRACE_ENABLED = enabled
+    os.environ["MEDICARE_TRACE"] = "1" if enabled else "0"
+    if trace_path:
+        TRACE_PATH = os.environ["MEDICARE_TRACE_FILE"] = trace_path
+    if metrics_path:
+        METRICS_PATH = os.environ["MEDICARE_METRICS_FILE"] = metrics_path
+
+class _NoopSpan:
+    """Stands in for every span while tracing is off."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __bool__(self):
+        # Lets callers skip computing expensive attributes: `if s: s.set(...)`
+        return False
+
+    def set(self, **attrs):
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+_local = threading.local()
+
+class Span:
+    def __init__(self, name, attrs, collect=False):
+        self.name = name
+        self.attrs = attrs
+        self.span_id = uuid.uuid4().hex[:16]
+        self.spans = [] if collect else None
+
+    def set(self, **attrs):
+        """Adds attributes, e.g. bytes_in/bytes_out sizes or a cache hit flag."""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        parent = stack[-1] if stack else None
+        self.parent_id = parent.span_id if parent else None
+        self.trace_id = parent.trace_id if parent else self.span_id
+        # Spans under a collecting root are kept for the caller, not exported
+        self.collector = parent.collector if parent else self.spans
+        stack.append(self)
+        self.start = time.time()
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall
+        cpu = time.thread_time() - self._cpu
+        _local.stack.pop()
+        record = {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "wall_ms": round(wall * 1000, 3),
+            "cpu_ms": round(cpu * 1000, 3),
+            "attrs": self.attrs,
+        }
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        if self.collector is not None:
+            self.collector.append(record)
+        else:
+            export([record])
+        return False
+
+def span(name, **attrs):
+    """Times a stage: `with span("ocr", bytes_in=n) as s: ...`. A no-op while tracing is off."""
+    if not TRACE_ENABLED:
+        return _NOOP_SPAN
+    return Span(name, attrs)
+
+def trace(name, **attrs):
+    """
+    Opens a root span whose spans (its own included) are collected in
+    `.spans` instead of being exported, so a worker process can hand them
+    back with its result. A no-op while tracing is off.
+    """
+    if not TRACE_ENABLED:
+        return _NOOP_SPAN
+    return Span(name, attrs, collect=True)
+
+class _Registry:
+    """In-process aggregate of finished spans, rendered as Prometheus metrics."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}
+
+    def observe(self, record):
+        wall = record["wall_ms"] / 1000
+        with self.lock:
+            stage = self.stages.setdefault(record["name"], {
+                "count": 0, "wall": 0.0, "cpu": 0.0, "errors": 0,
+                "buckets": [0] * len(BUCKETS), "bytes_in": 0, "bytes_out": 0,
+            })
+            stage["count"] += 1
+            stage["wall"] += wall
+            stage["cpu"] += record["cpu_ms"] / 1000
+            stage["errors"] += 1 if "error" in record else 0
+            for i, bound in enumerate(BUCKETS):
+                if wall <= bound:
+                    stage["buckets"][i] += 1
+            stage["bytes_in"] += record["attrs"].get("bytes_in", 0) or 0
+            stage["bytes_out"] += record["attrs"].get("bytes_out", 0) or 0
+
+    def render(self):
+        with self.lock:
+            stages = {name: dict(values, buckets=list(values["buckets"])) for name, values in self.stages.items()}
+        lines = [
+            "# HELP medicare_span_seconds Wall time spent in each pipeline span.",
+            "# TYPE medicare_span_seconds histogram",
+        ]
+        for name, s in sorted(stages.items()):
+            for bound, count in zip(BUCKETS, s["buckets"]):
+                lines.append(f'medicare_span_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+            lines.append(f'medicare_span_seconds_bucket{{span="{name}",le="+Inf"}} {s["count"]}')
+            lines.append(f'medicare_span_seconds_sum{{span="{name}"}} {s["wall"]:.6f}')
+            lines.append(f'medicare_span_seconds_count{{span="{name}"}} {s["count"]}')
+        lines += [
+            "# HELP medicare_span_cpu_seconds_total CPU time of the thread running each span.",
+            "# TYPE medicare_span_cpu_seconds_total counter",
+        ]
+        lines += [f'medicare_span_cpu_seconds_total{{span="{name}"}} {s["cpu"]:.6f}' for name, s in sorted(stages.items())]
+        lines += [
+            "# HELP medicare_span_errors_total Spans that ended with an exception.",
+            "# TYPE medicare_span_errors_total counter",
+        ]
+        lines += [f'medicare_span_errors_total{{span="{name}"}} {s["errors"]}' for name, s in sorted(stages.items())]
+        lines += [
+            "# HELP medicare_span_bytes_total Bytes consumed and produced by each span.",
+            "# TYPE medicare_span_bytes_total counter",
+        ]
+        for name, s in sorted(stages.items()):
+            lines.append(f'medicare_span_bytes_total{{span="{name}",direction="in"}} {s["bytes_in"]}')
+            lines.append(f'medicare_span_bytes_total{{span="{name}",direction="out"}} {s["bytes_out"]}')
+        return "\n".join(lines) + "\n"
+
+REGISTRY = _Registry()
+_trace_sink = None
+_trace_sink_lock = threading.Lock()
+
+def export(spans):
+    """Appends finished spans to the trace file and adds them to the metrics registry."""
+    global _trace_sink
+    if not spans:
+        return
+    with _trace_sink_lock:
+        if _trace_sink is None:
+            _trace_sink = JsonlSink(TRACE_PATH)
+    for record in spans:
+        _trace_sink.write(record)
+        REGISTRY.observe(record)
+
+def export_record(record):
+    """Exports the spans a pipeline run attached to its record, and removes them from it."""
+    export(record.pop("spans", None))
+
+def render_metrics():
+    """The aggregated spans in Prometheus text exposition format."""
+    return REGISTRY.render()
+
+def write_metrics(path=None):
+    """
+    Writes the Prometheus metrics to `path` (METRICS_PATH by default), e.g.
+    for node_exporter's textfile collector. The file is replaced atomically.
+    """
+    if not TRACE_ENABLED:
+        return
+    path = path or METRICS_PATH
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render_metrics())
+    os.replace(tmp_path, path)
+    print(f"[INFO] Metrics written to {path}")
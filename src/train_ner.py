@@ -1,50 +1,171 @@
-import spacy
+import argparse
+import os
 import random
+import time
+
+import spacy
 from spacy.training.example import Example
-from TRAIN_DATA import TRAIN_DATA # Import your data
-
-# --- Model setup ---
-model = None
-output_dir = "models/prescription_ner_model" # Directory to save the trained model
-n_iter = 100 # Number of training iterations
-
-# --- Load or create a blank model ---
-if model is not None:
-    nlp = spacy.load(model)
-    print("Loaded model '%s'" % model)
-else:
-    nlp = spacy.blank("en") # Create a blank English model
-    print("Created blank 'en' model")
-
-# --- Add NER pipe to the model ---
-if "ner" not in nlp.pipe_names:
-    ner = nlp.add_pipe("ner", last=True)
-else:
+from spacy.util import minibatch, compounding
+from corpus import CORPUS_DIR, build_corpus, read_corpus, shard_paths
+
+# --- Training settings ---
+OUTPUT_DIR = "models/prescription_ner_model" # Directory to save the trained model
+N_ITER = 100 # Maximum number of training iterations (epochs)
+DROPOUT = 0.5
+PATIENCE = 10 # Epochs without a better dev score before stopping
+# Batch size grows from BATCH_START towards BATCH_STOP by BATCH_COMPOUND per
+# batch: small batches while the model is far off, larger ones once it settles
+BATCH_START = 4.0
+BATCH_STOP = 32.0
+BATCH_COMPOUND = 1.001
+
+def create_model(model=None):
+    """Loads `model`, or creates a blank English pipeline, with an NER pipe."""
+    if model is not None:
+        nlp = spacy.load(model)
+        print("Loaded model '%s'" % model)
+    else:
+        nlp = spacy.blank("en") # Create a blank English model
+        print("Created blank 'en' model")
+
+    if "ner" not in nlp.pipe_names:
+        nlp.add_pipe("ner", last=True)
+    return nlp
+
+def train_legacy(nlp, data, n_iter=N_ITER):
+    """The original loop: one update per example, Examples rebuilt every epoch."""
     ner = nlp.get_pipe("ner")
+    for _, annotations in data:
+        for ent in annotations.get("entities"):
+            ner.add_label(ent[2])
+
+    data = list(data)
+    optimizer = nlp.begin_training()
+    words = 0
+    train_time = 0.0
+    for itn in range(n_iter):
+        random.shuffle(data)
+        losses = {}
+        start = time.perf_counter()
+        for text, annotations in data:
+            doc = nlp.make_doc(text)
+            example = Example.from_dict(doc, annotations)
+            nlp.update([example], drop=DROPOUT, sgd=optimizer, losses=losses)
+            words += len(doc)
+        train_time += time.perf_counter() - start
+        print(f"Iteration {itn+1}/{n_iter}, Losses: {losses}")
+    return words, train_time
+
+def evaluate(nlp, dev, optimizer):
+    """Entity F-score on the dev examples, using the averaged weights."""
+    with nlp.use_params(optimizer.averages):
+        scores = nlp.evaluate(dev)
+    return scores.get("ents_f") or 0.0
+
+def train_minibatch(nlp, get_train, dev, n_iter=N_ITER, patience=PATIENCE, output_dir=OUTPUT_DIR, resume=False):
+    """
+    Trains on compounding minibatches of the Examples yielded by get_train(),
+    which is called once per epoch and may stream them from disk. Scores the
+    dev set after every epoch
+    and writes the best model so far to output_dir. Stops early once the dev
+    score has not improved for `patience` epochs. Without a dev set, the
+    model after the last epoch is saved. With resume=True the loaded
+    weights are kept instead of initialized from scratch.
+    """
+    if resume:
+        ner = nlp.get_pipe("ner")
+        for example in get_train():
+            for ent in example.reference.ents:
+                ner.add_label(ent.label_)
+        optimizer = nlp.resume_training()
+    else:
+        optimizer = nlp.initialize(get_train)
+    batch_sizes = compounding(BATCH_START, BATCH_STOP, BATCH_COMPOUND)
+    best_score = None
+    best_epoch = 0
+    words = 0
+    train_time = 0.0
+
+    for itn in range(n_iter):
+        losses = {}
+        epoch_words = 0
+        start = time.perf_counter()
+        for batch in minibatch(get_train(), size=batch_sizes):
+            nlp.update(batch, drop=DROPOUT, sgd=optimizer, losses=losses)
+            epoch_words += sum(len(example.reference) for example in batch)
+        epoch_time = max(time.perf_counter() - start, 1e-9)
+        words += epoch_words
+        train_time += epoch_time
+
+        if not dev:
+            print(f"Iteration {itn+1}/{n_iter}, Losses: {losses}, {epoch_words / epoch_time:,.0f} words/s")
+            continue
+
+        score = evaluate(nlp, dev, optimizer)
+        print(f"Iteration {itn+1}/{n_iter}, Losses: {losses}, dev ents_f: {score:.3f}, "
+              f"{epoch_words / epoch_time:,.0f} words/s")
+        if best_score is None or score > best_score:
+            best_score = score
+            best_epoch = itn + 1
+            with nlp.use_params(optimizer.averages):
+                nlp.to_disk(output_dir)
+        elif itn + 1 - best_epoch >= patience:
+            print(f"[INFO] No improvement for {patience} iterations, stopping early.")
+            break
+
+    if dev:
+        print(f"[INFO] Best dev ents_f {best_score:.3f} at iteration {best_epoch}")
+    else:
+        with nlp.use_params(optimizer.averages):
+            nlp.to_disk(output_dir)
+    return words, train_time
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the prescription NER model.")
+    parser.add_argument("--mode", choices=["minibatch", "legacy"], default="minibatch",
+                        help="minibatch: compounding batches with dev evaluation and early stopping; "
+                             "legacy: the original one-example-per-update loop")
+    parser.add_argument("--model", default=None, help="Existing model to continue training")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--n-iter", type=int, default=N_ITER)
+    parser.add_argument("--patience", type=int, default=PATIENCE)
+    parser.add_argument("--corpus", default=CORPUS_DIR,
+                        help="DocBin corpus with train/ and dev/ shards (see corpus.py); "
+                             "built from TRAIN_DATA if missing")
+    args = parser.parse_args()
+
+    wall_start = time.perf_counter()
+    nlp = create_model(args.model)
+
+    # --- Training ---
+    if args.mode == "legacy":
+        from TRAIN_DATA import TRAIN_DATA
+        words, train_time = train_legacy(nlp, TRAIN_DATA, args.n_iter)
+        nlp.to_disk(args.output_dir)
+    else:
+        train_dir = os.path.join(args.corpus, "train")
+        if not shard_paths(train_dir):
+            print(f"[INFO] No corpus at {args.corpus}, converting TRAIN_DATA")
+            from TRAIN_DATA import TRAIN_DATA
+            build_corpus(TRAIN_DATA, args.corpus)
+        # The dev split is small and scored every epoch, so it is kept in memory
+        dev = list(read_corpus(os.path.join(args.corpus, "dev"), nlp))
+        print(f"[INFO] Training on {args.corpus} with {len(dev)} dev examples")
+        get_train = lambda: read_corpus(train_dir, nlp, shuffle=True)
+        words, train_time = train_minibatch(nlp, get_train, dev, args.n_iter, args.patience, args.output_dir,
+                                             resume=args.model is not None)
+        nlp = spacy.load(args.output_dir)
+
+    print(f"\nSaved trained model to {args.output_dir}")
+    print(f"[INFO] {words:,} words in {train_time:.1f}s of training ({words / max(train_time, 1e-9):,.0f} words/s), "
+          f"wall time {time.perf_counter() - wall_start:.1f}s")
+
+    # --- Test the trained model ---
+    print("\n--- Testing the trained model ---")
+    test_text = "I was prescribed Oxprelol 50mg, one tablet every day."
+    doc = nlp(test_text)
+    for ent in doc.ents:
+        print(f"Entity: '{ent.text}', Label: '{ent.label_}'")
 
-# --- Add new entity labels to the NER pipe ---
-for _, annotations in TRAIN_DATA:
-    for ent in annotations.get("entities"):
-        ner.add_label(ent[2])
-
-# --- Training ---
-optimizer = nlp.begin_training()
-for itn in range(n_iter):
-    random.shuffle(TRAIN_DATA)
-    losses = {}
-    for text, annotations in TRAIN_DATA:
-        doc = nlp.make_doc(text)
-        example = Example.from_dict(doc, annotations)
-        nlp.update([example], drop=0.5, sgd=optimizer, losses=losses)
-    print(f"Iteration {itn+1}/{n_iter}, Losses: {losses}")
-
-# --- Save the trained model ---
-nlp.to_disk(output_dir)
-print(f"\nSaved trained model to {output_dir}")
-
-# --- Test the trained model ---
-print("\n--- Testing the trained model ---")
-test_text = "I was prescribed Oxprelol 50mg, one tablet every day."
-doc = nlp(test_text)
-for ent in doc.ents:
-    print(f"Entity: '{ent.text}', Label: '{ent.label_}'")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
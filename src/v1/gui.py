@@ -5,6 +5,8 @@ from PIL import Image, ImageTk
 import os
 import sys
 import threading
+import time
+from collections import deque
 import json 
 
 # Import the functions from your existing pipeline files
@@ -17,20 +19,63 @@ from ner_data import DRUG_INFO
 AI_API_KEY = "YOUR_AI_API_KEY"
 
 class TextRedirector:
-    """A class to redirect stdout to a tkinter text widget."""
+    """
+    A class to redirect stdout to a tkinter text widget.
+
+    write() can be called from any thread and only appends to a buffer.
+    The Tk loop moves the buffered text into the widget every
+    FLUSH_INTERVAL_MS in one insert, so a burst of prints costs one redraw
+    instead of one per line. Only the last MAX_LINES lines are kept in the
+    widget, and at most MAX_PENDING_CHARS characters wait in the buffer.
+    """
+    FLUSH_INTERVAL_MS = 50
+    MAX_LINES = 2000
+    MAX_PENDING_CHARS = 1_000_000
+
     def __init__(self, widget):
         self.widget = widget
+        self._pending = deque()
+        self._pending_chars = 0
+        self._lock = threading.Lock()
+        self.widget.after(self.FLUSH_INTERVAL_MS, self._flush_to_widget)
 
     def write(self, text):
-        """Writes text to the widget and auto-scrolls."""
-        self.widget.insert(tk.END, text)
-        self.widget.see(tk.END)
-        self.widget.update_idletasks()
+        """Buffers the text; it shows up in the widget on the next flush."""
+        with self._lock:
+            self._pending.append(text)
+            self._pending_chars += len(text)
+            # Drop the oldest buffered output rather than grow without bound
+            while self._pending_chars > self.MAX_PENDING_CHARS and len(self._pending) > 1:
+                self._pending_chars -= len(self._pending.popleft())
+        return len(text)
 
     def flush(self):
         """This function is required for the stream interface."""
         pass
 
+    def clear(self):
+        """Empties the widget and drops any text that has not been shown yet."""
+        with self._lock:
+            self._pending = deque()
+            self._pending_chars = 0
+        self.widget.delete(1.0, tk.END)
+
+    def _flush_to_widget(self):
+        """Runs on the Tk loop: writes the buffered text and trims old lines."""
+        with self._lock:
+            text = "".join(self._pending)
+            self._pending = deque()
+            self._pending_chars = 0
+
+        if text:
+            self.widget.insert(tk.END, text)
+            line_count = int(self.widget.index("end-1c").split(".")[0])
+            if line_count > self.MAX_LINES:
+                self.widget.delete(1.0, f"{line_count - self.MAX_LINES + 1}.0")
+            self.widget.see(tk.END)
+
+        self.widget.after(self.FLUSH_INTERVAL_MS, self._flush_to_widget)
+
 class PrescriptionApp:
     def __init__(self, root):
         self.root = root
@@ -98,7 +143,8 @@ class PrescriptionApp:
         self.details_text = scrolledtext.ScrolledText(right_frame, wrap=tk.WORD, width=50, height=15, bg=self.black, fg=self.light_gray, insertbackground=self.red, selectbackground=self.red, font=self.text_font, relief="flat", borderwidth=0)
         self.details_text.pack(fill=tk.BOTH, expand=True)
         
-        sys.stdout = TextRedirector(self.details_text)
+        self.log = TextRedirector(self.details_text)
+        sys.stdout = self.log
         
         print("--- AI Prescription Reader Initialized ---")
         print("Please load a prescription image to begin.")
@@ -121,7 +167,7 @@ class PrescriptionApp:
         self.ai_details_button.config(state=tk.DISABLED)
         self.med_listbox.delete(0, tk.END)
         
-        self.details_text.delete(1.0, tk.END)
+        self.log.clear()
         print(f"Image loaded: {os.path.basename(self.image_path)}\n")
         print("Ready to extract information...")
 
@@ -131,7 +177,7 @@ class PrescriptionApp:
             return
 
         self.med_listbox.delete(0, tk.END)
-        self.details_text.delete(1.0, tk.END)
+        self.log.clear()
         print("--- Starting Pipeline ---")
 
         try:
@@ -140,16 +186,22 @@ class PrescriptionApp:
                 os.makedirs(output_dir)
 
             # UNCOMMENTED: These lines now run the actual pipeline on your image
+            timings = {}
+            start = time.perf_counter()
             preprocessed_img = preprocess_image(self.image_path, output_dir)
+            timings["preprocess"] = time.perf_counter() - start
+
+            start = time.perf_counter()
             raw_text = extract_text_with_ocr(preprocessed_img)
+            timings["ocr"] = time.perf_counter() - start
             
             # This is the line that was hardcoded, it is now removed
             # raw_text = """..."""
 
-            final_data = extract_structured_data(raw_text, output_dir)
+            final_data = extract_structured_data(raw_text, output_dir, source_image=self.image_path, timings=timings)
 
             if not final_data:
-                self.details_text.insert(tk.END, "No structured data could be extracted.")
+                print("No structured data could be extracted.")
             else:
                 self.display_medications(final_data)
 
@@ -167,7 +219,7 @@ class PrescriptionApp:
                 print(f"  • {drug_name}")
             self.ai_details_button.config(state=tk.NORMAL)
         else:
-            self.details_text.delete(1.0, tk.END)
+            self.log.clear()
             self.details_text.insert(tk.END, "No medication details extracted.")
 
     def show_medication_details(self, event):
@@ -177,7 +229,7 @@ class PrescriptionApp:
 
         med = self.medications[selected_index[0]]
         
-        self.details_text.delete(1.0, tk.END)
+        self.log.clear()
         self.details_text.insert(tk.END, "--- Detailed Medication Information ---\n\n")
         
         drug = med.get('drug_name', 'N/A')
@@ -198,7 +250,7 @@ class PrescriptionApp:
 
         drug = self.medications[selected_index[0]].get('drug_name', 'Unknown Drug')
         
-        self.details_text.delete(1.0, tk.END)
+        self.log.clear()
         self.details_text.insert(tk.END, f"Searching for details on '{drug}' in Sinhala...\n")
         
         threading.Thread(target=self._fetch_sinhala_details, args=(drug,)).start()
@@ -214,7 +266,7 @@ class PrescriptionApp:
         self.root.after(0, self.update_details_text, sinhala_text)
 
     def update_details_text(self, text):
-        self.details_text.delete(1.0, tk.END)
+        self.log.clear()
         self.details_text.insert(tk.END, text)
 
 if __name__ == '__main__':
@@ -1,53 +1,70 @@
 # File: src/ner.py (Working and Enhanced)
 import re
 import os
-import json
+import sys
+import threading
 
-def extract_structured_data(raw_text, output_dir):
+# Appended rather than inserted so v1's own modules still win
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from cache import content_hash
+from sink import JsonlSink
+
+# Dictionary to map medical shorthand to full text
+ABBREVIATIONS = {
+    "BID": "twice a day", "TID": "three times a day", "QD": "once a day", "QID": "four times a day",
+    "PRN": "as needed", "TDS": "three times a day", "BD": "twice a day", "NOCTE": "at night"
+}
+
+# Both medication patterns combined into one alternation and compiled once.
+# Each match is anchored at the start of a line and tries the structured
+# form first ("Amoxicillin 500mg TDS 5days"), then the simpler fallback
+# ("Amoxicillin 500mg bd"), so one finditer pass over the whole text gives
+# the same result as searching every line with the two patterns in turn.
+# [^\S\n] is whitespace that stays on the same line.
+MED_LINE_PATTERN = re.compile(
+    r"^(?:"
+    r".*?(?P<drug>\w+)[^\S\n]+(?P<strength>\d+[^\S\n]?m?g?)[^\S\n]+"
+    r"(?P<freq>\b(?:TDS|BD|NOCTE|PRN)\b)[^\S\n]*(?P<duration>\w*)"
+    r"|"
+    r".*?(?P<simple_drug>\w+)[^\S\n]+(?P<simple_strength>\d+[^\S\n]?m?g?)[^\S\n]+(?P<simple_instructions>\w+)"
+    r")",
+    re.IGNORECASE | re.MULTILINE
+)
+
+_sinks = {}
+_sinks_lock = threading.Lock()
+
+def _get_sink(path):
+    """One shared JsonlSink per results file, opened on first use."""
+    with _sinks_lock:
+        if path not in _sinks:
+            _sinks[path] = JsonlSink(path)
+        return _sinks[path]
+
+def parse_structured_data(raw_text):
     """
     Uses a more advanced Regular Expression to parse OCR text from a variety of formats
     and translates medical abbreviations.
     """
     print("[INFO] Structuring data with advanced Regex and abbreviation mapping...")
 
-    abbreviations = {
-        "BID": "twice a day", "TID": "three times a day", "QD": "once a day", "QID": "four times a day",
-        "PRN": "as needed", "TDS": "three times a day", "BD": "twice a day", "NOCTE": "at night"
-    }
-
     # --- Extract Patient and Doctor ---
     patient_name = "Not Found"
     prescriber = "Not Found"
 
-    # Enhanced regex patterns to be more flexible
-    med_pattern = re.compile(
-        r"(\w+)\s+(\d+\s?m?g?)\s+(\b(?:TDS|BD|NOCTE|PRN)\b)\s*(\w*)",
-        re.IGNORECASE
-    )
-    
-    # A second pattern for less structured text (e.g., "Amoxicillin 500mg bd")
-    med_pattern_simple = re.compile(
-        r"(\w+)\s+(\d+\s?m?g?)\s+(\w+)",
-        re.IGNORECASE
-    )
-    
     medications = []
-    
-    # Process the raw text line by line
-    for line in raw_text.splitlines():
-        line = line.strip()
-        if not line:
-            continue
-
-        match = med_pattern.search(line)
-        if match:
-            drug_name = match.group(1).strip()
-            strength = match.group(2).strip()
-            freq_abbr = match.group(3).upper().strip()
-            duration_text = match.group(4).strip() if match.group(4) else ""
-            
-            full_instructions = abbreviations.get(freq_abbr, freq_abbr)
-            
+
+    # One pass over the raw text; every line yields at most one medication
+    for match in MED_LINE_PATTERN.finditer(raw_text):
+        if match.group("drug"):
+            drug_name = match.group("drug").strip()
+            strength = match.group("strength").strip()
+            freq_abbr = match.group("freq").upper().strip()
+            duration_text = match.group("duration").strip() if match.group("duration") else ""
+
+            full_instructions = ABBREVIATIONS.get(freq_abbr, freq_abbr)
+
             instructions = f"Take {full_instructions}"
             if duration_text:
                 instructions += f" for {duration_text}"
@@ -59,36 +76,45 @@ def extract_structured_data(raw_text, output_dir):
                 "instructions": instructions
             })
             print(f"[INFO] Found medication: {drug_name} with pattern 1")
-            
+
         else:
-            # Fallback to the simpler pattern
-            match = med_pattern_simple.search(line)
-            if match:
-                drug_name = match.group(1).strip()
-                strength = match.group(2).strip()
-                instructions_text = match.group(3).strip()
-                
-                # Check if the third part is a known abbreviation
-                freq_abbr = instructions_text.upper()
-                full_instructions = abbreviations.get(freq_abbr, instructions_text)
-                
-                medications.append({
-                    "drug_name": drug_name,
-                    "strength": strength,
-                    "form": "Tablet",
-                    "instructions": f"Take {full_instructions}"
-                })
-                print(f"[INFO] Found medication: {drug_name} with pattern 2")
-
-    final_data = {
+            # The simpler pattern matched
+            drug_name = match.group("simple_drug").strip()
+            strength = match.group("simple_strength").strip()
+            instructions_text = match.group("simple_instructions").strip()
+
+            # Check if the third part is a known abbreviation
+            freq_abbr = instructions_text.upper()
+            full_instructions = ABBREVIATIONS.get(freq_abbr, instructions_text)
+
+            medications.append({
+                "drug_name": drug_name,
+                "strength": strength,
+                "form": "Tablet",
+                "instructions": f"Take {full_instructions}"
+            })
+            print(f"[INFO] Found medication: {drug_name} with pattern 2")
+
+    return {
         "patient_name": patient_name,
         "prescriber": prescriber,
         "medications": medications
     }
-    
-    output_path = os.path.join(output_dir, "structured_data.json")
-    with open(output_path, 'w') as f:
-        json.dump(final_data, f, indent=2)
-    print(f"[INFO] Structured data saved to '{output_path}'")
+
+def extract_structured_data(raw_text, output_dir, source_image=None, timings=None):
+    """
+    Parses OCR text with parse_structured_data and appends the result as one
+    line to output_dir/structured_data.jsonl, together with the source
+    image, its content hash and any stage timings.
+    """
+    final_data = parse_structured_data(raw_text)
+    record = {"image": source_image, "data": final_data, "timings": timings or {}}
+    if source_image and os.path.isfile(source_image):
+        record["content_hash"] = content_hash(source_image)
+
+    # Same append-only sink as the v2 pipeline, so runs never overwrite each other
+    output_path = os.path.join(output_dir, "structured_data.jsonl")
+    _get_sink(output_path).write(record)
+    print(f"[INFO] Structured data appended to '{output_path}'")
 
     return final_data
\ No newline at end of file
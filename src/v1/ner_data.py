@@ -1,65 +1,13 @@
-# File: src/ner_data.py
-# This file contains an expanded dictionary of drug information.
+# File: src/v1/ner_data.py
+# Drug information now comes from the shared store in src/drug_store.py
+# (compiled from data/drug_info.json), so v1 sees the same formulary as the
+# current pipeline instead of its own copy.
+import os
+import sys
 
-DRUG_INFO = {
-    "empa": {
-        "sinhala_details": "එම්පා (Empa) යනු දියවැඩියාව පාලනය කිරීමට භාවිතා කරන ඖෂධයකි. එය දිනකට වරක් ආහාර ගැනීමෙන් පසු ගන්න. වැඩිදුර විස්තර සඳහා වෛද්‍යවරයාගෙන් විමසන්න."
-    },
-    "glix": {
-        "sinhala_details": "ග්ලික්ස් (glix) යනු දියවැඩියාව සඳහා භාවිතා කරන තවත් ඖෂධයකි. එය දිනකට දෙවරක් ගත යුතුය."
-    },
-    "metformin": {
-        "sinhala_details": "මෙට්ෆෝමින් (Metformin) යනු දියවැඩියාව සඳහා බහුලව භාවිතා වන ඖෂධයකි. මෙය ශරීරයේ සීනි මට්ටම පාලනය කිරීමට උපකාරී වේ. සාමාන්‍යයෙන් ආහාර සමඟ දිනකට වරක් හෝ දෙවරක් ගත යුතුය."
-    },
-    "clopet": {
-        "sinhala_details": "ක්ලෝපෙට් (Clopet) යනු හෘද රෝග සහ ආඝාත වැළැක්වීම සඳහා භාවිතා කරන ඖෂධයකි. එය රුධිර කැටි ගැසීම වැළැක්වීමට උපකාරී වේ. සාමාන්‍යයෙන් රාත්‍රී කාලයේදී ගත යුතුය."
-    },
-    "asprin": {
-        "sinhala_details": "ඇස්ප්‍රින් (Aspirin) යනු වේදනාව, උණ සහ දැවිල්ල අඩු කිරීමට භාවිතා කරන ඖෂධයකි. එය හෘද රෝග වැළැක්වීමටද යොදා ගත හැකිය. සාමාන්‍යයෙන් ආහාර ගැනීමෙන් පසු ගත යුතුය."
-    },
-    "amoxicillin": {
-        "sinhala_details": "ඇමොක්සිලින් (Amoxicillin) යනු බැක්ටීරියා ආසාදනවලට ප්‍රතිකාර කිරීමට භාවිතා කරන ප්‍රතිජීවකයකි. උගුර, කන්, පෙනහලු ආසාදන සඳහා මෙය නියම කෙරේ. වෛද්‍යවරයාගේ උපදෙස් පරිදි නිශ්චිත කාලයක් තුළ නිසි මාත්‍රාව ගන්න."
-    },
-    "paracetamol": {
-        "sinhala_details": "පැරසිටමෝල් (Paracetamol) යනු වේදනාව සහ උණ අඩු කිරීමට භාවිතා කරන පොදු ඖෂධයකි. එය හිසරදය, සෙම්ප්‍රතිශ්‍යාව වැනි රෝග සඳහා සුදුසුය. අවශ්‍ය වූ විට පමණක් ගන්න."
-    },
-    "ranitidine": {
-        "sinhala_details": "රනිටිඩීන් (Ranitidine) යනු අම්ල පිත්ත රෝග සහ අජීර්ණය සඳහා භාවිතා කරන ඖෂධයකි. මෙය ආමාශයේ ඇති අම්ල ප්‍රමාණය අඩු කිරීමට උපකාරී වේ. සාමාන්‍යයෙන් දිනකට දෙවරක් ගත යුතුය."
-    },
-    "omeprazole": {
-        "sinhala_details": "ඔමෙප්‍රසෝල් (Omeprazole) යනු අම්ල පිත්ත රෝග, ගැස්ට්‍රයිටිස් සහ ආමාශයේ වණ සඳහා භාවිතා කරන ඖෂධයකි. මෙය හිස් බඩ උදෑසන ගත යුතුය."
-    },
-    "losartan": {
-        "sinhala_details": "ලොසාටන් (Losartan) යනු අධි රුධිර පීඩනය පාලනය කිරීමට භාවිතා කරන ඖෂධයකි. එය දිනකට වරක් නිශ්චිත වේලාවක ගත යුතුය."
-    },
-    "atorvastatin": {
-        "sinhala_details": "ඇටෝවාස්ටැටින් (Atorvastatin) යනු කොලෙස්ටරෝල් මට්ටම අඩු කිරීමට භාවිතා කරන ඖෂධයකි. එය සාමාන්‍යයෙන් රාත්‍රී කාලයේදී ගත යුතුය."
-    },
-    "simvastatin": {
-        "sinhala_details": "සිම්වාස්ටැටින් (Simvastatin) යනු රුධිරයේ ඇති කොලෙස්ටරෝල් මට්ටම අඩු කිරීමට භාවිතා කරන ඖෂධයකි. එය දිනකට වරක් රාත්‍රී ආහාරයෙන් පසු ගන්න."
-    },
-    "levothyroxine": {
-        "sinhala_details": "ලෙවෝතයිරොක්සින් (Levothyroxine) යනු තයිරොයිඩ් ග්‍රන්ථියේ අඩුවක් සඳහා භාවිතා කරන ඖෂධයකි. මෙය හිස් බඩ උදෑසන ගත යුතුය."
-    },
-    "sertraline": {
-        "sinhala_details": "සර්ට්‍රැලීන් (Sertraline) යනු මානසික අවපීඩනය සහ කාංසාව සඳහා භාවිතා කරන ඖෂධයකි. වෛද්‍ය උපදෙස් අනුව නිසි මාත්‍රාව නිශ්චිත කාලයකට ගන්න."
-    },
-    "ibuprofen": {
-        "sinhala_details": "ඉබුප්‍රොෆෙන් (Ibuprofen) යනු වේදනාව, උණ සහ දැවිල්ල අඩු කිරීමට භාවිතා කරන ඖෂධයකි. එය හිසරදය, සන්ධි වේදනාව වැනි රෝග සඳහා සුදුසුය. ආහාර ගැනීමෙන් පසු ගන්න."
-    },
-    "diclofenac": {
-        "sinhala_details": "ඩයික්ලෝෆෙනැක් (Diclofenac) යනු වේදනාව සහ දැවිල්ල අඩු කිරීමට භාවිතා කරන ඖෂධයකි. එය මාංශ පේශි වේදනාව, ආතරයිටිස් සඳහා සුදුසුය. ආහාර සමඟ ගැනීම වඩාත් සුදුසුය."
-    },
-    "cephalexin": {
-        "sinhala_details": "සෙෆලෙක්සින් (Cephalexin) යනු බැක්ටීරියා ආසාදනවලට ප්‍රතිකාර කිරීමට භාවිතා කරන ප්‍රතිජීවකයකි. වෛද්‍යවරයාගේ උපදෙස් අනුව නිශ්චිත කාලයක් තුළ නිසි මාත්‍රාව ගන්න."
-    },
-    "azithromycin": {
-        "sinhala_details": "ඇසිට්‍රොමයිසින් (Azithromycin) යනු බැක්ටීරියා ආසාදන සඳහා භාවිතා කරන ප්‍රතිජීවකයකි. එය පෙනහලු, උගුර සහ සමේ ආසාදන සඳහා නියම කෙරේ. වෛද්‍ය උපදෙස් අනුව ගත යුතුය."
-    },
-    "doxycycline": {
-        "sinhala_details": "ඩොක්සිසයික්ලින් (Doxycycline) යනු බැක්ටීරියා ආසාදන, කුරුලෑ සහ මැලේරියාව වැළැක්වීම සඳහා භාවිතා කරන ප්‍රතිජීවකයකි. එය සාමාන්‍යයෙන් ආහාර සමඟ හෝ වෛද්‍යවරයාගේ උපදෙස් අනුව ගත යුතුය."
-    },
-    "prednisolone": {
-        "sinhala_details": "ප්‍රෙඩ්නිසොලෝන් (Prednisolone) යනු දැවිල්ල අඩු කිරීමට සහ ප්‍රතිශක්තිකරණ පද්ධතියේ රෝග සඳහා භාවිතා කරන ඖෂධයකි. වෛද්‍යවරයාගේ උපදෙස් අනුව පමණක් ගත යුතුය."
-    },
-}
\ No newline at end of file
+# Appended rather than inserted so v1's own modules still win
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from drug_store import open_drug_store
+
+DRUG_INFO = open_drug_store()
@@ -0,0 +1,8 @@
+# File: tests/conftest.py
+# Purpose: Makes the flat src/ modules importable the way the scripts import
+#          them (`from pipeline import ...`). Tests that need OpenCV, Pillow,
+#          spaCy or Tesseract skip themselves when those aren't installed.
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
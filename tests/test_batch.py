@@ -0,0 +1,47 @@
+import json
+import multiprocessing
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+pytest.importorskip("PIL")
+pytest.importorskip("pytesseract")
+
+from PIL import Image
+
+import batch
+import ocr
+import templates
+
+# The stand-in OCR engine is patched into this process and reaches the
+# batch workers through fork
+pytestmark = pytest.mark.skipif(multiprocessing.get_start_method() != "fork",
+                                reason="patched modules only reach forked workers")
+
+class BrokenEngine:
+    name = "broken"
+
+    def image_to_string(self, image, psm=None):
+        raise OSError("tesseract is not installed or it's not in your PATH")
+
+    image_to_data = image_to_string
+
+def test_ocr_failure_is_a_failed_record(tmp_path, monkeypatch):
+    images = tmp_path / "raw"
+    images.mkdir()
+    for name in ("a.png", "b.png"):
+        Image.new("L", (200, 100), 255).save(images / name)
+    monkeypatch.setattr(ocr, "get_ocr_backend", lambda backend=None: BrokenEngine())
+    monkeypatch.setattr(templates, "TEMPLATES_ENABLED", False)
+
+    results = str(tmp_path / "results.jsonl")
+    failed = batch.run_batch_pipeline(str(images), str(tmp_path / "output"), workers=1, use_cache=False,
+                                      results_path=results)
+
+    assert len(failed) == 2
+    with open(results, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert [r["status"] for r in records] == ["error", "error"]
+    assert all("tesseract is not installed" in r["error"] for r in records)
+    assert all("data" not in r for r in records)
@@ -0,0 +1,54 @@
+import os
+import sqlite3
+
+import cache
+from cache import PIPELINE_MODULES, SRC_DIR, ResultCache, content_hash, pipeline_version
+
+def test_version_covers_runtime_settings():
+    assert pipeline_version({"ocr": {"layout": "page"}}) != pipeline_version({"ocr": {"layout": "lines"}})
+    assert pipeline_version({"a": 1, "b": 2}) == pipeline_version({"b": 2, "a": 1})
+
+def test_version_only_hashes_pipeline_modules():
+    assert all(os.path.exists(os.path.join(SRC_DIR, name)) for name in PIPELINE_MODULES)
+    for name in ("gui.py", "server.py", "synth.py", "train_ner.py"):
+        assert name not in PIPELINE_MODULES
+
+def test_content_hash_of_bytes_and_files(tmp_path):
+    path = tmp_path / "scan.png"
+    path.write_bytes(b"not really a png")
+    assert content_hash(str(path)) == content_hash(b"not really a png")
+
+def test_round_trip_and_version_isolation(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    page_mode = ResultCache(path, version="page")
+    line_mode = ResultCache(path, version="lines")
+    page_mode.put("img", {"patient_name": "A"})
+    assert page_mode.get("img") == {"patient_name": "A"}
+    assert line_mode.get("img") is None
+
+    # Opening the cache with another version must not drop the other's results
+    ResultCache(path, version="lines")
+    assert page_mode.get("img") == {"patient_name": "A"}
+
+def _sum_sizes(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+def test_running_total_and_lru_eviction(tmp_path, monkeypatch):
+    path = str(tmp_path / "results.sqlite3")
+    results = ResultCache(path, max_bytes=300, version="v")  # Five 52-byte entries fit, six don't
+    clock = iter(range(1000))
+    monkeypatch.setattr(cache.time, "time", lambda: next(clock))
+
+    for i in range(5):
+        results.put(f"img{i}", {"text": "x" * 40})
+        assert results.total_bytes() == _sum_sizes(path)
+    # Touch the oldest entry so it is no longer the least recently used
+    assert results.get("img0") is not None
+    results.put("img5", {"text": "x" * 40})
+    # Replacing an entry updates the total instead of adding to it
+    results.put("img5", {"text": "y" * 10})
+
+    assert results.total_bytes() == _sum_sizes(path) <= 300
+    assert results.get("img0") is not None
+    assert results.get("img1") is None
@@ -0,0 +1,69 @@
+import json
+from collections import Counter
+
+import pytest
+
+pytest.importorskip("spacy")
+
+import doccano_import
+from corpus import shard_paths
+from doccano_import import LABEL_MAP, import_doccano, parse_record
+from spacy.tokens import DocBin
+
+LABELS = {k.lower(): v for k, v in LABEL_MAP.items()}
+
+def test_parse_record_accepts_both_export_shapes():
+    stats = Counter()
+    text = "Amoxicillin 500mg"
+    assert parse_record({"text": text, "label": [[0, 11, "drug"]]}, LABELS, stats) == \
+        (text, {"entities": [(0, 11, "MED")]})
+    assert parse_record({"text": text, "entities": [{"start_offset": 12, "end_offset": 17, "label": "dose"}]},
+                        LABELS, stats) == (text, {"entities": [(12, 17, "STRENGTH")]})
+
+@pytest.mark.parametrize("record", [
+    {"text": "Amoxicillin 500mg", "label": [[0, 11]]},
+    {"text": "Amoxicillin 500mg", "label": [["drug", 0, 11]]},
+    {"text": "Amoxicillin 500mg", "label": [[0, 99, "drug"]]},
+    {"text": "Amoxicillin 500mg", "label": "drug"},
+    ["not", "a", "record"],
+])
+def test_parse_record_skips_malformed_records(record):
+    stats = Counter()
+    assert parse_record(record, LABELS, stats) is None
+    assert stats["bad_record"] == 1
+
+def _write_export(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            text = f"Drug{i} {i + 1}0mg"
+            f.write(json.dumps({"text": text, "label": [[0, len(f"Drug{i}"), "drug"]]}) + "\n")
+
+def _doc_count(corpus_dir):
+    return sum(len(DocBin().from_disk(path))
+               for split in ("train", "dev") for path in shard_paths(str(corpus_dir / split)))
+
+def test_failed_import_can_be_rerun_without_duplicates(tmp_path, monkeypatch):
+    export = tmp_path / "export.jsonl"
+    _write_export(export, 12)
+    corpus = tmp_path / "corpus"
+
+    real_doc = doccano_import.Doc
+    made = []
+    def failing_doc(*args, **kwargs):
+        made.append(1)
+        if len(made) > 7:
+            raise RuntimeError("disk full")
+        return real_doc(*args, **kwargs)
+
+    monkeypatch.setattr(doccano_import, "Doc", failing_doc)
+    with pytest.raises(RuntimeError):
+        import_doccano([str(export)], str(corpus), workers=1, chunk_lines=2, shard_size=2)
+    monkeypatch.setattr(doccano_import, "Doc", real_doc)
+
+    stats = import_doccano([str(export)], str(corpus), workers=1, chunk_lines=2, shard_size=2)
+    assert _doc_count(corpus) == 12
+    assert stats["imported"] + stats["duplicates"] == 12
+
+    # A third run adds nothing
+    assert import_doccano([str(export)], str(corpus), workers=1)["imported"] == 0
+    assert _doc_count(corpus) == 12
@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+pytest.importorskip("PIL")
+
+from PIL import Image
+
+import documents
+from documents import count_pages, describe_page, is_document, iter_pages, render_page
+
+def write_tiff(path, shades, dpi=(200, 200)):
+    frames = [Image.new("L", (60, 40), shade) for shade in shades]
+    frames[0].save(path, save_all=True, append_images=frames[1:], dpi=dpi)
+    return str(path)
+
+def test_multi_page_tiff_is_split_into_pages(tmp_path):
+    fax = write_tiff(tmp_path / "fax.tiff", (0, 128, 255))
+    assert count_pages(fax) == 3
+    assert list(iter_pages([fax])) == [(fax, 1), (fax, 2), (fax, 3)]
+
+    page = render_page(fax, 2)
+    assert page.getpixel((5, 5)) == 128
+    assert round(page.info["dpi"][0]) == 200
+
+def test_single_images_keep_their_plain_key(tmp_path):
+    scan = str(tmp_path / "scan.png")
+    Image.new("L", (10, 10), 255).save(scan)
+    single = write_tiff(tmp_path / "single.tif", (255,))
+    assert list(iter_pages([scan, single])) == [(scan, None), (single, None)]
+    assert not is_document(scan) and is_document(single) and is_document("FAX.PDF")
+
+def test_pdfs_are_always_paged(monkeypatch):
+    monkeypatch.setattr(documents, "count_pages", lambda path: 1)
+    assert list(iter_pages(["one.pdf"])) == [("one.pdf", 1)]
+
+def test_pages_are_counted_lazily(monkeypatch):
+    counted = []
+    monkeypatch.setattr(documents, "count_pages", lambda path: counted.append(path) or 2)
+    pages = iter_pages(["a.pdf", "b.pdf"])
+    assert next(pages) == ("a.pdf", 1)
+    assert counted == ["a.pdf"]
+    assert list(pages) == [("a.pdf", 2), ("b.pdf", 1), ("b.pdf", 2)]
+
+def test_unreadable_document_becomes_one_item(tmp_path):
+    broken = tmp_path / "broken.tiff"
+    broken.write_bytes(b"not a tiff")
+    assert list(iter_pages([str(broken)])) == [(str(broken), None)]
+
+def test_describe_page():
+    assert describe_page("fax.pdf", 3) == "fax.pdf [page 3]"
+    assert describe_page("scan.png", None) == "scan.png"
+
+def test_pdf_pages_render_at_the_requested_dpi(tmp_path):
+    pdfium = pytest.importorskip("pypdfium2")
+    pdf = pdfium.PdfDocument.new()
+    for _ in range(2):
+        pdf.new_page(72, 36)  # 1 x 0.5 inch
+    path = str(tmp_path / "fax.pdf")
+    pdf.save(path)
+    pdf.close()
+
+    assert count_pages(path) == 2
+    image = render_page(path, 2, dpi=100)
+    assert image.size == (100, 50)
+    assert image.info["dpi"] == (100, 100)
+
+def test_each_page_gets_its_own_debug_image(tmp_path):
+    pytest.importorskip("cv2")
+    pytest.importorskip("pytesseract")
+    from pipeline import process_prescription
+
+    fax = write_tiff(tmp_path / "fax.tiff", (255, 255))
+    output_dir = tmp_path / "output"
+    for page in (1, 2):
+        process_prescription(fax, str(output_dir), save_debug=True, use_cache=False, page=page)
+    assert sorted(os.listdir(output_dir)) == ["processed_fax_p1.png", "processed_fax_p2.png"]
@@ -0,0 +1,48 @@
+from drug_correction import (DrugNameCorrector, _deletes, allowed_distance, correct_drug_name,
+                             damerau_levenshtein)
+
+NAMES = {"metformin": "metformin", "amoxicillin": "amoxicillin", "pcm": "paracetamol", "asprin": "asprin",
+         "aspirin": "asprin", "losartan": "losartan"}
+
+def reference_distance(a, b):
+    """Plain optimal string alignment distance, without the early exit."""
+    d = [[max(i, j) if min(i, j) == 0 else 0 for j in range(len(b) + 1)] for i in range(len(a) + 1)]
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            d[i][j] = min(d[i - 1][j] + 1, d[i][j - 1] + 1, d[i - 1][j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d[i][j] = min(d[i][j], d[i - 2][j - 2] + 1)
+    return d[-1][-1]
+
+def test_distance_matches_reference_within_budget():
+    words = ["metformin", "metfromin", "metforrnin", "amoxici11in", "pcm", "pcn", "", "asprin", "aspirin"]
+    for a in words:
+        for b in words:
+            expected = reference_distance(a, b)
+            assert damerau_levenshtein(a, b, 2) == min(expected, 3), (a, b)
+
+def test_deletes():
+    assert _deletes("abc", 1) == {"abc", "bc", "ac", "ab"}
+    assert "a" in _deletes("abc", 2)
+
+def test_ocr_errors_are_corrected():
+    corrector = DrugNameCorrector(NAMES)
+    assert corrector.correct("Metformin") == ("metformin", 1.0)
+    key, confidence = corrector.correct("Metforrnin")  # "rn" read for "m"
+    assert key == "metformin" and 0.5 < confidence < 1.0
+    assert corrector.correct("Amoxici11in")[0] == "amoxicillin"
+    assert corrector.correct("metfromin")[0] == "metformin"  # Transposition
+    assert corrector.correct("aspirin") == ("asprin", 1.0)  # Alias
+
+def test_short_names_need_an_exact_match():
+    corrector = DrugNameCorrector(NAMES)
+    assert allowed_distance(3) == 0
+    assert corrector.correct("pcm") == ("paracetamol", 1.0)
+    assert corrector.correct("pcn") == (None, 0.0)
+    assert corrector.correct("tab") == (None, 0.0)
+    assert corrector.correct("") == (None, 0.0)
+
+def test_formulary_corrector():
+    assert correct_drug_name("Losarten")[0] == "losartan"
+    assert correct_drug_name("twice") == (None, 0.0)
@@ -0,0 +1,38 @@
+import random
+import re
+
+from drug_scanner import DrugScanner, find_drugs
+
+NAMES = {"codeine": "codeine", "codeine sulfate": "codeine sulfate", "pcm": "paracetamol",
+         "paracetamol": "paracetamol", "asprin": "asprin", "aspirin": "asprin"}
+
+def naive_find_all(names, text):
+    """Every whole-word occurrence of every name, found with one regex per name."""
+    lowered = re.sub(r"\s", " ", text.lower())
+    matches = []
+    for name, key in names.items():
+        for match in re.finditer(r"(?<![^\W_])" + re.escape(name) + r"(?![^\W_])", lowered):
+            matches.append((match.start(), match.end(), key))
+    return sorted(matches, key=lambda m: (m[1], m[0]))
+
+def test_whole_words_only():
+    scanner = DrugScanner(NAMES)
+    assert scanner.find("pcmx 500mg") == []
+    assert scanner.find("2x PCM, 500mg") == [(3, 6, "paracetamol")]
+
+def test_longest_name_wins():
+    scanner = DrugScanner(NAMES)
+    text = "Codeine\tSulfate 30mg"
+    assert sorted(scanner.find_all(text)) == [(0, 7, "codeine"), (0, 15, "codeine sulfate")]
+    assert scanner.find(text) == [(0, 15, "codeine sulfate")]
+
+def test_matches_a_naive_scan():
+    scanner = DrugScanner(NAMES)
+    words = list(NAMES) + ["codeine", "sulfate", "x", "pcmx", "500mg", "-", "Aspirin,", "PARACETAMOL"]
+    rng = random.Random(0)
+    for _ in range(500):
+        text = "".join(rng.choice(words) + rng.choice((" ", "  ", "\n", ",", "")) for _ in range(rng.randint(0, 12)))
+        assert sorted(scanner.find_all(text), key=lambda m: (m[1], m[0])) == naive_find_all(NAMES, text), text
+
+def test_formulary_aliases_map_to_their_entry():
+    assert find_drugs("Aspirin 75mg QD, then Cipro 500mg BID") == ["asprin", "ciprofloxacin"]
@@ -0,0 +1,55 @@
+import json
+import os
+
+import pytest
+
+from drug_store import DrugStore, _is_stale, build_drug_store, open_drug_store
+
+def write_source(path, drugs, aliases=None):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"drugs": drugs, "aliases": aliases or {}}, f)
+
+def test_store_reads_like_the_json(tmp_path):
+    source, path = str(tmp_path / "drugs.json"), str(tmp_path / "drugs.sqlite3")
+    write_source(source, {"metformin": {"sinhala_details": "A"}, "losartan": {"sinhala_details": "B", "note": "C"}},
+                 {"glucophage": "metformin"})
+    build_drug_store(source, path)
+
+    store = DrugStore(path)
+    assert len(store) == 2 and sorted(store) == ["losartan", "metformin"]
+    assert store["losartan"] == {"sinhala_details": "B", "note": "C"}
+    assert "metformin" in store and "aspirin" not in store
+    assert store.get("aspirin") is None
+    with pytest.raises(KeyError):
+        store["aspirin"]
+    assert store.aliases() == {"glucophage": "metformin"}
+
+def test_store_is_rebuilt_when_the_source_changes(tmp_path):
+    source, path = str(tmp_path / "drugs.json"), str(tmp_path / "drugs.sqlite3")
+    write_source(source, {"metformin": {}})
+    assert _is_stale(source, path)
+    store = open_drug_store(source, path)
+    assert list(store) == ["metformin"]
+    assert not _is_stale(source, path)
+    # The same store object is handed out for the path
+    assert open_drug_store(source, path) is store
+
+    write_source(source, {"metformin": {}, "losartan": {}})
+    os.utime(source, ns=(0, os.stat(path).st_mtime_ns + 10 ** 9))
+    assert _is_stale(source, path)
+    build_drug_store(source, path)
+    assert sorted(DrugStore(path)) == ["losartan", "metformin"]
+
+def test_corrupt_store_counts_as_stale(tmp_path):
+    source, path = str(tmp_path / "drugs.json"), str(tmp_path / "drugs.sqlite3")
+    write_source(source, {})
+    with open(path, "wb") as f:
+        f.write(b"not a database" * 100)
+    assert _is_stale(source, path)
+
+def test_build_leaves_no_temporary_files(tmp_path):
+    source, path = str(tmp_path / "drugs.json"), str(tmp_path / "drugs.sqlite3")
+    write_source(source, {"metformin": {}})
+    build_drug_store(source, path)
+    build_drug_store(source, path)
+    assert sorted(os.listdir(tmp_path)) == ["drugs.json", "drugs.sqlite3"]
@@ -0,0 +1,85 @@
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+import ner
+from cache import pipeline_version
+
+def entity(text, label):
+    return SimpleNamespace(text=text, label_=label)
+
+def test_entities_group_into_medications():
+    doc = SimpleNamespace(ents=[
+        entity("5mg", "STRENGTH"),  # Before any MED: ignored
+        entity("Betaloc", "MED"), entity("100mg", "STRENGTH"), entity("1 tab", "QTY"),
+        entity("BID", "FREQ"), entity("5 days", "DURATION"),
+        entity("Metformin", "MED"), entity("tid", "FREQ"), entity("after meals", "INSTRUCTION"),
+    ])
+    assert ner._medications_from_doc(doc) == [
+        {"drug_name": "Betaloc", "strength": "100mg", "form": "Tablet",
+         "instructions": "Take 1 tab twice a day for 5 days"},
+        {"drug_name": "Metformin", "strength": "", "form": "Tablet",
+         "instructions": "Take three times a day after meals"},
+    ]
+
+def test_regex_mode_links_the_formulary():
+    data = ner.extract_structured_data("Rx:\nBetaloc 100mg - 1 tab BID\nMetfornin 500 mg 1 tab tid", "output",
+                                       mode="regex")
+    betaloc, metformin = data["medications"]
+    assert (betaloc["formulary_name"], betaloc["formulary_confidence"]) == ("betaloc", 1.0)
+    # OCR-mangled name, corrected with a lower confidence
+    assert metformin["formulary_name"] == "metformin" and 0 < metformin["formulary_confidence"] < 1
+    assert data["detected_drugs"] == ["betaloc"]
+
+def test_auto_mode_falls_back_to_regex_without_spacy(monkeypatch):
+    def no_model():
+        raise ImportError("No module named 'spacy'")
+    monkeypatch.setattr(ner, "NER_MODE", "auto")
+    monkeypatch.setattr(ner, "_auto_mode", None)
+    monkeypatch.setattr(ner, "get_nlp", no_model)
+    assert ner._resolve_mode(None) == "regex"
+    # The cache key then records what "auto" resolved to
+    assert ner.ner_settings() == {"mode": "auto", "resolved": "regex", "disabled_pipes": []}
+
+def test_failed_model_load_is_keyed_as_regex(monkeypatch):
+    calls = []
+    def broken_model():
+        calls.append(1)
+        raise OSError("[E050] Can't find model 'models/prescription_ner_model'")
+    monkeypatch.setattr(ner, "NER_MODE", "auto")
+    monkeypatch.setattr(ner, "_auto_mode", None)
+    monkeypatch.setattr(ner, "get_nlp", broken_model)
+
+    # The key is built before anything is extracted, so the load is tried then
+    settings = ner.ner_settings()
+    assert calls == [1]
+    assert settings["resolved"] == "regex"
+    spacy_settings = dict(settings, resolved="spacy")
+    assert pipeline_version({"ner": settings}) != pipeline_version({"ner": spacy_settings})
+    # Extraction then uses the mode the key recorded
+    ner.extract_structured_data("Betaloc 100mg - 1 tab BID", "output")
+    assert ner.ner_settings() == settings and calls == [1]
+
+def test_each_model_dir_gets_its_own_pipeline(tmp_path, monkeypatch):
+    fake_spacy = SimpleNamespace(load=lambda path, disable: SimpleNamespace(path=path))
+    monkeypatch.setitem(sys.modules, "spacy", fake_spacy)
+    monkeypatch.setattr(ner, "_nlps", {})
+    first, second = str(tmp_path / "first"), str(tmp_path / "second")
+    assert ner.get_nlp(first).path == first
+    assert ner.get_nlp(second).path == second
+    assert ner.get_nlp(first) is ner.get_nlp(first)
+
+def test_auto_mode_uses_regex_for_texts_the_model_found_nothing_in(monkeypatch):
+    monkeypatch.setattr(ner, "_resolve_mode", lambda mode: "spacy")
+    monkeypatch.setattr(ner, "_extract_medications_spacy", lambda texts, batch_size, n_process: [
+        [], [{"drug_name": "Losartan", "strength": "50mg", "form": "Tablet", "instructions": "Take"}],
+    ])
+    first, second = ner.extract_structured_data_batch(
+        ["Betaloc 100mg - 1 tab BID", "Losartan 50mg - 1 tab QD"], "output", mode="auto")
+    assert [m["drug_name"] for m in first["medications"]] == ["Betaloc"]
+    assert [m["instructions"] for m in second["medications"]] == ["Take"]
+
+def test_unknown_mode_is_an_error():
+    with pytest.raises(ValueError):
+        ner.extract_structured_data("Betaloc 100mg BID", "output", mode="crf")
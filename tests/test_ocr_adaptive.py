@@ -0,0 +1,87 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+pytest.importorskip("PIL")
+pytest.importorskip("pytesseract")
+
+from PIL import Image
+
+import ocr
+
+PAGE = (800, 400)
+
+class FakeEngine:
+    """
+    Word-level OCR stand-in. The half-scale first pass finds a clear line and
+    a smudged one; re-reading the smudged crop gets more confident with each
+    retry setting. Records (image size, psm) for every call.
+    """
+    name = "fake"
+
+    def __init__(self, first_pass=True, retry_confidences=(50, 85, 99)):
+        self.first_pass = first_pass
+        self.retry_confidences = list(retry_confidences)
+        self.calls = []
+
+    def image_to_data(self, image, psm=None):
+        self.calls.append((image.size, psm))
+        if image.size == (PAGE[0] // 2, PAGE[1] // 2):
+            if not self.first_pass:
+                return []
+            return [
+                {"text": "Betaloc", "conf": 96.0, "bbox": (20, 20, 80, 35), "line": (1, 1, 1)},
+                {"text": "100mg", "conf": 92.0, "bbox": (90, 20, 130, 35), "line": (1, 1, 1)},
+                {"text": "Metfrmn", "conf": 31.0, "bbox": (20, 60, 90, 75), "line": (1, 1, 2)},
+            ]
+        conf = self.retry_confidences.pop(0)
+        return [{"text": f"Metformin@{conf}", "conf": float(conf), "bbox": (2, 2, 40, 20), "line": (1, 1, 1)}]
+
+    def image_to_string(self, image, psm=None):
+        self.calls.append((image.size, psm))
+        return "whole page"
+
+@pytest.fixture
+def engine(monkeypatch):
+    fake = FakeEngine()
+    monkeypatch.setattr(ocr, "get_ocr_backend", lambda backend=None: fake)
+    monkeypatch.setattr(ocr, "_get_line_pool", lambda: None)
+    return fake
+
+def read(layout="adaptive", config=None):
+    lines = []
+    text = ocr.extract_text_with_ocr(Image.new("L", PAGE, 255), layout=layout, lines=lines, config=config)
+    return text, lines
+
+def test_only_low_confidence_lines_are_reread(engine):
+    text, lines = read()
+    assert text == "Betaloc 100mg\nMetformin@85"
+    assert [(line["passes"], line["conf"]) for line in lines] == [(1, 94.0), (3, 85.0)]
+    # First pass over the page, then two retries on the weak line's crop only
+    assert len(engine.calls) == 3
+    assert all(size[0] < PAGE[0] // 2 for size, _ in engine.calls[1:])
+    assert [psm for _, psm in engine.calls[1:]] == [ocr.PSM_SINGLE_LINE, ocr.PSM_SINGLE_LINE]
+    # Line boxes are in full-resolution page coordinates
+    assert lines[0]["bbox"] == [40, 40, 260, 70]
+
+def test_most_confident_read_is_kept_when_no_retry_clears_the_bar(engine):
+    engine.retry_confidences = [40, 20, 35]
+    text, lines = read()
+    assert text == "Betaloc 100mg\nMetformin@40"
+    assert lines[1]["passes"] == 1 + len(ocr.ADAPTIVE_CONFIG["retries"])
+
+def test_confident_page_needs_no_retries(engine):
+    text, lines = read(config={"min_confidence": 30})
+    assert len(engine.calls) == 1
+    assert [line["passes"] for line in lines] == [1, 1]
+
+def test_page_without_words_falls_back_to_full_page_ocr(engine):
+    engine.first_pass = False
+    text, lines = read()
+    assert text == "whole page"
+    assert lines == []
+    assert engine.calls[-1] == (PAGE, None)
+
+def test_settings_record_the_adaptive_config(monkeypatch):
+    monkeypatch.setattr(ocr, "OCR_LAYOUT", "adaptive")
+    assert ocr.ocr_settings()["adaptive"] == ocr.ADAPTIVE_CONFIG
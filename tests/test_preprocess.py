@@ -0,0 +1,61 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+pytest.importorskip("PIL")
+
+import numpy as np
+
+from preprocess import (_projection_score, _rotate, binarize, deskew, estimate_skew, normalize_dpi,
+                        preprocess_image, to_grayscale)
+
+def lined_page(height=400, width=600):
+    """White page with a dozen thick horizontal 'text lines'."""
+    page = np.full((height, width), 255, dtype=np.uint8)
+    for y in range(40, height - 40, 30):
+        page[y:y + 6, 60:width - 60] = 0
+    return page
+
+def test_grayscale_collapses_channels():
+    rgb = np.zeros((10, 20, 3), dtype=np.uint8)
+    rgba = np.zeros((10, 20, 4), dtype=np.uint8)
+    assert to_grayscale(rgb).shape == (10, 20)
+    assert to_grayscale(rgba).shape == (10, 20)
+    gray = np.zeros((10, 20), dtype=np.uint8)
+    assert to_grayscale(gray) is gray
+
+def test_normalize_dpi_rescales_and_caps():
+    page = np.zeros((100, 200), dtype=np.uint8)
+    assert normalize_dpi(page, 150, 300, None).shape == (200, 400)
+    assert normalize_dpi(page, None, 300, None) is page
+    assert max(normalize_dpi(page, 150, 300, 250).shape) == 250
+
+def test_binarize_gives_two_levels():
+    gradient = np.tile(np.linspace(0, 255, 200, dtype=np.uint8), (100, 1))
+    assert set(np.unique(binarize(gradient, 31, 15))) <= {0, 255}
+
+def test_deskew_straightens_a_tilted_page():
+    page = lined_page()
+    tilted = _rotate(page, 5.0)
+    assert abs(abs(estimate_skew(tilted, 15.0)) - 5.0) < 1.0
+    straightened = deskew(tilted, 15.0)
+    assert _projection_score(straightened < 128) > _projection_score(tilted < 128) * 1.5
+
+def test_deskew_leaves_straight_and_out_of_range_pages_alone():
+    page = lined_page()
+    assert deskew(page, 15.0) is page
+    # More than max_angle is treated as a misdetection, not corrected
+    assert estimate_skew(_rotate(page, 25.0), 15.0) == 0.0
+
+def test_preprocess_in_memory_array_records_steps(tmp_path):
+    rgb = np.stack([lined_page()] * 3, axis=2)
+    timings = {}
+    result = preprocess_image(rgb, str(tmp_path), timings=timings)
+    assert result.ndim == 2 and result.dtype == np.uint8
+    assert set(np.unique(result)) <= {0, 255}
+    assert list(timings) == ["decode", "grayscale", "normalize_dpi", "denoise", "binarize", "deskew"]
+
+def test_steps_can_be_switched_off(tmp_path):
+    page = lined_page()
+    result = preprocess_image(page, str(tmp_path), config={"denoise": False, "binarize": False, "deskew": False})
+    assert np.array_equal(result, page)
@@ -0,0 +1,94 @@
+import random
+import re
+
+from rules import extract_medications, extract_people
+from v1.ner import extract_structured_data as extract_structured_data_v1
+
+# The patterns as they were before they were precompiled in rules.py, kept
+# here as the reference the rule engine must agree with
+def baseline_people(raw_text):
+    patient_name = "Not Found"
+    match = re.search(r"name (.*?) ace", raw_text, re.IGNORECASE)
+    if match:
+        patient_name = match.group(1).strip()
+    prescriber = "Not Found"
+    match = re.search(r"De Steve: (.*)", raw_text, re.IGNORECASE)
+    if match:
+        prescriber = match.group(1).strip()
+    return patient_name, prescriber
+
+def baseline_medications(raw_text):
+    med_pattern = re.compile(r"(\w+\s?\w*)\s+(\d+\s?m[g|l]).*?(\bBID\b|\bTID\b|\bQD\b|\bQID\b)", re.IGNORECASE)
+    abbreviations = {"BID": "twice a day", "TID": "three times a day", "QD": "once a day",
+                     "QID": "four times a day", "PRN": "as needed"}
+    return [{
+        "drug_name": drug.strip(),
+        "strength": strength.strip(),
+        "form": "Tablet",
+        "instructions": f"Take 1 tablet {abbreviations.get(freq.upper(), freq.upper())}",
+    } for drug, strength, freq in med_pattern.findall(raw_text)]
+
+def baseline_v1_medications(raw_text):
+    abbreviations = {
+        "BID": "twice a day", "TID": "three times a day", "QD": "once a day", "QID": "four times a day",
+        "PRN": "as needed", "TDS": "three times a day", "BD": "twice a day", "NOCTE": "at night"
+    }
+    med_pattern = re.compile(r"(\w+)\s+(\d+\s?m?g?)\s+(\b(?:TDS|BD|NOCTE|PRN)\b)\s*(\w*)", re.IGNORECASE)
+    med_pattern_simple = re.compile(r"(\w+)\s+(\d+\s?m?g?)\s+(\w+)", re.IGNORECASE)
+    medications = []
+    for line in raw_text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        match = med_pattern.search(line)
+        if match:
+            instructions = f"Take {abbreviations.get(match.group(3).upper(), match.group(3).upper())}"
+            if match.group(4):
+                instructions += f" for {match.group(4)}"
+            medications.append({"drug_name": match.group(1), "strength": match.group(2).strip(),
+                                "form": "Tablet", "instructions": instructions})
+            continue
+        match = med_pattern_simple.search(line)
+        if match:
+            instructions = abbreviations.get(match.group(3).upper(), match.group(3))
+            medications.append({"drug_name": match.group(1), "strength": match.group(2).strip(),
+                                "form": "Tablet", "instructions": f"Take {instructions}"})
+    return medications
+
+WORDS = ("Betaloc", "Metformin", "Amoxicillin", "name", "Vola", "Smith", "ace", "De", "Steve:", "dalinson",
+         "100mg", "10 mg", "5 ml", "500mg", "250", "-", "1", "tab", "BID", "tid", "QD", "qid", "PRN",
+         "TDS", "bd", "NOCTE", "5days", "x", "Rx:", "Sig:", "(Signature", "on", "File)")
+
+def random_texts(count, seed=0):
+    rng = random.Random(seed)
+    for _ in range(count):
+        lines = []
+        for _ in range(rng.randint(1, 8)):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(0, 9))]
+            lines.append(rng.choice((" ", "  ", "\t")).join(words))
+        yield "\n".join(lines)
+
+SAMPLE = """Central City Medical Group
+Patient name Vola Smith ace 24
+Rx:
+Betaloc 100mg - 1 tab BID
+Metformin 500 mg 1 tab tid x 5 days
+Amoxicillin 500mg TDS 5days
+De Steve: dalinson"""
+
+def test_sample_matches_baseline():
+    assert extract_people(SAMPLE) == baseline_people(SAMPLE) == ("Vola Smith", "dalinson")
+    medications = extract_medications(SAMPLE)
+    assert medications == baseline_medications(SAMPLE)
+    assert [m["drug_name"] for m in medications] == ["Betaloc", "Metformin"]
+    assert medications[0]["instructions"] == "Take 1 tablet twice a day"
+
+def test_random_texts_match_baseline():
+    for text in random_texts(2000):
+        assert extract_people(text) == baseline_people(text), text
+        assert extract_medications(text) == baseline_medications(text), text
+
+def test_v1_single_pass_matches_per_line_baseline(tmp_path):
+    for text in random_texts(300, seed=1):
+        data = extract_structured_data_v1(text, str(tmp_path))
+        assert data["medications"] == baseline_v1_medications(text), text
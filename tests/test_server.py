@@ -0,0 +1,122 @@
+import asyncio
+import json
+from concurrent.futures import Future
+
+from server import PrescriptionService, ServiceMetrics, _label_value
+
+class FakePool:
+    """Stands in for the process pool: jobs finish only when the test says so."""
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.jobs.append(future)
+        return future
+
+def make_service(queue_size=0, timeout=5.0):
+    service = PrescriptionService(workers=1, queue_size=queue_size, timeout=timeout)
+    service.pool = FakePool()
+    service.pool_ok = True
+    return service
+
+async def request(port, method, path, body=None):
+    """Sends one request on a new connection and returns (status, headers, body)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    head = f"{method} {path} HTTP/1.1\r\nHost: test\r\nConnection: close\r\n"
+    if body is not None:
+        head += f"Content-Length: {len(body)}\r\n"
+    writer.write(head.encode("latin-1") + b"\r\n" + (body or b""))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    headers = dict(line.split(": ", 1) for line in lines[1:])
+    return int(lines[0].split(" ")[1]), headers, payload
+
+def run(service, scenario):
+    async def main():
+        server = await asyncio.start_server(service.handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return await scenario(port)
+    return asyncio.run(main())
+
+def test_full_queue_gets_429_until_a_slot_frees():
+    service = make_service(queue_size=0)
+
+    async def scenario(port):
+        first = asyncio.ensure_future(request(port, "POST", "/v1/prescriptions?name=a.png", b"image"))
+        while not service.pool.jobs:
+            await asyncio.sleep(0.01)
+
+        status, headers, payload = await request(port, "POST", "/v1/prescriptions", b"image")
+        assert status == 429
+        assert headers["Retry-After"] == "1"
+        assert json.loads(payload) == {"error": "Server busy, retry later"}
+        assert len(service.pool.jobs) == 1  # The rejected image never reached the pool
+
+        service.pool.jobs[0].set_result({"image": "a.png", "status": "ok", "data": {}})
+        status, _, payload = await first
+        assert status == 200 and json.loads(payload)["image"] == "a.png"
+
+        # The finished job gave its slot back
+        while service.pending:
+            await asyncio.sleep(0.01)
+        third = asyncio.ensure_future(request(port, "POST", "/v1/prescriptions", b"image"))
+        while len(service.pool.jobs) < 2:
+            await asyncio.sleep(0.01)
+        service.pool.jobs[1].set_result({"image": "upload.png", "status": "error", "error": "unreadable"})
+        status, _, _ = await third
+        assert status == 422
+
+        _, _, metrics = await request(port, "GET", "/metrics")
+        return metrics.decode("utf-8")
+
+    metrics = run(service, scenario)
+    assert 'medicare_http_requests_total{path="/v1/prescriptions",code="429"} 1' in metrics
+    assert 'medicare_http_requests_total{path="/v1/prescriptions",code="200"} 1' in metrics
+    assert "medicare_queue_capacity 1" in metrics
+
+def test_slow_job_times_out_with_504():
+    service = make_service(queue_size=1, timeout=0.1)
+
+    async def scenario(port):
+        return await request(port, "POST", "/v1/prescriptions", b"image")
+
+    status, _, payload = run(service, scenario)
+    assert status == 504 and "Timed out" in json.loads(payload)["error"]
+
+def test_request_errors():
+    service = make_service()
+
+    async def scenario(port):
+        return [(await request(port, method, path, body))[0] for method, path, body in (
+            ("POST", "/v1/prescriptions", None),
+            ("POST", "/v1/prescriptions", b""),
+            ("GET", "/v1/prescriptions", None),
+            ("GET", "/nowhere", None),
+            ("GET", "/health", None),
+        )]
+
+    assert run(service, scenario) == [411, 400, 405, 404, 200]
+
+def test_unknown_paths_share_one_metrics_series():
+    service = make_service()
+
+    async def scenario(port):
+        for path in ("/a", "/b%22%0A", "/wp-login.php?x=1"):
+            await request(port, "GET", path)
+        _, _, metrics = await request(port, "GET", "/metrics")
+        return metrics.decode("utf-8")
+
+    metrics = run(service, scenario)
+    assert 'medicare_http_requests_total{path="other",code="404"} 3' in metrics
+    assert "/wp-login" not in metrics and "%22" not in metrics
+
+def test_label_values_are_escaped():
+    assert _label_value('a"b\\c\nd') == 'a\\"b\\\\c\\nd'
+    metrics = ServiceMetrics()
+    metrics.observe('/x"\n', 404, 0.0)
+    assert 'path="other"' in metrics.render(0, 1, 1)
@@ -0,0 +1,43 @@
+import json
+import threading
+
+from cache import content_hash
+from sink import JsonlSink
+from v1.ner import extract_structured_data
+
+def test_concurrent_writes_stay_whole_lines(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    with JsonlSink(path) as sink:
+        def write(worker):
+            for i in range(200):
+                sink.write({"worker": worker, "i": i, "pad": "x" * 500})
+        threads = [threading.Thread(target=write, args=(w,)) for w in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    with open(path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == 800
+    assert len({(r["worker"], r["i"]) for r in records}) == 800
+
+def test_separate_sinks_append(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    for run in range(2):
+        with JsonlSink(path) as sink:
+            sink.write({"run": run})
+    with open(path, encoding="utf-8") as f:
+        assert [json.loads(line)["run"] for line in f] == [0, 1]
+
+def test_v1_appends_through_the_shared_sink(tmp_path):
+    scan = tmp_path / "scan.png"
+    scan.write_bytes(b"fake scan bytes")
+    for _ in range(2):
+        data = extract_structured_data("Amoxicillin 500mg TDS 5days", str(tmp_path), source_image=str(scan))
+    assert data["medications"][0]["drug_name"] == "Amoxicillin"
+
+    with open(tmp_path / "structured_data.jsonl", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == 2
+    assert records[0]["content_hash"] == content_hash(str(scan))
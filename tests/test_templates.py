@@ -0,0 +1,62 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+pytest.importorskip("PIL")
+pytest.importorskip("pytesseract")
+
+import numpy as np
+
+import pipeline
+import templates
+from main import create_advanced_dummy_image
+from preprocess import preprocess_image
+
+class FakeEngine:
+    """Records every crop it is asked to read instead of running Tesseract."""
+    def __init__(self, text):
+        self.text = text
+        self.crops = []
+
+    def image_to_string(self, image, psm=None):
+        self.crops.append(image.size)
+        return self.text
+
+@pytest.fixture
+def pad(tmp_path):
+    path = str(tmp_path / "central_city.png")
+    create_advanced_dummy_image(path)
+    return preprocess_image(path, str(tmp_path))
+
+def test_sample_pad_matches_after_preprocessing(pad, monkeypatch):
+    engine = FakeEngine("Central City Medical Group")
+    monkeypatch.setattr(templates, "get_ocr_backend", lambda backend=None: engine)
+    template = templates.match_template(pad)
+    assert template is not None and template["name"] == "central_city_medical_group"
+    # Only the title region was read to confirm the match
+    assert len(engine.crops) == 1
+
+def test_blank_page_does_not_match_or_ocr(monkeypatch):
+    engine = FakeEngine("Central City Medical Group")
+    monkeypatch.setattr(templates, "get_ocr_backend", lambda backend=None: engine)
+    assert templates.match_template(np.full((600, 800), 255, dtype=np.uint8)) is None
+    assert engine.crops == []
+
+def test_only_field_regions_are_ocrd(pad, tmp_path, monkeypatch):
+    engine = FakeEngine("Central City Medical Group")
+    monkeypatch.setattr(templates, "get_ocr_backend", lambda backend=None: engine)
+    monkeypatch.setattr(pipeline, "preprocess_image", lambda *args, **kwargs: pad)
+
+    def full_page_ocr(*args, **kwargs):
+        raise AssertionError("full-page OCR ran on a registered pad")
+    monkeypatch.setattr(pipeline, "extract_text_with_ocr", full_page_ocr)
+
+    record = pipeline.process_prescription(str(tmp_path / "central_city.png"), str(tmp_path), use_cache=False)
+    assert record["status"] == "ok", record.get("error")
+    assert record["template"] == "central_city_medical_group"
+
+    template = templates.load_templates()[0]
+    height, width = pad.shape
+    # The title, then one crop per registered field, none of them the whole page
+    assert len(engine.crops) == 1 + len(template["fields"])
+    assert all(w < width or h < height for w, h in engine.crops)
@@ -0,0 +1,78 @@
+import json
+import os
+
+import pytest
+
+import tracing
+
+@pytest.fixture
+def traced(tmp_path, monkeypatch):
+    """Tracing on, writing to tmp_path, with a fresh sink and metrics registry."""
+    monkeypatch.setattr(tracing, "TRACE_ENABLED", True)
+    monkeypatch.setattr(tracing, "TRACE_PATH", str(tmp_path / "traces.jsonl"))
+    monkeypatch.setattr(tracing, "METRICS_PATH", str(tmp_path / "metrics.prom"))
+    monkeypatch.setattr(tracing, "REGISTRY", tracing._Registry())
+    monkeypatch.setattr(tracing, "_trace_sink", None)
+    yield tmp_path
+    if tracing._trace_sink is not None:
+        tracing._trace_sink.close()
+
+def read_spans(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+def test_disabled_spans_are_a_shared_noop(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_ENABLED", False)
+    with tracing.span("ocr", bytes_in=1) as s:
+        assert not s
+        s.set(bytes_out=2)
+    assert tracing.span("ner") is tracing.trace("pipeline")
+
+def test_trace_collects_nested_spans_for_the_caller(traced):
+    with tracing.trace("pipeline", image="a.png") as root:
+        with tracing.span("ocr") as s:
+            s.set(bytes_in=10, bytes_out=3)
+            with tracing.span("ocr.line"):
+                pass
+    assert not os.path.exists(traced / "traces.jsonl")
+
+    by_name = {record["name"]: record for record in root.spans}
+    assert set(by_name) == {"pipeline", "ocr", "ocr.line"}
+    assert {record["trace_id"] for record in root.spans} == {root.span_id}
+    assert by_name["ocr.line"]["parent_id"] == by_name["ocr"]["span_id"]
+    assert by_name["pipeline"]["parent_id"] is None
+    assert by_name["ocr"]["attrs"] == {"bytes_in": 10, "bytes_out": 3}
+
+def test_exported_spans_reach_the_file_and_metrics(traced):
+    record = {"status": "ok"}
+    with tracing.trace("pipeline") as root:
+        with pytest.raises(RuntimeError):
+            with tracing.span("ocr", bytes_in=100):
+                raise RuntimeError("tesseract failed")
+    record["spans"] = root.spans
+    tracing.export_record(record)
+    assert "spans" not in record
+
+    spans = read_spans(traced / "traces.jsonl")
+    assert [s["name"] for s in spans] == ["ocr", "pipeline"]
+    assert spans[0]["error"] == "RuntimeError"
+
+    metrics = tracing.render_metrics()
+    assert 'medicare_span_seconds_count{span="ocr"} 1' in metrics
+    assert 'medicare_span_seconds_bucket{span="ocr",le="+Inf"} 1' in metrics
+    assert 'medicare_span_errors_total{span="ocr"} 1' in metrics
+    assert 'medicare_span_errors_total{span="pipeline"} 0' in metrics
+    assert 'medicare_span_bytes_total{span="ocr",direction="in"} 100' in metrics
+
+def test_spans_outside_a_trace_are_exported_directly(traced):
+    with tracing.span("server.request"):
+        pass
+    assert [s["name"] for s in read_spans(traced / "traces.jsonl")] == ["server.request"]
+
+def test_write_metrics_replaces_the_file(traced):
+    with tracing.span("ner"):
+        pass
+    tracing.write_metrics()
+    with open(traced / "metrics.prom", encoding="utf-8") as f:
+        assert 'medicare_span_seconds_count{span="ner"} 1' in f.read()
+    assert not [name for name in os.listdir(traced) if name.endswith(".tmp")]